@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+资源对比脚本（compare_resources_v2）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '对比查找两个目录下相同的文件'))
+
+from compare_resources_v2 import (CHANGE_ADDED, CHANGE_MODIFIED, CHANGE_REMOVED, CHANGE_RENAMED, DIFF_COLUMNS,
+                                  compare_multiple_directories, diff_directories, directory_labels, export_matrix,
+                                  hash_join_directories, scan_directory)
+
+
+def write_tree(root, files):
+    """按 {相对路径: 内容} 创建文件"""
+    for relative_path, data in files.items():
+        path = os.path.join(root, *relative_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+class DiffDirectoriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.old = os.path.join(self.temp_dir.name, 'old')
+        self.new = os.path.join(self.temp_dir.name, 'new')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def diff(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = diff_directories(self.old, self.new)
+        return [(row['change'], row['path1'], row['path2']) for row in rows]
+
+    def test_classification(self):
+        write_tree(self.old, {
+            'same.txt': b'same',
+            'config.ini': b'v1',
+            'ui/old_name.png': b'renamed content',
+            'gone.txt': b'removed content',
+        })
+        write_tree(self.new, {
+            'same.txt': b'same',
+            'config.ini': b'v2',
+            'ui/new/new_name.png': b'renamed content',
+            'fresh.txt': b'added content',
+        })
+
+        self.assertEqual(self.diff(), [
+            (CHANGE_MODIFIED, 'config.ini', 'config.ini'),
+            (CHANGE_RENAMED, os.path.join('ui', 'old_name.png'), os.path.join('ui', 'new', 'new_name.png')),
+            (CHANGE_REMOVED, 'gone.txt', None),
+            (CHANGE_ADDED, None, 'fresh.txt'),
+        ])
+
+    def test_renames_of_shared_content_paired_by_path(self):
+        placeholder = b'placeholder'
+        write_tree(self.old, {'zh/hero.png': placeholder, 'zh/boss.png': placeholder, 'zh/extra.png': placeholder})
+        write_tree(self.new, {'en/boss.png': placeholder, 'en/hero.png': placeholder})
+
+        self.assertEqual(sorted(self.diff()), sorted([
+            (CHANGE_RENAMED, os.path.join('zh', 'boss.png'), os.path.join('en', 'boss.png')),
+            (CHANGE_RENAMED, os.path.join('zh', 'hero.png'), os.path.join('en', 'hero.png')),
+            (CHANGE_REMOVED, os.path.join('zh', 'extra.png'), None),
+        ]))
+
+    def test_row_columns_and_sizes(self):
+        write_tree(self.old, {'a.bin': b'12345'})
+        write_tree(self.new, {'a.bin': b'123456789'})
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            row, = diff_directories(self.old, self.new)
+        self.assertEqual(list(row), DIFF_COLUMNS)
+        self.assertEqual((row['size1'], row['size2']), (5, 9))
+        self.assertNotEqual(row['hash1'], row['hash2'])
+
+    def test_identical_trees(self):
+        write_tree(self.old, {'a/b.txt': b'x', 'c.txt': b'y'})
+        write_tree(self.new, {'a/b.txt': b'x', 'c.txt': b'y'})
+        self.assertEqual(self.diff(), [])
+
+
+
+class HashJoinTest(unittest.TestCase):
+
+    def test_only_size_matched_files_hashed(self):
+        with tempfile.TemporaryDirectory() as root:
+            dir1, dir2 = os.path.join(root, 'a'), os.path.join(root, 'b')
+            write_tree(dir1, {'x.bin': b'abc', 'y.bin': b'abd', 'big.bin': b'z' * 100})
+            write_tree(dir2, {'p.bin': b'abc', 'q.bin': b'12345', 'r.bin': b'abcabc'})
+            with contextlib.redirect_stdout(io.StringIO()):
+                index1, index2 = hash_join_directories(dir1, dir2)
+                full1 = scan_directory(dir1)
+
+            hashed1 = {os.path.basename(index1.records.path(file_id))
+                       for _, file_ids in index1.groups() for file_id in file_ids}
+            hashed2 = {os.path.basename(index2.records.path(file_id))
+                       for _, file_ids in index2.groups() for file_id in file_ids}
+            shared = {md5_value for md5_value, _ in index1.groups()} & {md5_value for md5_value, _ in index2.groups()}
+            full_hashes = {md5_value for md5_value, _ in full1.groups()}
+
+        self.assertEqual(hashed1, {'x.bin', 'y.bin'})
+        self.assertEqual(hashed2, {'p.bin'})
+        self.assertEqual(shared, {hashlib.md5(b'abc').hexdigest()})
+        self.assertLessEqual(shared, full_hashes)
+
+
+class MultipleDirectoriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = self.temp_dir.name
+        self.directories = [os.path.join(root, locale) for locale in ('zh', 'en', 'ja')]
+        write_tree(self.directories[0], {'logo.png': b'logo', 'a/button.png': b'button', 'only_zh.txt': b'zh'})
+        write_tree(self.directories[1], {'logo.png': b'logo', 'b/button.png': b'button', 'b/button2.png': b'button'})
+        write_tree(self.directories[2], {'img/logo.png': b'logo', 'only_ja.txt': b'ja'})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def compare(self, min_directories=2):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return compare_multiple_directories(self.directories, min_directories=min_directories)
+
+    def test_matrix_rows(self):
+        results = self.compare()
+
+        by_hash = {md5_value: (size, files) for md5_value, size, files in results}
+        self.assertEqual([md5_value for md5_value, _, _ in results], sorted(by_hash))
+        logo_size, logo_files = by_hash[hashlib.md5(b'logo').hexdigest()]
+        self.assertEqual(logo_size, 4)
+        self.assertEqual([len(files) for files in logo_files], [1, 1, 1])
+        self.assertEqual(logo_files[2], [os.path.join(self.directories[2], 'img', 'logo.png')])
+        _, button_files = by_hash[hashlib.md5(b'button').hexdigest()]
+        self.assertEqual([len(files) for files in button_files], [1, 2, 0])
+        self.assertEqual(len(results), 2)
+
+    def test_min_directories(self):
+        self.assertEqual(len(self.compare(min_directories=3)), 1)
+        self.assertEqual(len(self.compare(min_directories=1)), 4)
+
+    def test_directory_labels(self):
+        self.assertEqual(directory_labels(['x/zh', 'y/en']), ['zh', 'en'])
+        self.assertEqual(directory_labels(['a/res', 'b/res', 'c/en']), ['res_1', 'res_2', 'en'])
+
+    def test_export_matrix_jsonl(self):
+        output = os.path.join(self.temp_dir.name, 'matrix.jsonl')
+        with contextlib.redirect_stdout(io.StringIO()):
+            export_matrix(self.compare(), output, self.directories)
+
+        with open(output, encoding='utf-8') as f:
+            rows = {row['hash']: row for row in map(json.loads, f)}
+        button = rows[hashlib.md5(b'button').hexdigest()]
+        self.assertEqual(button['directory_count'], 2)
+        self.assertEqual(button['zh'], os.path.join('a', 'button.png'))
+        self.assertEqual(set(button['en'].split('; ')),
+                         {os.path.join('b', 'button.png'), os.path.join('b', 'button2.png')})
+        self.assertIsNone(button['ja'])
+
+
+if __name__ == '__main__':
+    unittest.main()
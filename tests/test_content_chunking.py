@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容定义分块（content_chunking）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+
+import content_chunking
+from content_chunking import chunk_file
+
+AVERAGE_SIZE = 1024
+
+
+class ChunkFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data = random.Random(7).randbytes(200 * 1024)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_chunk_sizes(self):
+        chunks = chunk_file(self.write('a', self.data), AVERAGE_SIZE)
+
+        lengths = [length for _, length in chunks]
+        self.assertEqual(sum(lengths), len(self.data))
+        self.assertTrue(all(AVERAGE_SIZE // 4 <= length <= AVERAGE_SIZE * 4 for length in lengths[:-1]))
+        self.assertLessEqual(lengths[-1], AVERAGE_SIZE * 4)
+        # 随机数据的平均块大小接近设定值（最小块限制使其略大）
+        self.assertLess(abs(len(self.data) / len(chunks) - AVERAGE_SIZE * 1.25), AVERAGE_SIZE * 0.5)
+
+    def test_stable_under_insertion(self):
+        chunks = chunk_file(self.write('a', self.data), AVERAGE_SIZE)
+        middle = len(self.data) // 2
+        edited = self.data[:middle] + b'inserted bytes' * 10 + self.data[middle:]
+        edited_chunks = chunk_file(self.write('b', edited), AVERAGE_SIZE)
+
+        shared = set(chunks) & set(edited_chunks)
+        shared_bytes = sum(length for _, length in shared)
+        self.assertGreater(shared_bytes, len(self.data) * 0.9)
+        # 插入点之前和之后的块都不受影响
+        self.assertEqual(chunks[0], edited_chunks[0])
+        self.assertEqual(chunks[-1], edited_chunks[-1])
+
+    def test_boundaries_independent_of_read_size(self):
+        path = self.write('a', self.data)
+        expected = chunk_file(path, AVERAGE_SIZE)
+        with mock.patch.object(content_chunking, '_READ_SIZE', 3000):
+            self.assertEqual(chunk_file(path, AVERAGE_SIZE), expected)
+
+    def test_same_boundaries_without_numpy(self):
+        if not content_chunking.fast_chunking_available():
+            self.skipTest('需要安装 numpy')
+        path = self.write('a', self.data[:40 * 1024])
+        expected = chunk_file(path, AVERAGE_SIZE)
+        with mock.patch.object(content_chunking, 'np', None):
+            self.assertEqual(chunk_file(path, AVERAGE_SIZE), expected)
+
+    def test_long_run_of_equal_bytes_cut_at_max_size(self):
+        chunks = chunk_file(self.write('zeros', bytes(20 * 1024)), AVERAGE_SIZE)
+        self.assertEqual([length for _, length in chunks], [AVERAGE_SIZE * 4] * 5)
+        self.assertEqual(len(set(digest for digest, _ in chunks)), 1)
+
+    def test_empty_and_missing_files(self):
+        self.assertEqual(chunk_file(self.write('empty', b''), AVERAGE_SIZE), [])
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(chunk_file(os.path.join(self.temp_dir.name, 'missing'), AVERAGE_SIZE), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部排序（external_sort）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import os
+import random
+import sys
+import unittest
+from operator import itemgetter
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+
+import external_sort
+from external_sort import ExternalSorter, records_with_shared_key
+
+
+class ExternalSorterTest(unittest.TestCase):
+
+    def test_in_memory_sort_writes_no_runs(self):
+        with ExternalSorter(run_size=100) as sorter:
+            for value in (3, 1, 2):
+                sorter.add((value, f'p{value}'))
+            self.assertEqual(sorter.run_count, 0)
+            self.assertEqual(list(sorter.sorted()), [(1, 'p1'), (2, 'p2'), (3, 'p3')])
+
+    def test_merge_of_spilled_runs(self):
+        rng = random.Random(1)
+        records = [(rng.randrange(50), rng.randbytes(4), i, f'路径/{i}') for i in range(1000)]
+        with ExternalSorter(run_size=64) as sorter:
+            for record in records:
+                sorter.add(record)
+            self.assertEqual(sorter.count, 1000)
+            self.assertEqual(sorter.run_count, 1000 // 64)
+            self.assertEqual(list(sorter.sorted()), sorted(records))
+
+    def test_multi_level_merge(self):
+        # 有序段数超过一次归并的上限时先分批归并
+        records = [(i * 7919 % 503, i) for i in range(503)]
+        with mock.patch.object(external_sort, 'MAX_MERGE_FAN_IN', 4):
+            with ExternalSorter(run_size=10) as sorter:
+                for record in records:
+                    sorter.add(record)
+                self.assertEqual(list(sorter.sorted()), sorted(records))
+
+    def test_temp_files_removed_on_close(self):
+        sorter = ExternalSorter(run_size=2)
+        for i in range(10):
+            sorter.add((i,))
+        temp_dir = sorter._temp.name
+        self.assertTrue(os.listdir(temp_dir))
+        sorter.close()
+        self.assertFalse(os.path.exists(temp_dir))
+
+
+class SharedKeyTest(unittest.TestCase):
+
+    def test_only_keys_seen_twice(self):
+        records = [(1, 'a'), (2, 'b'), (2, 'c'), (3, 'd'), (4, 'e'), (4, 'f'), (4, 'g'), (5, 'h')]
+        self.assertEqual(list(records_with_shared_key(records, itemgetter(0))),
+                         [(2, 'b'), (2, 'c'), (4, 'e'), (4, 'f'), (4, 'g')])
+
+    def test_composite_key_and_empty_input(self):
+        records = [(1, b'x', 0), (1, b'y', 1), (1, b'y', 2), (2, b'y', 3)]
+        self.assertEqual(list(records_with_shared_key(records, itemgetter(0, 1))), [(1, b'y', 1), (1, b'y', 2)])
+        self.assertEqual(list(records_with_shared_key([], itemgetter(0))), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录遍历（file_walker）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+
+from file_walker import list_directory, scandir_walk, walk_directories
+
+
+class WalkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        for i in range(6):
+            for j in range(4):
+                directory = os.path.join(self.root, f'd{i}', f'e{j}')
+                os.makedirs(directory)
+                for k in range(3):
+                    with open(os.path.join(directory, f'f{k}'), 'wb') as f:
+                        f.write(b'x' * (i * 100 + j * 10 + k))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_same_files_as_os_walk(self):
+        expected = {}
+        for current_dir, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(current_dir, name)
+                expected[path] = os.path.getsize(path)
+
+        entries = list(scandir_walk(self.root))
+
+        self.assertEqual({entry.path: entry.st_size for entry in entries}, expected)
+        self.assertEqual(len(entries), 6 * 4 * 3)
+
+    def test_order_independent_of_jobs(self):
+        serial = [entry.path for entry in scandir_walk(self.root, jobs=1)]
+        for jobs in (2, 8):
+            self.assertEqual([entry.path for entry in scandir_walk(self.root, jobs=jobs)], serial)
+
+    def test_depth_first_order(self):
+        directories = [path for path, _ in walk_directories(self.root, jobs=4)]
+        # 一个子目录下的所有目录都排在下一个兄弟目录之前
+        for i in range(6):
+            start = directories.index(os.path.join(self.root, f'd{i}'))
+            self.assertTrue(all(os.path.dirname(path) == os.path.join(self.root, f'd{i}')
+                                for path in directories[start + 1:start + 5]))
+
+    def test_prefetch_is_bounded(self):
+        wide = os.path.join(self.root, 'wide')
+        for i in range(300):
+            os.makedirs(os.path.join(wide, f'sub{i:03d}'))
+        listed = []
+        lock = threading.Lock()
+
+        def counting_list(current_dir):
+            with lock:
+                listed.append(current_dir)
+            return list_directory(current_dir)
+
+        jobs = 2
+        walker = walk_directories(wide, counting_list, jobs)
+        next(walker)
+        second_dir, _ = next(walker)
+        walker.close()  # 等待已提交的任务结束
+
+        self.assertLessEqual(len(listed), 1 + jobs * 4 + 1)
+        self.assertIn(second_dir, listed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重复文件检测脚本（v3）的回归测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import contextlib
+import hashlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                      '查找指定目录下文件md5相同的文件', 'find_duplicate_files_v3.py')
+
+sys.path.insert(0, os.path.dirname(SCRIPT))
+
+from find_duplicate_files_v3 import PARTIAL_HASH_SIZE, calculate_partial_hash, find_duplicate_files
+
+
+class SampleHashTest(unittest.TestCase):
+    """头尾采样哈希只用于筛选候选文件，最终分组以完整哈希为准"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_small_file_sample_is_full_hash(self):
+        data = b'abc' * 100
+        path = self.write('small', data)
+        self.assertEqual(calculate_partial_hash(path, len(data)), hashlib.md5(data).hexdigest())
+
+    def test_sample_covers_head_and_tail_only(self):
+        head, tail = b'h' * PARTIAL_HASH_SIZE, b't' * PARTIAL_HASH_SIZE
+        path1 = self.write('m1', head + b'1' * 100 + tail)
+        path2 = self.write('m2', head + b'2' * 100 + tail)
+        path3 = self.write('m3', b'x' + head[1:] + b'1' * 100 + tail)
+        size = PARTIAL_HASH_SIZE * 2 + 100
+
+        self.assertEqual(calculate_partial_hash(path1, size), calculate_partial_hash(path2, size))
+        self.assertNotEqual(calculate_partial_hash(path1, size), calculate_partial_hash(path3, size))
+
+    def test_groups_use_full_hash(self):
+        head, tail = b'h' * PARTIAL_HASH_SIZE, b't' * PARTIAL_HASH_SIZE
+        same1 = self.write('same1', head + b'1' * 100 + tail)
+        same2 = self.write('same2', head + b'1' * 100 + tail)
+        self.write('middle_differs', head + b'2' * 100 + tail)
+        self.write('other_size', head + tail)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            groups = find_duplicate_files(self.root)
+
+        self.assertEqual([sorted(paths) for paths in groups.values()], [[same1, same2]])
+
+
+class PipelineErrorTest(unittest.TestCase):
+    """流水线模式中某个阶段出错时，进程应报错退出，而不是卡在已满的队列上"""
+
+    def test_export_failure_exits_with_error(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, 'src')
+            output = os.path.join(temp_dir, 'out')
+            os.makedirs(source)
+            # 报告文件路径是一个目录，写入报告的线程打开文件时出错
+            os.makedirs(os.path.join(output, 'same_file_in_src.csv'))
+            for i in range(3000):
+                with open(os.path.join(source, f'f{i}.bin'), 'wb') as f:
+                    f.write(bytes([i % 7]) * (100 + i % 50))
+
+            result = subprocess.run(
+                [sys.executable, SCRIPT, source, output, '--no-cache', '--pipeline', '--memory-budget', '1',
+                 '--format', 'csv'],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=60)
+
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('IsADirectoryError', result.stderr)
+
+
+
+class ExternalSortModeTest(unittest.TestCase):
+    """外部排序模式的报告应与默认模式完全相同"""
+
+    def run_script(self, source, output, *options):
+        subprocess.run([sys.executable, SCRIPT, source, output, '--no-cache', '--format', 'csv', *options],
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, timeout=60)
+        with open(os.path.join(output, 'same_file_in_src.csv'), 'rb') as f:
+            return f.read()
+
+    def test_same_report_as_default_mode(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, 'src')
+            for i in range(60):
+                directory = os.path.join(source, f'd{i % 4}')
+                os.makedirs(directory, exist_ok=True)
+                # 9000字节的文件头尾相同、中间不同，需要完整哈希才能区分
+                data = b'h' * 4096 + bytes([i % 3]) * 808 + b't' * 4096 if i % 2 else bytes([i % 5]) * 200
+                with open(os.path.join(directory, f'f{i}.bin'), 'wb') as f:
+                    f.write(data)
+
+            default = self.run_script(source, os.path.join(temp_dir, 'a'))
+            external = self.run_script(source, os.path.join(temp_dir, 'b'), '--external-sort', '--sort-run-size', '7')
+            verified = self.run_script(source, os.path.join(temp_dir, 'c'), '--external-sort', '--sort-run-size', '7',
+                                       '--verify')
+
+        self.assertEqual(external, default)
+        self.assertEqual(default.decode('utf-8-sig').count('\n'), 61)
+        self.assertEqual(verified.decode('utf-8-sig').count('\n'), 61)
+
+
+if __name__ == '__main__':
+    unittest.main()
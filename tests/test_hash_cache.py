@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化哈希缓存（hash_cache）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+
+from file_walker import FileEntry
+from hash_cache import HashCache, cached_hash
+
+
+class HashCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'cache', 'hash.sqlite3')
+        self.cache = HashCache(self.db_path, flush_size=1)
+        self.path = os.path.join(self.temp_dir.name, 'data', 'a.bin')
+        self.entry = FileEntry(self.path, 100, 1000, 42)
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_hit_only_when_size_mtime_and_inode_match(self):
+        self.cache.put(self.path, self.entry, 'md5', 'digest')
+
+        self.assertEqual(self.cache.get(self.path, self.entry, 'md5'), 'digest')
+        self.assertIsNone(self.cache.get(self.path, self.entry._replace(st_size=101), 'md5'))
+        self.assertIsNone(self.cache.get(self.path, self.entry._replace(st_mtime_ns=1001), 'md5'))
+        self.assertIsNone(self.cache.get(self.path, self.entry._replace(st_ino=43), 'md5'))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 3))
+
+    def test_kinds_are_separate(self):
+        self.cache.put(self.path, self.entry, 'md5', 'full')
+        self.cache.put(self.path, self.entry, 'md5-head-tail-4096', 'sample')
+
+        self.assertEqual(self.cache.get(self.path, self.entry, 'md5'), 'full')
+        self.assertEqual(self.cache.get(self.path, self.entry, 'md5-head-tail-4096'), 'sample')
+        self.assertIsNone(self.cache.get(self.path, self.entry, 'sha256'))
+
+    def test_update_replaces_stale_record(self):
+        changed = self.entry._replace(st_mtime_ns=2000)
+        self.cache.put(self.path, self.entry, 'md5', 'old')
+        self.cache.put(self.path, changed, 'md5', 'new')
+
+        self.assertEqual(self.cache.get(self.path, changed, 'md5'), 'new')
+        self.assertIsNone(self.cache.get(self.path, self.entry, 'md5'))
+
+    def test_persisted_and_rebuild_clears(self):
+        cache = HashCache(self.db_path, flush_size=1000)
+        cache.put(self.path, self.entry, 'md5', 'digest')
+        cache.close()  # 未达到 flush_size 的记录在关闭时写入
+
+        cache = HashCache(self.db_path)
+        self.assertEqual(cache.get(self.path, self.entry, 'md5'), 'digest')
+        cache.close()
+        cache = HashCache(self.db_path, rebuild=True)
+        self.assertIsNone(cache.get(self.path, self.entry, 'md5'))
+        cache.close()
+
+    def test_prune_only_removes_missing_files_under_directory(self):
+        data_dir = os.path.dirname(self.path)
+        kept = os.path.join(data_dir, 'kept.bin')
+        sibling = os.path.join(self.temp_dir.name, 'data2', 'other.bin')
+        for path in (self.path, kept, sibling):
+            self.cache.put(path, self.entry, 'md5', 'digest')
+
+        self.assertEqual(self.cache.prune(data_dir, [kept]), 1)
+        self.assertIsNone(self.cache.get(self.path, self.entry, 'md5'))
+        self.assertEqual(self.cache.get(kept, self.entry, 'md5'), 'digest')
+        self.assertEqual(self.cache.get(sibling, self.entry, 'md5'), 'digest')
+
+    def test_cached_hash(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 'computed'
+
+        self.assertEqual(cached_hash(self.cache, self.path, self.entry, 'md5', compute), 'computed')
+        self.assertEqual(cached_hash(self.cache, self.path, self.entry, 'md5', compute), 'computed')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cached_hash(None, self.path, self.entry, 'md5', compute), 'computed')
+        self.assertEqual(len(calls), 2)
+
+    def test_failed_hash_not_cached(self):
+        self.assertIsNone(cached_hash(self.cache, self.path, self.entry, 'md5', lambda: None))
+        self.assertEqual(cached_hash(self.cache, self.path, self.entry, 'md5', lambda: 'later'), 'later')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用链接合并重复文件（link_dedup）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+
+from link_dedup import link_duplicates, read_journal, rollback_journal
+
+
+class LinkDuplicatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        self.journal = os.path.join(self.root, 'journal.jsonl')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_file(self, name, data, mode=0o644, mtime=1000000000):
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        os.chmod(path, mode)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def link(self, groups, **kwargs):
+        # 合并过程中的警告打印到标准输出，测试中不显示
+        with contextlib.redirect_stdout(io.StringIO()):
+            return link_duplicates(groups, journal_path=self.journal, **kwargs)
+
+    def test_hardlink_replaces_duplicates(self):
+        keeper = self.make_file('a', b'x' * 1000)
+        duplicate1 = self.make_file('b', b'x' * 1000)
+        duplicate2 = self.make_file('c', b'x' * 1000)
+
+        summary = self.link([[keeper, duplicate1, duplicate2]])
+
+        self.assertEqual(summary.linked, 2)
+        self.assertEqual(summary.failed, 0)
+        self.assertEqual(summary.reclaimed_bytes, 2000)
+        inode = os.stat(keeper).st_ino
+        self.assertEqual(os.stat(duplicate1).st_ino, inode)
+        self.assertEqual(os.stat(duplicate2).st_ino, inode)
+        self.assertEqual(len(read_journal(self.journal)), 2)
+        self.assertEqual(sorted(os.listdir(self.root)), ['a', 'b', 'c', 'journal.jsonl'])
+
+    def test_already_linked_file_is_skipped(self):
+        keeper = self.make_file('a', b'data')
+        duplicate = os.path.join(self.root, 'b')
+        os.link(keeper, duplicate)
+
+        summary = self.link([[keeper, duplicate]])
+
+        self.assertEqual((summary.linked, summary.skipped, summary.reclaimed_bytes), (0, 1, 0))
+
+    def test_dry_run_leaves_tree_untouched(self):
+        keeper = self.make_file('a', b'y' * 500)
+        duplicate = self.make_file('b', b'y' * 500)
+        inode = os.stat(duplicate).st_ino
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = link_duplicates([[keeper, duplicate]], dry_run=True)
+
+        self.assertEqual((summary.linked, summary.reclaimed_bytes), (1, 500))
+        self.assertEqual(os.stat(duplicate).st_ino, inode)
+        self.assertFalse(os.path.exists(self.journal))
+        self.assertEqual(sorted(os.listdir(self.root)), ['a', 'b'])
+
+    def test_different_content_is_skipped(self):
+        keeper = self.make_file('a', b'same size 1')
+        other = self.make_file('b', b'same size 2')
+
+        summary = self.link([[keeper, other]])
+
+        self.assertEqual((summary.linked, summary.failed), (0, 1))
+        self.assertNotEqual(os.stat(other).st_ino, os.stat(keeper).st_ino)
+        with open(other, 'rb') as f:
+            self.assertEqual(f.read(), b'same size 2')
+
+    def test_rollback_restores_independent_files(self):
+        keeper = self.make_file('a', b'z' * 100, mode=0o644, mtime=1000000000)
+        duplicate = self.make_file('b', b'z' * 100, mode=0o600, mtime=1200000000)
+        self.link([[keeper, duplicate]])
+        self.assertEqual(os.stat(duplicate).st_ino, os.stat(keeper).st_ino)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            restored = rollback_journal(self.journal)
+
+        self.assertEqual(restored, 1)
+        duplicate_stat = os.stat(duplicate)
+        self.assertNotEqual(duplicate_stat.st_ino, os.stat(keeper).st_ino)
+        self.assertEqual(duplicate_stat.st_mode & 0o777, 0o600)
+        self.assertEqual(duplicate_stat.st_mtime_ns, 1200000000 * 10 ** 9)
+        self.assertEqual(os.stat(keeper).st_mode & 0o777, 0o644)
+        with open(duplicate, 'rb') as f:
+            self.assertEqual(f.read(), b'z' * 100)
+        self.assertEqual(sorted(os.listdir(self.root)), ['a', 'b', 'journal.jsonl'])
+
+    def test_existing_temp_named_file_is_preserved(self):
+        keeper = self.make_file('k', b'content')
+        target = self.make_file('t', b'content')
+        user_file = self.make_file('t.link_dedup_tmp', b'user data')
+
+        for method in ('auto', 'hardlink'):
+            summary = self.link([[keeper, target]], method=method)
+            self.assertEqual(summary.failed, 0)
+            with open(user_file, 'rb') as f:
+                self.assertEqual(f.read(), b'user data')
+            with contextlib.redirect_stdout(io.StringIO()):
+                rollback_journal(self.journal)
+            with open(user_file, 'rb') as f:
+                self.assertEqual(f.read(), b'user data')
+            os.remove(self.journal)
+
+        self.assertEqual(sorted(os.listdir(self.root)), ['k', 't', 't.link_dedup_tmp'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+移动旧文件脚本（move_old_files）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                      '查找移动修改时间小于指定timestamp的文件', 'move_old_files.py')
+
+OLD_MTIME = 1500000000
+THRESHOLD = 1600000000
+
+
+class IncrementalMoveTest(unittest.TestCase):
+
+    def run_script(self, source, target, home):
+        return subprocess.run([sys.executable, SCRIPT, str(THRESHOLD), source, target, '--incremental'],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, timeout=60,
+                              env=dict(os.environ, HOME=home))
+
+    def test_file_rewritten_after_snapshot_is_not_moved(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, 'src')
+            os.makedirs(os.path.join(source, 'a'))
+            for name in ('old1', 'old2', 'new'):
+                path = os.path.join(source, 'a', name)
+                with open(path, 'w') as f:
+                    f.write(name)
+                mtime = THRESHOLD + 1000 if name == 'new' else OLD_MTIME
+                os.utime(path, (mtime, mtime))
+            for directory in (os.path.join(source, 'a'), source):
+                os.utime(directory, (OLD_MTIME, OLD_MTIME))
+
+            # 第一次运行只为建立快照（阈值之前没有文件）
+            subprocess.run([sys.executable, SCRIPT, '1', source, os.path.join(temp_dir, 'unused'), '--incremental'],
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, timeout=60,
+                           env=dict(os.environ, HOME=temp_dir))
+
+            # 原地改写 old1：目录的修改时间不变，快照中仍是旧的修改时间
+            with open(os.path.join(source, 'a', 'old1'), 'a') as f:
+                f.write(' rewritten')
+            os.utime(os.path.join(source, 'a'), (OLD_MTIME, OLD_MTIME))
+
+            target = os.path.join(temp_dir, 'moved')
+            result = self.run_script(source, target, temp_dir)
+
+            self.assertIn('复用快照 2 个目录', result.stdout)
+            self.assertEqual(os.listdir(os.path.join(target, 'a')), ['old2'])
+            self.assertEqual(sorted(os.listdir(os.path.join(source, 'a'))), ['new', 'old1'])
+            self.assertIn('跳过 1 个', result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按路径相似度配对（path_pairing）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+
+import path_pairing
+from path_pairing import pair_paths, path_similarity
+
+
+class PathSimilarityTest(unittest.TestCase):
+
+    def test_score_components(self):
+        self.assertEqual(path_similarity('ui/icon.png', 'ui/icon.png'), 7.0)
+        # 文件名不同但词元部分相同：2 * 1/3 + 扩展名1分 + 目录2分
+        self.assertAlmostEqual(path_similarity('ui/icon_gold.png', 'ui/icon_silver.png'), 2 / 3 + 3)
+        self.assertEqual(path_similarity('a/x.png', 'b/y.jpg'), 0.0)
+
+    def test_case_and_separator_insensitive(self):
+        self.assertEqual(path_similarity('UI\\Icon.PNG', 'ui/icon.png'), path_similarity('ui/icon.png', 'ui/icon.png'))
+
+
+class PairPathsTest(unittest.TestCase):
+
+    def test_identical_paths_paired_first(self):
+        paths1 = ['b/common.png', 'a/common.png']
+        paths2 = ['a/common.png', 'b/common.png']
+        self.assertEqual(pair_paths(paths1, paths2), [(0, 1), (1, 0)])
+
+    def test_similar_names_beat_list_order(self):
+        paths1 = ['zh/hero_attack.png', 'zh/hero_idle.png', 'zh/boss.png']
+        paths2 = ['en/boss.png', 'en/hero_idle.png', 'en/hero_attack.png']
+        self.assertEqual(pair_paths(paths1, paths2), [(0, 2), (1, 1), (2, 0)])
+
+    def test_uneven_groups(self):
+        self.assertEqual(pair_paths(['x/a.png', 'x/b.png', 'x/c.png'], ['y/b.png']), [(0, None), (1, 0), (2, None)])
+        self.assertEqual(pair_paths(['x/b.png'], ['y/a.png', 'y/b.png', 'y/c.png']), [(0, 1), (None, 0), (None, 2)])
+        self.assertEqual(pair_paths([], ['y/a.png']), [(None, 0)])
+
+    def test_unrelated_paths_paired_in_order(self):
+        self.assertEqual(pair_paths(['1/p.bin', '2/q.bin'], ['3/r.dat', '4/s.dat']), [(0, 0), (1, 1)])
+
+    def test_large_group_uses_token_index(self):
+        paths1 = [f'zh/item_{i}.png' for i in range(100)]
+        paths2 = [f'en/item_{i}.png' for i in reversed(range(100))]
+        with mock.patch.object(path_pairing, '_candidate_pairs', wraps=path_pairing._candidate_pairs) as candidates:
+            pairs = pair_paths(paths1, paths2)
+        candidates.assert_called_once()
+        self.assertEqual(pairs, [(i, 99 - i) for i in range(100)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+感知哈希与近似图片分组（perceptual_hash）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+
+from PIL import Image
+
+from perceptual_hash import (PERCEPTUAL_ALGORITHMS, BKTree, available_perceptual_algorithms, format_hash,
+                             group_similar, hamming_distance, image_hash)
+
+
+class BKTreeTest(unittest.TestCase):
+
+    def test_search_matches_brute_force(self):
+        rng = random.Random(3)
+        hashes = [rng.getrandbits(64) for _ in range(500)]
+        # 加入一些只差几位的哈希，保证小阈值也有结果
+        hashes += [value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for value in hashes[:100]]
+        tree = BKTree()
+        for index, value in enumerate(hashes):
+            tree.add(value, index)
+
+        for query in hashes[:50] + [rng.getrandbits(64) for _ in range(20)]:
+            for max_distance in (0, 2, 8, 20):
+                expected = sorted(index for index, value in enumerate(hashes)
+                                  if hamming_distance(query, value) <= max_distance)
+                self.assertEqual(sorted(tree.search(query, max_distance)), expected)
+
+    def test_equal_hashes_share_a_node(self):
+        tree = BKTree()
+        for item in 'abc':
+            tree.add(0xFF, item)
+        self.assertEqual(sorted(tree.search(0xFF, 0)), ['a', 'b', 'c'])
+        self.assertEqual(BKTree().search(0, 64), [])
+
+
+class GroupSimilarTest(unittest.TestCase):
+
+    def test_transitive_groups_keep_input_order(self):
+        hashes = [('a', 0b0000), ('far', 0xFFFF0000), ('b', 0b0011), ('c', 0b1111), ('d', 0xFFFF0001)]
+        # a-b 距离2，b-c 距离2，a-c 距离4：按传递闭包合并为一组
+        self.assertEqual(group_similar(hashes, max_distance=2), [['a', 'b', 'c'], ['far', 'd']])
+        self.assertEqual(group_similar(hashes, max_distance=1), [['far', 'd']])
+
+    def test_singletons_dropped(self):
+        self.assertEqual(group_similar([('x', 0), ('y', (1 << 20) - 1)], max_distance=8), [])
+        self.assertEqual(group_similar([], max_distance=8), [])
+
+
+class FormatHashTest(unittest.TestCase):
+
+    def test_fixed_width(self):
+        self.assertEqual(format_hash(0xABC), '0000000000000abc')
+        self.assertEqual(hamming_distance(0b1011, 0b0001), 2)
+
+
+@unittest.skipUnless(available_perceptual_algorithms(), '需要安装 numpy')
+class ImageHashTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        rng = random.Random(5)
+        image = Image.new('RGB', (256, 256))
+        image.putdata([(rng.randrange(256), (x * 3) % 256, (y * 5) % 256)
+                       for y in range(256) for x in range(256)])
+        image = image.resize((64, 64)).resize((256, 256))
+        self.original = self.save(image, 'original.png')
+        self.resized = self.save(image.resize((180, 180)), 'resized.jpg', quality=80)
+        self.flipped = self.save(image.transpose(Image.Transpose.FLIP_LEFT_RIGHT), 'flipped.png')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def save(self, image, name, **options):
+        path = os.path.join(self.temp_dir.name, name)
+        image.save(path, **options)
+        return path
+
+    def test_reencoded_image_is_close(self):
+        for algorithm in PERCEPTUAL_ALGORITHMS:
+            original = image_hash(self.original, algorithm)
+            self.assertLessEqual(hamming_distance(original, image_hash(self.resized, algorithm)), 8, algorithm)
+            self.assertGreater(hamming_distance(original, image_hash(self.flipped, algorithm)), 8, algorithm)
+
+    def test_unreadable_image(self):
+        path = os.path.join(self.temp_dir.name, 'broken.png')
+        with open(path, 'wb') as f:
+            f.write(b'not an image')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(image_hash(path))
+        with self.assertRaises(ValueError):
+            image_hash(self.original, 'unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果输出后端（report_writers）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import csv
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+
+from report_writers import ParquetReportWriter, detect_format, open_report_writer, pyarrow, with_format_extension
+
+
+class FormatDetectionTest(unittest.TestCase):
+
+    def test_explicit_format_wins(self):
+        self.assertEqual(detect_format('report.csv', 'jsonl'), 'jsonl')
+
+    def test_format_from_extension(self):
+        self.assertEqual(detect_format('a/report.NDJSON'), 'jsonl')
+        self.assertEqual(detect_format('report.unknown'), 'xlsx')
+
+    def test_extension_added_only_when_missing(self):
+        self.assertEqual(with_format_extension('out.csv', 'csv'), 'out.csv')
+        self.assertEqual(with_format_extension('out', 'parquet'), 'out.parquet')
+
+
+class TextWritersTest(unittest.TestCase):
+
+    def test_csv_and_jsonl_rows(self):
+        rows = [{'group': 1, 'path': '目录/a.png', 'size': 10}, {'group': 2, 'path': None, 'size': None}]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, 'nested', 'r.csv')
+            jsonl_path = os.path.join(temp_dir, 'r.jsonl')
+            for path, report_format in ((csv_path, 'csv'), (jsonl_path, 'jsonl')):
+                with open_report_writer(path, ['group', 'path', 'size'], report_format) as writer:
+                    for row in rows:
+                        writer.write_row(row)
+                self.assertEqual(writer.row_count, 2)
+
+            with open(csv_path, encoding='utf-8-sig', newline='') as f:
+                self.assertEqual(list(csv.reader(f)), [['group', 'path', 'size'], ['1', '目录/a.png', '10'],
+                                                       ['2', '', '']])
+            with open(jsonl_path, encoding='utf-8') as f:
+                self.assertEqual([json.loads(line) for line in f], rows)
+
+
+@unittest.skipIf(pyarrow is None, '需要安装 pyarrow')
+class ParquetWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'r.parquet')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_column_empty_in_first_batch(self):
+        rows = [{'a': 1, 'b': None}, {'a': 2, 'b': None}, {'a': 3, 'b': 'q'}]
+        with ParquetReportWriter(self.path, ['a', 'b'], {'a': int}, batch_size=2) as writer:
+            for row in rows:
+                writer.write_row(row)
+
+        table = pyarrow.parquet.read_table(self.path)
+        self.assertEqual(table.to_pylist(), rows)
+        self.assertEqual(table.schema.field('a').type, pyarrow.int64())
+        self.assertEqual(table.schema.field('b').type, pyarrow.string())
+
+    def test_declared_types(self):
+        with open_report_writer(self.path, ['size', 'similarity', 'name'], 'parquet',
+                                {'size': int, 'similarity': float}) as writer:
+            writer.write_row({'size': None, 'similarity': 12.5, 'name': 'x'})
+
+        schema = pyarrow.parquet.read_schema(self.path)
+        self.assertEqual([field.type for field in schema],
+                         [pyarrow.int64(), pyarrow.float64(), pyarrow.string()])
+
+    def test_empty_report_keeps_schema(self):
+        with ParquetReportWriter(self.path, ['group', 'path'], {'group': int}):
+            pass
+
+        table = pyarrow.parquet.read_table(self.path)
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.field('group').type, pyarrow.int64())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量目录扫描（scan_snapshot）的测试
+运行：python -m pytest tests 或 python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+
+from file_walker import scandir_walk
+from scan_snapshot import ScanSnapshot
+
+# 测试目录的修改时间设为很久以前，超出“刚刚修改过”的窗口，快照会记录它们
+OLD_MTIME = 1500000000
+
+
+class ScanSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.temp_dir.name, 'tree')
+        self.snapshot_dir = os.path.join(self.temp_dir.name, 'snapshots')
+        for name in ('a', 'b', os.path.join('b', 'c')):
+            os.makedirs(os.path.join(self.root, name))
+            for i in range(2):
+                self.write(os.path.join(name, f'f{i}.txt'), name.encode() * (i + 1))
+        self.age_directories()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, relative_path, data):
+        with open(os.path.join(self.root, relative_path), 'wb') as f:
+            f.write(data)
+
+    def age_directories(self):
+        for current_dir, _, _ in os.walk(self.root):
+            os.utime(current_dir, (OLD_MTIME, OLD_MTIME))
+
+    def walk(self, **kwargs):
+        snapshot = ScanSnapshot(self.root, self.snapshot_dir, **kwargs)
+        entries = list(snapshot.walk())
+        snapshot.save()
+        return snapshot, entries
+
+    def test_unchanged_tree_reuses_every_directory(self):
+        first, entries = self.walk()
+        self.assertEqual((first.dirs_scanned, first.dirs_reused), (4, 0))
+        self.assertEqual(entries, list(scandir_walk(self.root)))
+
+        second, reused_entries = self.walk()
+        self.assertEqual((second.dirs_scanned, second.dirs_reused), (0, 4))
+        self.assertEqual(reused_entries, entries)
+
+    def test_changed_directory_rescanned(self):
+        self.walk()
+        self.write(os.path.join('b', 'new.txt'), b'new')
+        os.remove(os.path.join(self.root, 'a', 'f0.txt'))
+
+        snapshot, entries = self.walk()
+
+        self.assertEqual((snapshot.dirs_scanned, snapshot.dirs_reused), (2, 2))
+        self.assertEqual(sorted(entries), sorted(scandir_walk(self.root)))
+        names = {os.path.relpath(entry.path, self.root) for entry in entries}
+        self.assertIn(os.path.join('b', 'new.txt'), names)
+        self.assertNotIn(os.path.join('a', 'f0.txt'), names)
+
+    def test_in_place_rewrite_not_detected(self):
+        # 原地改写不改变目录的修改时间，快照中的文件信息不会更新（调用方需要自己重新读取）
+        self.walk()
+        path = os.path.join(self.root, 'a', 'f0.txt')
+        old_size = os.path.getsize(path)
+        self.write(os.path.join('a', 'f0.txt'), b'rewritten in place')
+        self.age_directories()
+
+        _, entries = self.walk()
+        entry = next(entry for entry in entries if entry.path == path)
+        self.assertEqual(entry.st_size, old_size)
+
+        _, rebuilt = self.walk(rebuild=True)
+        entry = next(entry for entry in rebuilt if entry.path == path)
+        self.assertEqual(entry.st_size, len(b'rewritten in place'))
+
+    def test_recently_modified_directory_not_trusted(self):
+        os.utime(os.path.join(self.root, 'a'))  # 修改时间为现在
+        self.walk()
+
+        snapshot, _ = self.walk()
+        self.assertEqual((snapshot.dirs_scanned, snapshot.dirs_reused), (1, 3))
+
+    def test_incomplete_walk_not_saved(self):
+        snapshot = ScanSnapshot(self.root, self.snapshot_dir)
+        walker = snapshot.walk()
+        next(walker)
+        walker.close()
+        snapshot.save()
+        self.assertFalse(os.path.exists(snapshot.path))
+
+    def test_corrupt_snapshot_falls_back_to_full_scan(self):
+        first, _ = self.walk()
+        with open(first.path, 'wb') as f:
+            f.write(b'not a pickle')
+
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            snapshot, entries = self.walk()
+        self.assertIn('无法读取扫描快照', output.getvalue())
+        self.assertEqual(snapshot.dirs_scanned, 4)
+        self.assertEqual(len(entries), 6)
+
+    def test_parallel_walk_same_order(self):
+        _, entries = self.walk()
+        snapshot = ScanSnapshot(self.root, self.snapshot_dir)
+        self.assertEqual(list(snapshot.walk(jobs=4)), entries)
+        self.assertEqual(snapshot.dirs_reused, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
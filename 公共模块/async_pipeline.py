@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio 流水线工具
+流水线的各个阶段同时运行，阶段之间用有界队列连接：下游处理不过来时上游的 put 会等待（背压），
+各队列的长度由全局内存预算换算，排队中的数据总量有上限
+阻塞操作（遍历目录、计算哈希、写入报告）放在线程中执行，不会阻塞事件循环；
+任何一个阶段出错时由 run_stages 取消其余阶段，并通知线程不再等待队列，错误原样抛出
+"""
+
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Iterable, Iterator, List, Optional, TypeVar
+
+R = TypeVar('R')
+
+# 默认的流水线内存预算（字节）
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# 队列中每个元素（文件路径、文件信息、哈希值等）的估算内存（字节）
+QUEUE_ITEM_BYTES = 1024
+
+# 队列结束标记：生产者放入后，消费者不再等待新的元素
+END_OF_QUEUE = object()
+
+# 线程等待队列操作时检查停止标记的间隔（秒）
+STOP_POLL_INTERVAL = 0.1
+
+
+def bounded_queue_size(memory_budget: int, queue_count: int, reserved_bytes: int = 0,
+                       item_bytes: int = QUEUE_ITEM_BYTES) -> int:
+    """
+    把全局内存预算平均分给流水线中的各个队列，换算为每个队列的最大长度
+
+    Args:
+        memory_budget: 内存预算（字节）
+        queue_count: 队列数量
+        reserved_bytes: 预算中预留给其他用途的部分（例如各线程的读取缓冲区）
+        item_bytes: 每个元素的估算内存
+
+    Returns:
+        每个队列的最大长度（至少为1）
+    """
+    return max(1, (memory_budget - reserved_bytes) // (queue_count * item_bytes))
+
+
+class PipelineStopped(Exception):
+    """流水线的其他阶段出错，线程中等待队列的迭代器抛出该异常退出"""
+
+
+def _wait_in_thread(coroutine, loop: asyncio.AbstractEventLoop, stop: Optional[threading.Event]):
+    """
+    在线程中把队列操作提交给事件循环并等待结果，等待期间定期检查停止标记
+
+    Raises:
+        PipelineStopped: stop 已被设置（其他阶段出错或被中断）
+    """
+    future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+    while True:
+        try:
+            return future.result(timeout=STOP_POLL_INTERVAL)
+        except FutureTimeoutError:
+            if stop is not None and stop.is_set():
+                future.cancel()
+                raise PipelineStopped()
+
+
+async def produce_from_thread(iterable: Iterable[Any], queue: asyncio.Queue,
+                              stop: Optional[threading.Event] = None):
+    """
+    在线程中迭代阻塞的可迭代对象（例如目录遍历），逐个放入异步队列，完成后放入 END_OF_QUEUE
+
+    队列满时迭代线程会等待，迭代速度受下游阶段的处理速度限制；stop 被设置时线程不再等待，直接退出
+
+    Args:
+        iterable: 阻塞的可迭代对象
+        queue: 异步队列
+        stop: 停止标记（通常由 run_stages 在某个阶段出错时设置）
+    """
+    loop = asyncio.get_running_loop()
+
+    def run():
+        try:
+            for item in iterable:
+                _wait_in_thread(queue.put(item), loop, stop)
+            _wait_in_thread(queue.put(END_OF_QUEUE), loop, stop)
+        except PipelineStopped:
+            pass
+
+    await loop.run_in_executor(None, run)
+
+
+async def consume_in_thread(func: Callable[[Iterator[Any]], R], queue: asyncio.Queue,
+                            stop: Optional[threading.Event] = None) -> R:
+    """
+    在线程中执行 func(迭代器)（例如写入报告），迭代器从异步队列逐个取出元素，遇到 END_OF_QUEUE 时结束
+
+    stop 被设置时迭代器抛出 PipelineStopped，func 随之中止
+
+    Args:
+        func: 接受一个迭代器的阻塞函数
+        queue: 异步队列
+        stop: 停止标记（通常由 run_stages 在某个阶段出错时设置）
+
+    Returns:
+        func 的返回值
+    """
+    loop = asyncio.get_running_loop()
+
+    def items():
+        while True:
+            item = _wait_in_thread(queue.get(), loop, stop)
+            if item is END_OF_QUEUE:
+                return
+            yield item
+
+    return await loop.run_in_executor(None, func, items())
+
+
+async def run_stages(*stages: Awaitable[Any], stop: Optional[threading.Event] = None) -> List[Any]:
+    """
+    同时运行流水线的各个阶段（代替 asyncio.gather）
+
+    任何一个阶段出错（或整个流水线被取消、Ctrl-C）时，设置 stop 让线程中的生产者/消费者退出，
+    取消其余阶段并等待它们结束，再抛出第一个错误；不会有线程一直阻塞在已满或已空的队列上
+
+    Args:
+        stages: 各阶段的协程
+        stop: 停止标记，与传给 produce_from_thread / consume_in_thread 的相同
+
+    Returns:
+        各阶段的返回值（与 stages 顺序相同）
+    """
+    tasks = [asyncio.ensure_future(stage) for stage in stages]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        if not all(task.done() for task in tasks) or _first_error(tasks):
+            if stop is not None:
+                stop.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    error = _first_error(tasks)
+    if error is not None:
+        raise error
+    return [task.result() for task in tasks]
+
+
+def _first_error(tasks: List[asyncio.Future]) -> Optional[BaseException]:
+    """已完成（未被取消）的任务中第一个抛出的异常"""
+    return next((task.exception() for task in tasks
+                 if task.done() and not task.cancelled() and task.exception() is not None), None)
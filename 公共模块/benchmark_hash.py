@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件哈希读取方式性能对比
+对比原来的 4KB 分块读取循环与 hash_engine.hash_file（大缓冲区 readinto / mmap）的吞吐量
+使用示例：
+    python benchmark_hash.py            # 生成256MB临时文件进行测试
+    python benchmark_hash.py 1024       # 生成1024MB临时文件进行测试
+    python benchmark_hash.py 0 D:/a.pak # 使用已有文件进行测试
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+import hash_engine
+
+
+def hash_4k_loop(file_path):
+    """原来的实现：每次读取4096字节"""
+    md5_hash = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(4096), b''):
+            md5_hash.update(chunk)
+    return md5_hash.hexdigest()
+
+
+def run_case(name, func, file_path, file_size, repeat=3):
+    """运行多次取最快的一次，输出吞吐量"""
+    best = None
+    digest = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        digest = func(file_path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<32} {best:8.3f} 秒  {file_size / best / 1024 / 1024:10.1f} MB/s  {digest}")
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) >= 2 else 256
+    file_path = sys.argv[2] if len(sys.argv) >= 3 else None
+
+    temp_path = None
+    if not file_path:
+        temp = tempfile.NamedTemporaryFile(delete=False, suffix='.bin')
+        block = os.urandom(1024 * 1024)
+        for _ in range(size_mb):
+            temp.write(block)
+        temp.close()
+        file_path = temp_path = temp.name
+
+    try:
+        file_size = os.path.getsize(file_path)
+        print(f"测试文件: {file_path} ({file_size / 1024 / 1024:.0f} MB)，每种方式运行3次取最快值")
+        print("（文件已在系统页缓存中，结果反映的是Python层面的读取和计算开销）\n")
+        run_case("4KB read() 循环（原实现）", hash_4k_loop, file_path, file_size)
+        for buffer_kb in (64, 256, 1024, 4096):
+            # 关闭mmap分支，单独测试readinto的效果
+            hash_engine.MMAP_THRESHOLD = file_size + 1
+            run_case(f"readinto 缓冲区 {buffer_kb}KB",
+                     lambda path: hash_engine.hash_file(path, 'md5', buffer_kb * 1024),
+                     file_path, file_size)
+        hash_engine.MMAP_THRESHOLD = 0
+        run_case("mmap 整体映射", lambda path: hash_engine.hash_file(path, 'md5'), file_path, file_size)
+    finally:
+        if temp_path:
+            os.unlink(temp_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容定义分块（content-defined chunking）
+用 Gear 滚动哈希在文件内容上寻找切分点：切分点只由附近32个字节决定，文件中间插入或删除数据时，
+只有附近的块发生变化，其余块的摘要不变；两个版本的大文件共有的块即为相同的内容，可以估算补丁大小
+安装 numpy 时按整个数据块向量化计算滚动哈希，否则逐字节计算（结果相同，但慢很多）
+"""
+
+import hashlib
+import random
+from typing import List, Tuple
+
+try:
+    import numpy as np  # 可选依赖：pip install numpy
+except ImportError:
+    np = None
+
+# 默认的平均块大小（字节），最小、最大块大小为其 1/4 和 4 倍
+DEFAULT_AVERAGE_CHUNK_SIZE = 32 * 1024
+
+# 每次读取的数据量
+_READ_SIZE = 8 * 1024 * 1024
+
+# 滚动哈希为32位，每个位置的哈希值只取决于最近32个字节
+_WINDOW_SIZE = 32
+_HASH_BITS = 32
+
+# Gear 表：每个字节值对应一个固定的32位随机数（固定种子，各次运行的切分点一致）
+_rng = random.Random(0x67656172)
+_GEAR = [_rng.getrandbits(_HASH_BITS) for _ in range(256)]
+del _rng
+
+# 一个块：(块摘要, 块长度)
+Chunk = Tuple[bytes, int]
+
+
+def fast_chunking_available() -> bool:
+    """
+    是否可以向量化计算滚动哈希
+
+    Returns:
+        安装了numpy时为True
+    """
+    return np is not None
+
+
+def _boundary_mask(average_size: int) -> int:
+    """切分条件的掩码：取哈希的高位（Gear 哈希的低位只取决于最近几个字节）"""
+    bits = max(1, average_size.bit_length() - 1)
+    return ((1 << bits) - 1) << (_HASH_BITS - bits)
+
+
+def _boundary_offsets(window: bytes, skip: int, mask: int) -> List[int]:
+    """
+    找出 window 中满足切分条件的位置
+
+    Args:
+        window: 数据（前 skip 个字节只作为滚动哈希的上下文）
+        skip: 上下文长度（不超过 _WINDOW_SIZE - 1）
+        mask: 切分条件的掩码
+
+    Returns:
+        切分点列表：块结束位置相对于 window[skip:] 开头的偏移（升序）
+    """
+    if np is not None:
+        gear = np.array(_GEAR, dtype=np.uint32)[np.frombuffer(window, dtype=np.uint8)]
+        hashes = gear.copy()
+        for shift in range(1, _WINDOW_SIZE):
+            hashes[shift:] += gear[:-shift] << np.uint32(shift)
+        return (np.flatnonzero((hashes[skip:] & np.uint32(mask)) == 0) + 1).tolist()
+
+    offsets = []
+    value = 0
+    for position, byte in enumerate(window):
+        value = ((value << 1) + _GEAR[byte]) & 0xFFFFFFFF
+        if position >= skip and not value & mask:
+            offsets.append(position - skip + 1)
+    return offsets
+
+
+def chunk_file(file_path: str, average_size: int = DEFAULT_AVERAGE_CHUNK_SIZE) -> List[Chunk]:
+    """
+    把文件切分为内容定义的块
+
+    Args:
+        file_path: 文件路径
+        average_size: 平均块大小（字节，按2的幂取整）
+
+    Returns:
+        按文件顺序排列的 (块摘要（16字节 BLAKE2b）, 块长度) 列表，无法读取时返回空列表
+    """
+    min_size = max(average_size // 4, 1)
+    max_size = average_size * 4
+    mask = _boundary_mask(average_size)
+
+    chunks = []
+    pending = b''   # 上一个切分点之后、还没有成块的数据
+    context = b''   # pending 之前的最多 _WINDOW_SIZE - 1 个字节（滚动哈希的上下文）
+    try:
+        with open(file_path, 'rb') as f:
+            while True:
+                block = f.read(_READ_SIZE)
+                data = pending + block
+                if not block:
+                    if data:
+                        chunks.append((hashlib.blake2b(data, digest_size=16).digest(), len(data)))
+                    return chunks
+
+                offsets = _boundary_offsets(context + data, len(context), mask)
+                start = 0
+                index = 0
+                while True:
+                    # 跳过距上一个切分点不足最小块大小的候选切分点
+                    while index < len(offsets) and offsets[index] - start < min_size:
+                        index += 1
+                    if index < len(offsets) and offsets[index] - start <= max_size:
+                        end = offsets[index]
+                    elif len(data) - start >= max_size:
+                        end = start + max_size
+                    else:
+                        break
+                    chunks.append((hashlib.blake2b(data[start:end], digest_size=16).digest(), end - start))
+                    start = end
+                if start >= _WINDOW_SIZE - 1:
+                    context = data[start - _WINDOW_SIZE + 1:start]
+                elif start:
+                    context = (context + data[:start])[-(_WINDOW_SIZE - 1):]
+                pending = data[start:]
+    except OSError as e:
+        print(f"  警告: 无法读取文件 {file_path}: {e}")
+        return []
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel分片导出
+结果行数超过Excel单个工作表的行数上限（1,048,576 行）时，把结果按组拆分到多个工作簿，
+同一组的文件始终在同一个分片中；各分片相互独立，可以用多进程并行写入，
+另外生成一个汇总工作簿列出每个分片包含的组
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import openpyxl
+from openpyxl.styles import Alignment, Font, PatternFill
+
+# Excel单个工作表的最大行数
+EXCEL_MAX_ROWS = 1048576
+
+
+def plan_shards(row_counts: Sequence[int], max_rows: int) -> List[Tuple[int, int]]:
+    """
+    按顺序把各组分配到分片中，每个分片的行数不超过 max_rows，且不拆分任何一组
+
+    单独一组就超过 max_rows 时，该组独占一个分片（此时该分片仍会超过上限）
+
+    Args:
+        row_counts: 每组占用的行数
+        max_rows: 每个分片最多的数据行数（不含表头）
+
+    Returns:
+        分片列表，每个元素为 (起始组下标, 结束组下标)，左闭右开
+    """
+    shards = []
+    start = 0
+    rows = 0
+    for index, count in enumerate(row_counts):
+        if rows and rows + count > max_rows:
+            shards.append((start, index))
+            start = index
+            rows = 0
+        rows += count
+    if start < len(row_counts):
+        shards.append((start, len(row_counts)))
+    return shards
+
+
+def shard_path(output_path: str, shard_index: int) -> str:
+    """
+    分片文件路径：在原文件名后加 _partN
+
+    Args:
+        output_path: 原输出文件路径
+        shard_index: 分片序号（从1开始）
+
+    Returns:
+        分片文件路径
+    """
+    base, extension = os.path.splitext(output_path)
+    return f"{base}_part{shard_index}{extension}"
+
+
+def run_shards(export_func: Callable, shard_args: List[tuple], jobs: int = 1):
+    """
+    写入所有分片，jobs大于1时使用多进程并行写入（openpyxl为纯Python实现，多线程无法加速）
+
+    Args:
+        export_func: 写入单个分片的函数（必须是模块级函数，以便传给子进程）
+        shard_args: 每个分片的参数元组
+        jobs: 并行进程数
+    """
+    if jobs <= 1 or len(shard_args) <= 1:
+        for args in shard_args:
+            export_func(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(shard_args))) as executor:
+        futures = [executor.submit(export_func, *args) for args in shard_args]
+        for future in futures:
+            future.result()
+
+
+def write_shard_summary(output_path: str, shards: List[Dict]):
+    """
+    生成分片汇总工作簿
+
+    Args:
+        output_path: 汇总工作簿路径
+        shards: 每个分片的信息，包含 file(分片文件路径)、first_group、last_group、group_count、row_count
+    """
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "分片汇总"
+
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+
+    headers = ["分片", "文件", "起始组号", "结束组号", "组数", "行数"]
+    for col, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+
+    for index, shard in enumerate(shards, 1):
+        ws.append([index, os.path.basename(shard['file']), shard['first_group'], shard['last_group'],
+                   shard['group_count'], shard['row_count']])
+
+    ws.column_dimensions['A'].width = 8
+    ws.column_dimensions['B'].width = 60
+    ws.column_dimensions['C'].width = 12
+    ws.column_dimensions['D'].width = 12
+    ws.column_dimensions['E'].width = 12
+    ws.column_dimensions['F'].width = 12
+    ws.freeze_panes = 'A2'
+
+    wb.save(output_path)
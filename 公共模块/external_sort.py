@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部排序（数据量超过内存时使用）
+记录先在内存中累积，每满 run_size 条就排序后写入临时文件（一个有序段），
+最后用堆对所有有序段做多路归并，按顺序逐条产生记录；内存中只保留一个缓冲区和每个段的当前记录
+记录为只包含 int / bytes / str / tuple 的元组，按元组大小比较排序
+"""
+
+import heapq
+import marshal
+import os
+import struct
+import tempfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# 默认每个有序段的记录数（每条文件记录约200~300字节，100万条约占用几百MB内存）
+DEFAULT_RUN_SIZE = 1000000
+
+# 一次最多同时归并的有序段数（有序段过多时先分批归并，避免同时打开太多文件）
+MAX_MERGE_FAN_IN = 128
+
+# 写入临时文件时每个数据块的记录数
+_BLOCK_RECORDS = 4096
+_BLOCK_HEADER = struct.Struct('<I')
+
+
+def _write_run(path: str, records: Iterable[Tuple]):
+    """把有序的记录按块写入临时文件（每块为 长度 + marshal 序列化的记录列表）"""
+    with open(path, 'wb') as f:
+        block = []
+        for record in records:
+            block.append(record)
+            if len(block) >= _BLOCK_RECORDS:
+                data = marshal.dumps(block)
+                f.write(_BLOCK_HEADER.pack(len(data)))
+                f.write(data)
+                block = []
+        if block:
+            data = marshal.dumps(block)
+            f.write(_BLOCK_HEADER.pack(len(data)))
+            f.write(data)
+
+
+def _read_run(path: str) -> Iterator[Tuple]:
+    """按顺序读取临时文件中的记录"""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(_BLOCK_HEADER.size)
+            if not header:
+                return
+            yield from marshal.loads(f.read(_BLOCK_HEADER.unpack(header)[0]))
+
+
+class ExternalSorter:
+    """外部排序器：add() 逐条添加记录，sorted() 按顺序产生全部记录（可用作上下文管理器，退出时删除临时文件）"""
+
+    def __init__(self, run_size: int = DEFAULT_RUN_SIZE, temp_dir: Optional[str] = None):
+        """
+        Args:
+            run_size: 内存中最多累积的记录数，超过时写出一个有序段
+            temp_dir: 临时文件所在目录，为None时使用系统临时目录（需要有足够空间）
+        """
+        self.run_size = max(run_size, 1)
+        self.count = 0
+        self._buffer: List[Tuple] = []
+        self._runs: List[str] = []
+        self._run_serial = 0
+        self._temp = tempfile.TemporaryDirectory(prefix='external_sort_', dir=temp_dir)
+
+    def add(self, record: Tuple):
+        """添加一条记录"""
+        self._buffer.append(record)
+        self.count += 1
+        if len(self._buffer) >= self.run_size:
+            self._spill()
+
+    @property
+    def run_count(self) -> int:
+        """已写入临时文件的有序段数"""
+        return len(self._runs)
+
+    def sorted(self) -> Iterator[Tuple]:
+        """
+        按顺序产生全部记录（只能调用一次）
+
+        Returns:
+            记录迭代器；所有记录都在内存中时直接排序，不写临时文件
+        """
+        if not self._runs:
+            self._buffer.sort()
+            records, self._buffer = self._buffer, []
+            return iter(records)
+        self._spill()
+        while len(self._runs) > MAX_MERGE_FAN_IN:
+            batch, self._runs = self._runs[:MAX_MERGE_FAN_IN], self._runs[MAX_MERGE_FAN_IN:]
+            self._runs.append(self._new_run_path())
+            _write_run(self._runs[-1], heapq.merge(*(_read_run(path) for path in batch)))
+            for path in batch:
+                os.remove(path)
+        return heapq.merge(*(_read_run(path) for path in self._runs))
+
+    def close(self):
+        """删除临时文件"""
+        self._buffer = []
+        self._temp.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _new_run_path(self) -> str:
+        self._run_serial += 1
+        return os.path.join(self._temp.name, f'run_{self._run_serial}.bin')
+
+    def _spill(self):
+        """把缓冲区排序后写出为一个有序段"""
+        if not self._buffer:
+            return
+        self._buffer.sort()
+        path = self._new_run_path()
+        _write_run(path, self._buffer)
+        self._runs.append(path)
+        self._buffer = []
+
+
+def records_with_shared_key(records: Iterable[Tuple], key) -> Iterator[Tuple]:
+    """
+    从按 key 排序的记录流中，只产生 key 至少出现两次的记录
+
+    只向前看一条记录，不需要把同一 key 的整组记录读入内存
+
+    Args:
+        records: 已按 key 排序的记录
+        key: 取记录键的函数
+
+    Returns:
+        记录迭代器（保持输入顺序）
+    """
+    previous = None
+    previous_key = object()
+    previous_yielded = False
+    for record in records:
+        record_key = key(record)
+        if record_key == previous_key:
+            if not previous_yielded:
+                yield previous
+            yield record
+            previous_yielded = True
+        else:
+            previous_yielded = False
+        previous, previous_key = record, record_key
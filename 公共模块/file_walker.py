@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于 os.scandir 的目录遍历
+每个文件只通过 DirEntry 读取一次文件信息（大小、修改时间、inode），
+调用方不需要再 os.path.join / os.path.getsize / os.path.getmtime，
+在NFS等网络存储上可以省去大部分往返请求
+
+jobs 大于1时由线程池并发列出目录（高延迟的网络存储上，每次列目录都要等待服务器响应），
+产生文件的顺序仍与单线程遍历完全一致
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, NamedTuple, Tuple
+
+
+class FileEntry(NamedTuple):
+    """扫描到的文件（字段名与 os.stat_result 一致，可以直接传给 HashCache）"""
+    path: str
+    st_size: int
+    st_mtime_ns: int
+    st_ino: int
+
+
+# 一个目录的列表结果：(((文件名, 大小, 修改时间, inode), ...), (子目录名, ...))
+DirectoryListing = Tuple[Tuple[Tuple[str, int, int, int], ...], Tuple[str, ...]]
+
+
+def list_directory(current_dir: str) -> DirectoryListing:
+    """
+    列出目录中的文件和子目录，文件信息直接取自 DirEntry
+
+    指向目录的符号链接既不作为文件也不进入（与 os.walk 一致），指向文件的符号链接读取目标文件的信息
+
+    Args:
+        current_dir: 目录路径
+
+    Returns:
+        (文件列表, 子目录名列表)，顺序与 os.scandir 一致；无法读取的文件或目录会打印警告并跳过
+    """
+    files: List[Tuple[str, int, int, int]] = []
+    subdirs: List[str] = []
+    try:
+        with os.scandir(current_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            subdirs.append(entry.name)
+                        continue
+                    st = entry.stat()
+                except OSError as e:
+                    print(f"  警告: 无法读取文件 {entry.path}: {e}")
+                    continue
+                # Windows上 DirEntry.stat() 不含inode，需要时再单独读取
+                inode = st.st_ino or entry.inode()
+                files.append((entry.name, st.st_size, st.st_mtime_ns, inode))
+    except OSError as e:
+        print(f"  警告: 无法读取目录 {current_dir}: {e}")
+    return tuple(files), tuple(subdirs)
+
+
+def walk_directories(directory: str, list_func: Callable[[str], DirectoryListing] = list_directory,
+                     jobs: int = 1) -> Iterator[Tuple[str, DirectoryListing]]:
+    """
+    深度优先遍历目录树，逐个产生 (目录路径, 列表结果)，顺序与 os.walk 自上而下遍历一致
+
+    jobs 大于1时由线程池提前列出接下来要遍历的目录（栈顶的目录），同一时间最多 jobs * 4 个目录
+    在排队或已列出但还没有被取走，宽目录树也不会提前读入整棵树；
+    调用方仍按深度优先的顺序取结果，因此产出顺序与单线程完全相同
+
+    Args:
+        directory: 要遍历的目录（产生的路径以它为前缀）
+        list_func: 列出一个目录的函数，返回 (文件列表, 子目录名列表)
+        jobs: 并发列目录的线程数
+
+    Returns:
+        (目录路径, 列表结果) 迭代器
+    """
+    if jobs <= 1:
+        stack = [directory]
+        while stack:
+            current_dir = stack.pop()
+            listing = list_func(current_dir)
+            yield current_dir, listing
+            stack.extend(os.path.join(current_dir, name) for name in reversed(listing[1]))
+        return
+
+    max_pending = jobs * 4
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        # 栈中每项为 [目录路径, Future]，还没有提交的目录 Future 为None
+        stack = [[directory, None]]
+        pending = 0
+        while stack:
+            # 从栈顶开始提交接下来最先要取的目录，直到排队的目录数达到上限
+            index = len(stack) - 1
+            while pending < max_pending and index >= 0:
+                if stack[index][1] is None:
+                    stack[index][1] = executor.submit(list_func, stack[index][0])
+                    pending += 1
+                index -= 1
+            current_dir, future = stack.pop()
+            pending -= 1
+            listing = future.result()
+            yield current_dir, listing
+            stack.extend([os.path.join(current_dir, name), None] for name in reversed(listing[1]))
+
+
+def scandir_walk(directory: str, jobs: int = 1) -> Iterator[FileEntry]:
+    """
+    遍历目录下的所有文件（深度优先，顺序与 os.walk 自上而下遍历一致）
+
+    Args:
+        directory: 要遍历的目录（产生的文件路径以它为前缀）
+        jobs: 并发列目录的线程数
+
+    Returns:
+        FileEntry 迭代器
+    """
+    for current_dir, (files, _) in walk_directories(directory, list_directory, jobs):
+        for name, size, mtime_ns, inode in files:
+            yield FileEntry(os.path.join(current_dir, name), size, mtime_ns, inode)
+
+
+def walk_files(directory: str, snapshot=None, jobs: int = 1) -> Iterator[FileEntry]:
+    """
+    遍历目录下的所有文件，逐个产生文件路径和大小、修改时间、inode
+
+    Args:
+        directory: 要遍历的目录
+        snapshot: 扫描快照（scan_snapshot.ScanSnapshot），指定时只重新扫描修改时间有变化的目录
+        jobs: 并发列目录的线程数（网络存储上建议8~32）
+
+    Returns:
+        FileEntry 迭代器，顺序与 os.walk 一致（与 jobs 无关）；无法读取的文件会打印警告并跳过
+    """
+    if snapshot is not None:
+        return snapshot.walk(jobs)
+    return scandir_walk(directory, jobs)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化哈希缓存
+使用SQLite保存每个文件的哈希值以及计算时的文件大小、修改时间(mtime_ns)和inode，
+再次运行时只有这三项之一发生变化的文件才需要重新计算哈希
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Callable, Iterable, Optional
+
+# 默认的缓存文件名（放在输出文件旁边）
+DEFAULT_CACHE_NAME = '.hash_cache.sqlite3'
+
+
+class HashCache:
+    """文件哈希缓存（线程安全，可在并行哈希引擎的工作线程中直接使用）"""
+
+    def __init__(self, db_path: str, rebuild: bool = False, flush_size: int = 1000):
+        """
+        打开（或创建）缓存数据库
+
+        Args:
+            db_path: 缓存数据库文件路径
+            rebuild: 是否清空已有缓存，全部重新计算
+            flush_size: 累计多少条新记录后写入一次数据库
+        """
+        self.db_path = db_path
+        self.flush_size = flush_size
+        self.hits = 0
+        self.misses = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        if rebuild:
+            self._conn.execute('DROP TABLE IF EXISTS file_hash')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS file_hash ('
+            '  path TEXT NOT NULL,'
+            '  kind TEXT NOT NULL,'
+            '  size INTEGER NOT NULL,'
+            '  mtime_ns INTEGER NOT NULL,'
+            '  inode INTEGER NOT NULL,'
+            '  digest TEXT NOT NULL,'
+            '  PRIMARY KEY (path, kind)'
+            ')'
+        )
+        self._conn.commit()
+
+    def get(self, file_path: str, stat_result: os.stat_result, kind: str) -> Optional[str]:
+        """
+        查询缓存的哈希值
+
+        Args:
+            file_path: 文件路径
+            stat_result: 文件当前的 os.stat 结果
+            kind: 哈希类型（例如 'md5'、'md5-head-tail-4096'）
+
+        Returns:
+            文件未变化时返回缓存的哈希值，否则返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size, mtime_ns, inode, digest FROM file_hash WHERE path = ? AND kind = ?',
+                (os.path.abspath(file_path), kind)
+            ).fetchone()
+            if row and row[:3] == (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino):
+                self.hits += 1
+                return row[3]
+            self.misses += 1
+            return None
+
+    def put(self, file_path: str, stat_result: os.stat_result, kind: str, digest: str):
+        """
+        写入（或更新）一条缓存记录
+
+        Args:
+            file_path: 文件路径
+            stat_result: 计算哈希时文件的 os.stat 结果
+            kind: 哈希类型
+            digest: 哈希值
+        """
+        with self._lock:
+            self._pending.append((os.path.abspath(file_path), kind, stat_result.st_size,
+                                  stat_result.st_mtime_ns, stat_result.st_ino, digest))
+            if len(self._pending) >= self.flush_size:
+                self._flush()
+
+    def prune(self, directory: str, existing_paths: Iterable[str]) -> int:
+        """
+        删除目录下已不存在的文件的缓存记录
+
+        Args:
+            directory: 本次扫描的目录
+            existing_paths: 本次扫描到的所有文件路径
+
+        Returns:
+            删除的记录数
+        """
+        existing = {os.path.abspath(path) for path in existing_paths}
+        prefix = os.path.join(os.path.abspath(directory), '')
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(
+                'SELECT DISTINCT path FROM file_hash WHERE substr(path, 1, ?) = ?',
+                (len(prefix), prefix)
+            ).fetchall()
+            removed = [(path,) for (path,) in rows if path not in existing]
+            self._conn.executemany('DELETE FROM file_hash WHERE path = ?', removed)
+            self._conn.commit()
+        return len(removed)
+
+    def close(self):
+        """写入未保存的记录并关闭数据库"""
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+    def _flush(self):
+        """把待写入的记录批量写入数据库（调用方需持有锁）"""
+        if self._pending:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO file_hash (path, kind, size, mtime_ns, inode, digest) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                self._pending
+            )
+            self._conn.commit()
+            self._pending = []
+
+
+def cached_hash(cache: Optional[HashCache], file_path: str, stat_result: os.stat_result,
+                kind: str, compute: Callable[[], Optional[str]]) -> Optional[str]:
+    """
+    优先从缓存读取哈希值，缓存未命中时调用 compute() 计算并写入缓存
+
+    Args:
+        cache: 哈希缓存，为None时不使用缓存
+        file_path: 文件路径
+        stat_result: 文件当前的 os.stat 结果
+        kind: 哈希类型
+        compute: 计算哈希的函数，失败时返回None或空字符串
+
+    Returns:
+        哈希值，计算失败时返回 compute() 的返回值
+    """
+    if cache is None:
+        return compute()
+    digest = cache.get(file_path, stat_result, kind)
+    if digest is None:
+        digest = compute()
+        if digest:
+            cache.put(file_path, stat_result, kind, digest)
+    return digest
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行哈希引擎
+使用线程池并发计算文件哈希，结果按输入顺序返回，保证输出稳定
+（hashlib 在计算较大数据块时会释放GIL，多线程可以同时进行磁盘读取和摘要计算）
+"""
+
+import hashlib
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+try:
+    import xxhash  # 可选依赖：pip install xxhash
+except ImportError:
+    xxhash = None
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# 默认读取缓冲区大小（1MB）
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+# 超过该大小的文件使用mmap映射后一次性计算哈希（64MB）
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+# 可选的哈希算法
+# blake2b 使用16字节摘要（与MD5长度相同），速度通常快于MD5；xxh3/xxh64 为非加密哈希，需要安装xxhash
+HASH_ALGORITHMS = ('md5', 'sha1', 'sha256', 'blake2b', 'xxh3', 'xxh64')
+# 对哈希值相同的文件组进行复核时使用的强哈希算法
+STRONG_HASH_ALGORITHM = 'sha256'
+
+
+def available_algorithms() -> List[str]:
+    """
+    当前环境可用的哈希算法
+
+    Returns:
+        算法名列表（未安装xxhash时不包含xxh3/xxh64）
+    """
+    return [name for name in HASH_ALGORITHMS if xxhash is not None or not name.startswith('xxh')]
+
+
+def new_hasher(algorithm: str = 'md5'):
+    """
+    创建哈希对象
+
+    Args:
+        algorithm: 算法名，见 HASH_ALGORITHMS
+
+    Returns:
+        带有 update()/hexdigest() 方法的哈希对象
+    """
+    if algorithm == 'blake2b':
+        return hashlib.blake2b(digest_size=16)
+    if algorithm.startswith('xxh'):
+        if xxhash is None:
+            raise ValueError(f"哈希算法 {algorithm} 需要安装 xxhash: pip install xxhash")
+        return xxhash.xxh3_128() if algorithm == 'xxh3' else xxhash.xxh64()
+    return hashlib.new(algorithm)
+
+
+def hash_file(file_path: str, algorithm: str = 'md5', buffer_size: int = DEFAULT_BUFFER_SIZE) -> str:
+    """
+    计算文件的哈希值
+
+    使用可复用的 bytearray 缓冲区配合 readinto 读取，避免每次读取都创建新的bytes对象；
+    大文件使用mmap映射，由hashlib直接对整个映射区计算（计算期间释放GIL）
+
+    Args:
+        file_path: 文件路径
+        algorithm: 算法名，见 HASH_ALGORITHMS
+        buffer_size: 读取缓冲区大小（字节）
+
+    Returns:
+        文件的哈希值（十六进制字符串），读取失败时抛出 OSError
+    """
+    hasher = new_hasher(algorithm)
+    with open(file_path, 'rb', buffering=0) as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size >= MMAP_THRESHOLD:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    hasher.update(mapped)
+                return hasher.hexdigest()
+            except (OSError, ValueError):
+                # 部分文件系统（如某些网络挂载）不支持mmap，退回到缓冲区读取
+                hasher = new_hasher(algorithm)
+                f.seek(0)
+
+        buffer = bytearray(buffer_size)
+        view = memoryview(buffer)
+        while True:
+            read_size = f.readinto(buffer)
+            if not read_size:
+                break
+            hasher.update(view[:read_size])
+    return hasher.hexdigest()
+
+
+def default_jobs() -> int:
+    """
+    默认的并发线程数
+
+    Returns:
+        CPU核心数（至少为1）
+    """
+    return os.cpu_count() or 1
+
+
+def parallel_map(func: Callable[[T], R], items: Iterable[T], jobs: int = 1,
+                 use_processes: bool = False) -> Iterator[R]:
+    """
+    并发执行 func(item)，按输入顺序逐个返回结果
+
+    同一时间最多只有 jobs * 4 个任务在排队，文件数量很大时也不会占用过多内存
+
+    Args:
+        func: 对每个元素执行的函数（例如计算文件哈希）
+        items: 待处理的元素
+        jobs: 并发线程（进程）数，小于等于1时直接串行执行
+        use_processes: 是否使用进程池（适合图片解码等持有GIL的计算，func必须是可序列化的模块级函数）
+
+    Returns:
+        结果迭代器，顺序与输入顺序一致
+    """
+    if jobs <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    max_pending = jobs * 4
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=jobs) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def split_by_hash(groups: Dict[str, List[str]], hash_func: Callable[[str], Optional[str]],
+                  jobs: int = 1) -> Dict[str, List[str]]:
+    """
+    用另一个哈希函数重新计算每组文件的哈希，把组内哈希不同的文件拆开
+
+    用于快速哈希分组后的强哈希复核：只需要重新计算已经分在同一组的文件
+
+    Args:
+        groups: 分组结果，key为哈希值，value为文件路径列表
+        hash_func: 计算单个文件哈希的函数，失败时返回None或空字符串
+        jobs: 并发线程数
+
+    Returns:
+        按新哈希值重新分组后的结果（只保留文件数量大于1的组，顺序与原分组一致）
+    """
+    file_paths = [path for paths in groups.values() for path in paths]
+    regrouped = {}
+    for file_path, digest in zip(file_paths, parallel_map(hash_func, file_paths, jobs)):
+        if digest:
+            regrouped.setdefault(digest, []).append(file_path)
+    return {digest: paths for digest, paths in regrouped.items() if len(paths) > 1}
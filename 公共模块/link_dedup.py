@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用硬链接或 reflink 合并重复文件，回收磁盘空间
+每组重复文件保留第一个文件，其余文件逐字节比较确认内容相同后，替换为指向保留文件的硬链接
+（或 reflink：共享数据块的独立文件，文件系统支持时使用，如 Btrfs、XFS、APFS）
+
+每次替换前先把原文件的权限、属主和时间写入日志（JSON Lines），rollback_journal 按日志把链接恢复为独立的文件
+注意：硬链接与保留文件共用同一个文件，权限、修改时间以保留文件为准，修改其中一个会同时改变另一个
+"""
+
+import ctypes
+import errno
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import fcntl  # Linux 下通过 FICLONE ioctl 创建 reflink
+except ImportError:
+    fcntl = None
+
+from hash_engine import DEFAULT_BUFFER_SIZE
+
+# 链接方式：hardlink 硬链接；reflink 共享数据块的副本；auto 优先reflink，不支持时使用硬链接
+LINK_METHODS = ('hardlink', 'reflink', 'auto')
+
+# Linux 的 FICLONE ioctl 请求码（_IOW(0x94, 9, int)）
+_FICLONE = 0x40049409
+
+# 替换过程中使用的临时文件后缀（临时文件与目标文件在同一目录，名称随机生成，os.replace 可以原子替换；
+# 中途中断时可能留下 .文件名.随机字符.link_dedup_tmp，可以直接删除）
+_TEMP_SUFFIX = '.link_dedup_tmp'
+
+# 文件系统不支持 reflink 时的错误码
+_REFLINK_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS}
+
+
+class LinkSummary(NamedTuple):
+    """合并结果统计"""
+    linked: int           # 替换为链接的文件数（试运行时为可以替换的文件数）
+    skipped: int          # 跳过的文件数（已经是同一个文件、符号链接等）
+    failed: int           # 内容不同或操作失败的文件数
+    reclaimed_bytes: int  # 回收（试运行时为可以回收）的字节数
+
+
+def reflink_file(source: str, target: str):
+    """
+    创建与 source 共享数据块的文件 target（target 不能已存在）
+
+    Args:
+        source: 源文件
+        target: 新文件路径
+
+    Raises:
+        OSError: 文件系统或操作系统不支持 reflink，或创建失败
+    """
+    if sys.platform == 'darwin':
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(source), os.fsencode(target), 0) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), target)
+        return
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, '当前操作系统不支持 reflink', target)
+    with open(source, 'rb') as src, open(target, 'xb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+
+
+def files_identical(path1: str, path2: str, buffer_size: int = DEFAULT_BUFFER_SIZE) -> bool:
+    """
+    逐字节比较两个文件的内容
+
+    Args:
+        path1: 第一个文件
+        path2: 第二个文件
+        buffer_size: 每次读取的字节数
+
+    Returns:
+        内容完全相同时为True
+    """
+    with open(path1, 'rb') as f1, open(path2, 'rb') as f2:
+        while True:
+            data1 = f1.read(buffer_size)
+            if data1 != f2.read(buffer_size):
+                return False
+            if not data1:
+                return True
+
+
+def _write_journal(journal, record: dict):
+    """写入一条日志并立即落盘（临时链接创建后、替换文件之前调用，中途中断也能回滚）"""
+    journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+def _reclaimed_bytes(file_stat: os.stat_result, method: str) -> int:
+    """替换一个文件回收的字节数（硬链接只有在原文件没有其他硬链接时才能回收空间）"""
+    return file_stat.st_size if method != 'hardlink' or file_stat.st_nlink == 1 else 0
+
+
+def _set_owner(path: str, uid: int, gid: int, target: str):
+    """把 path 的属主和属组设为 uid/gid（需要相应权限，失败时打印警告并保留当前用户为属主）"""
+    if not hasattr(os, 'chown'):
+        return
+    try:
+        path_stat = os.stat(path)
+        if (path_stat.st_uid, path_stat.st_gid) != (uid, gid):
+            os.chown(path, uid, gid)
+    except OSError as e:
+        print(f"  警告: 无法保留属主 {target}: {e}")
+
+
+def _create_unique(target: str, create) -> str:
+    """
+    在 target 所在目录用 create(临时路径) 创建一个新的临时文件，返回临时路径
+
+    临时文件名包含随机部分，create 必须以独占方式创建（文件已存在时抛出 FileExistsError），
+    已存在时换一个名字重试，不会覆盖或删除用户已有的文件
+    """
+    directory, name = os.path.split(target)
+    while True:
+        temp_path = os.path.join(directory, f'.{name}.{os.urandom(4).hex()}{_TEMP_SUFFIX}')
+        try:
+            create(temp_path)
+            return temp_path
+        except FileExistsError:
+            continue
+
+
+def _create_temp_link(source: str, target: str, target_stat: os.stat_result, method: str) -> Tuple[str, str]:
+    """在 target 旁边创建指向 source 的临时链接，返回 (临时路径, 实际使用的链接方式)"""
+    if method in ('reflink', 'auto'):
+        try:
+            temp_path = _create_unique(target, lambda path: reflink_file(source, path))
+        except OSError as e:
+            if method == 'reflink' or e.errno not in _REFLINK_UNSUPPORTED:
+                raise
+        else:
+            # reflink 是独立的文件，保留原文件的权限、时间和属主
+            try:
+                shutil.copystat(target, temp_path)
+                _set_owner(temp_path, target_stat.st_uid, target_stat.st_gid, target)
+            except OSError:
+                os.remove(temp_path)
+                raise
+            return temp_path, 'reflink'
+    return _create_unique(target, lambda path: os.link(source, path)), 'hardlink'
+
+
+def link_duplicates(groups: Iterable[Sequence[str]], method: str = 'hardlink',
+                    journal_path: Optional[str] = None, dry_run: bool = False,
+                    buffer_size: int = DEFAULT_BUFFER_SIZE) -> LinkSummary:
+    """
+    把每组重复文件中除保留文件外的其他文件替换为链接
+
+    每组中第一个文件为保留文件（链接不能跨文件系统，其他文件系统上的文件以该文件系统上的第一个文件为准）；
+    每个文件替换前都会与保留文件逐字节比较，内容不同时跳过
+
+    Args:
+        groups: 重复文件组（每组为文件路径列表）
+        method: 链接方式，见 LINK_METHODS
+        journal_path: 回滚日志路径（dry_run 为False时必须指定）
+        dry_run: 只比较内容并统计可以回收的空间，不修改文件
+        buffer_size: 逐字节比较时每次读取的字节数
+
+    Returns:
+        合并结果统计
+    """
+    if method not in LINK_METHODS:
+        raise ValueError(f"不支持的链接方式: {method}")
+    if not dry_run and not journal_path:
+        raise ValueError("替换文件时必须指定回滚日志路径")
+
+    linked = skipped = failed = reclaimed = 0
+    journal = None if dry_run else open(journal_path, 'a', encoding='utf-8')
+    try:
+        for paths in groups:
+            keepers = {}  # 设备号 -> (保留文件路径, inode)
+            for path in paths:
+                try:
+                    file_stat = os.lstat(path)
+                except OSError as e:
+                    print(f"  警告: 无法读取文件 {path}: {e}")
+                    failed += 1
+                    continue
+                if not stat.S_ISREG(file_stat.st_mode):
+                    skipped += 1
+                    continue
+                keeper = keepers.get(file_stat.st_dev)
+                if keeper is None:
+                    keepers[file_stat.st_dev] = (path, file_stat.st_ino)
+                    continue
+                source, source_inode = keeper
+                if file_stat.st_ino == source_inode:
+                    skipped += 1  # 已经是同一个文件
+                    continue
+
+                try:
+                    identical = files_identical(source, path, buffer_size)
+                except OSError as e:
+                    print(f"  警告: 无法比较文件 {path}: {e}")
+                    failed += 1
+                    continue
+                if not identical:
+                    print(f"  跳过（内容与 {source} 不同）: {path}")
+                    failed += 1
+                    continue
+
+                if dry_run:
+                    linked += 1
+                    reclaimed += _reclaimed_bytes(file_stat, method)
+                    continue
+
+                # 临时链接创建成功后才写日志，创建失败的文件不会出现在日志中
+                try:
+                    temp_path, used_method = _create_temp_link(source, path, file_stat, method)
+                except OSError as e:
+                    print(f"  警告: 无法替换文件 {path}: {e}")
+                    failed += 1
+                    continue
+                try:
+                    _write_journal(journal, {
+                        'source': os.path.abspath(source), 'target': os.path.abspath(path),
+                        'size': file_stat.st_size, 'mode': stat.S_IMODE(file_stat.st_mode),
+                        'uid': file_stat.st_uid, 'gid': file_stat.st_gid,
+                        'atime_ns': file_stat.st_atime_ns, 'mtime_ns': file_stat.st_mtime_ns,
+                    })
+                    os.replace(temp_path, path)
+                except OSError as e:
+                    os.remove(temp_path)
+                    print(f"  警告: 无法替换文件 {path}: {e}")
+                    failed += 1
+                    continue
+                linked += 1
+                reclaimed += _reclaimed_bytes(file_stat, used_method)
+    finally:
+        if journal:
+            journal.close()
+    return LinkSummary(linked, skipped, failed, reclaimed)
+
+
+def read_journal(journal_path: str) -> List[dict]:
+    """
+    读取回滚日志
+
+    Args:
+        journal_path: 日志路径
+
+    Returns:
+        日志记录列表（按写入顺序）
+    """
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def rollback_journal(journal_path: str, dry_run: bool = False) -> int:
+    """
+    按回滚日志把链接恢复为独立的文件（按写入的相反顺序），并恢复原来的权限、时间和属主（属主尽量恢复）
+
+    内容与保留文件相同，直接复制链接的内容到同一目录下新建的临时文件后原子替换
+
+    Args:
+        journal_path: 日志路径
+        dry_run: 只列出要恢复的文件，不修改
+
+    Returns:
+        恢复的文件数
+    """
+    restored = 0
+    for record in reversed(read_journal(journal_path)):
+        target = record['target']
+        if dry_run:
+            print(f"  将恢复: {target}")
+            restored += 1
+            continue
+        if not os.path.exists(target):
+            print(f"  警告: 文件已不存在，无法恢复: {target}")
+            continue
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(suffix=_TEMP_SUFFIX, prefix=f'.{os.path.basename(target)}.',
+                                             dir=os.path.dirname(target))
+            os.close(fd)
+            shutil.copyfile(target, temp_path)
+            if 'uid' in record:
+                _set_owner(temp_path, record['uid'], record['gid'], target)
+            os.chmod(temp_path, record['mode'])
+            os.utime(temp_path, ns=(record['atime_ns'], record['mtime_ns']))
+            os.replace(temp_path, target)
+            restored += 1
+        except OSError as e:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            print(f"  警告: 无法恢复文件 {target}: {e}")
+    return restored
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按路径相似度配对两组文件
+内容相同的一组文件在两个目录中往往各有多个（例如几百个相同的占位图），按列表下标配对会把毫不相干的路径放在一行；
+这里按文件名、目录、扩展名的相似度为每对候选打分，按分数从高到低贪心选出配对
+大组不计算全部 m*n 对：先按相对路径完全相同配对，再通过词元倒排索引只给有共同词元的文件打分
+"""
+
+import os
+import re
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+# 文件数乘积不超过该值的组直接给所有组合打分
+FULL_SCORING_LIMIT = 4096
+
+# 倒排索引中出现在超过该数量文件中的词元（例如占位图共同的前缀）不用于生成候选
+MAX_TOKEN_FREQUENCY = 64
+
+# 打分权重
+_NAME_EQUAL_SCORE = 4.0
+_NAME_TOKEN_SCORE = 2.0
+_EXTENSION_SCORE = 1.0
+_DIRECTORY_SCORE = 2.0
+
+_TOKEN_PATTERN = re.compile(r'[0-9]+|[^\W\d_]+')
+
+
+class _PathFeatures:
+    """一个相对路径用于打分的特征"""
+
+    __slots__ = ('name', 'extension', 'name_tokens', 'dir_parts')
+
+    def __init__(self, relative_path: str):
+        directory, name = os.path.split(relative_path.replace('\\', '/').lower())
+        stem, self.extension = os.path.splitext(name)
+        self.name = name
+        self.name_tokens: FrozenSet[str] = frozenset(_TOKEN_PATTERN.findall(stem))
+        self.dir_parts: FrozenSet[str] = frozenset(part for part in directory.split('/') if part)
+
+    def tokens(self) -> FrozenSet[str]:
+        """用于倒排索引的词元（目录名与文件名词元加上前缀区分）"""
+        return frozenset([f'n:{token}' for token in self.name_tokens] + [f'd:{part}' for part in self.dir_parts])
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _score(a: _PathFeatures, b: _PathFeatures) -> float:
+    if a.name == b.name:
+        score = _NAME_EQUAL_SCORE
+    else:
+        score = _NAME_TOKEN_SCORE * _jaccard(a.name_tokens, b.name_tokens)
+    if a.extension == b.extension:
+        score += _EXTENSION_SCORE
+    return score + _DIRECTORY_SCORE * _jaccard(a.dir_parts, b.dir_parts)
+
+
+def path_similarity(relative_path1: str, relative_path2: str) -> float:
+    """
+    两个相对路径的相似度
+
+    Args:
+        relative_path1: 第一个相对路径
+        relative_path2: 第二个相对路径
+
+    Returns:
+        分数（0~9，文件名相同4分、文件名词元相似最多2分、扩展名相同1分、目录名相似最多2分）
+    """
+    return _score(_PathFeatures(relative_path1), _PathFeatures(relative_path2))
+
+
+def pair_paths(paths1: Sequence[str], paths2: Sequence[str]) -> List[Tuple[Optional[int], Optional[int]]]:
+    """
+    按路径相似度为两组相对路径配对
+
+    Args:
+        paths1: 第一组相对路径
+        paths2: 第二组相对路径
+
+    Returns:
+        (paths1下标, paths2下标) 列表，共 max(len(paths1), len(paths2)) 对；
+        按 paths1 的顺序排列，没有找到相似路径的文件按剩余顺序依次配对，多出的一侧对应None
+    """
+    partner: Dict[int, int] = {}
+    taken2 = set()
+
+    # 相对路径完全相同的文件直接配对
+    index2_of = {}
+    for j, path in enumerate(paths2):
+        index2_of.setdefault(os.path.normcase(path), j)
+    for i, path in enumerate(paths1):
+        j = index2_of.get(os.path.normcase(path))
+        if j is not None and j not in taken2:
+            partner[i] = j
+            taken2.add(j)
+
+    rest1 = [i for i in range(len(paths1)) if i not in partner]
+    rest2 = [j for j in range(len(paths2)) if j not in taken2]
+    if rest1 and rest2:
+        features1 = {i: _PathFeatures(paths1[i]) for i in rest1}
+        features2 = {j: _PathFeatures(paths2[j]) for j in rest2}
+        if len(rest1) * len(rest2) <= FULL_SCORING_LIMIT:
+            candidates = [(i, j) for i in rest1 for j in rest2]
+        else:
+            candidates = _candidate_pairs(features1, features2)
+        scored = sorted((-_score(features1[i], features2[j]), i, j) for i, j in candidates)
+        for negative_score, i, j in scored:
+            if negative_score < 0 and i not in partner and j not in taken2:
+                partner[i] = j
+                taken2.add(j)
+
+    # 剩下的文件按顺序依次配对
+    leftover2 = iter([j for j in range(len(paths2)) if j not in taken2])
+    pairs: List[Tuple[Optional[int], Optional[int]]] = []
+    for i in range(len(paths1)):
+        pairs.append((i, partner[i] if i in partner else next(leftover2, None)))
+    pairs.extend((None, j) for j in leftover2)
+    return pairs
+
+
+def _candidate_pairs(features1: Dict[int, _PathFeatures], features2: Dict[int, _PathFeatures]) -> List[Tuple[int, int]]:
+    """通过词元倒排索引找出至少有一个共同（且不过于常见的）词元的候选对"""
+    index2: Dict[str, List[int]] = {}
+    for j, features in features2.items():
+        for token in features.tokens():
+            index2.setdefault(token, []).append(j)
+    frequency1: Dict[str, int] = {}
+    for features in features1.values():
+        for token in features.tokens():
+            frequency1[token] = frequency1.get(token, 0) + 1
+
+    candidates = set()
+    for i, features in features1.items():
+        for token in features.tokens():
+            matches = index2.get(token, ())
+            if len(matches) <= MAX_TOKEN_FREQUENCY and frequency1[token] <= MAX_TOKEN_FREQUENCY:
+                candidates.update((i, j) for j in matches)
+    return list(candidates)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片感知哈希（近似重复检测）
+同一张图片重新编码、重新压缩或缩放后，MD5完全不同，但感知哈希只相差几位；
+用汉明距离判断两张图片是否相似，并用BK树查找，避免两两比较
+依赖库：pip install pillow numpy
+"""
+
+import os
+from functools import partial
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+try:
+    import numpy as np  # 可选依赖：pip install numpy
+except ImportError:
+    np = None
+
+from hash_cache import HashCache
+from hash_engine import parallel_map
+
+# 支持的感知哈希算法
+#   ahash - 均值哈希：缩小到8x8灰度图，与平均值比较，最快，对调色、对比度变化较敏感
+#   dhash - 差值哈希：缩小到9x8灰度图，比较相邻像素的明暗，速度快且对压缩、缩放稳定
+#   phash - 离散余弦变换哈希：取32x32灰度图DCT的低频8x8部分与中位数比较，最稳定
+PERCEPTUAL_ALGORITHMS = ('ahash', 'dhash', 'phash')
+DEFAULT_PERCEPTUAL_ALGORITHM = 'phash'
+
+# 哈希边长（8表示64位哈希）
+PERCEPTUAL_HASH_SIZE = 8
+
+# 默认的相似阈值：汉明距离不超过该值的两张图片视为近似重复（64位哈希）
+DEFAULT_MAX_DISTANCE = 8
+
+# pHash 的DCT输入边长
+_PHASH_IMAGE_SIZE = 32
+
+
+def available_perceptual_algorithms() -> List[str]:
+    """
+    当前环境可用的感知哈希算法
+
+    Returns:
+        算法名列表（未安装numpy时为空）
+    """
+    return list(PERCEPTUAL_ALGORITHMS) if np is not None else []
+
+
+def format_hash(hash_value: int) -> str:
+    """把感知哈希格式化为固定长度的十六进制字符串"""
+    return f'{hash_value:0{PERCEPTUAL_HASH_SIZE * PERCEPTUAL_HASH_SIZE // 4}x}'
+
+
+def _dct_matrix(n: int) -> 'np.ndarray':
+    """返回 n 点 DCT-II 变换矩阵（未归一化，只用于比较大小）"""
+    k = np.arange(n)
+    return np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+
+
+def _load_gray(image_path: str, size: Tuple[int, int]) -> 'np.ndarray':
+    """以灰度读取图片并缩放到 size (宽, 高)，JPEG使用草稿解码跳过大部分像素"""
+    with Image.open(image_path) as img:
+        img.draft('L', (size[0] * 4, size[1] * 4))
+        if img.mode in ('RGBA', 'LA', 'P'):
+            # 透明区域按白色背景处理，与预览图一致
+            rgba = img.convert('RGBA')
+            background = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+            img = Image.alpha_composite(background, rgba)
+        gray = img.convert('L').resize(size, Image.Resampling.LANCZOS)
+        return np.asarray(gray, dtype=np.float64)
+
+
+def image_hash(image_path: str, algorithm: str = DEFAULT_PERCEPTUAL_ALGORITHM,
+               hash_size: int = PERCEPTUAL_HASH_SIZE) -> Optional[int]:
+    """
+    计算图片的感知哈希
+
+    Args:
+        image_path: 图片路径
+        algorithm: 感知哈希算法，见 PERCEPTUAL_ALGORITHMS
+        hash_size: 哈希边长，结果为 hash_size * hash_size 位
+
+    Returns:
+        感知哈希（整数），无法读取图片时返回None
+    """
+    try:
+        if algorithm == 'ahash':
+            pixels = _load_gray(image_path, (hash_size, hash_size))
+            bits = pixels > pixels.mean()
+        elif algorithm == 'dhash':
+            pixels = _load_gray(image_path, (hash_size + 1, hash_size))
+            bits = pixels[:, 1:] > pixels[:, :-1]
+        elif algorithm == 'phash':
+            pixels = _load_gray(image_path, (_PHASH_IMAGE_SIZE, _PHASH_IMAGE_SIZE))
+            dct = _dct_matrix(_PHASH_IMAGE_SIZE)
+            low = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+            bits = low > np.median(low)
+        else:
+            raise ValueError(f"不支持的感知哈希算法: {algorithm}")
+    except ValueError:
+        raise
+    except Exception as e:
+        print(f"  警告: 无法计算感知哈希 {image_path}: {e}")
+        return None
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big')
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个哈希之间不同的位数"""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """按汉明距离组织的BK树，查询距离不超过阈值的哈希时只需访问树的一小部分"""
+
+    def __init__(self):
+        # 节点结构：[哈希, 该哈希对应的元素列表, {到子节点的距离: 子节点}]
+        self._root = None
+
+    def add(self, hash_value: int, item):
+        """插入一个元素"""
+        if self._root is None:
+            self._root = [hash_value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(hash_value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [hash_value, [item], {}]
+                return
+            node = child
+
+    def search(self, hash_value: int, max_distance: int) -> List:
+        """返回与 hash_value 的汉明距离不超过 max_distance 的所有元素"""
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node_hash, items, children = stack.pop()
+            distance = hamming_distance(hash_value, node_hash)
+            if distance <= max_distance:
+                found.extend(items)
+            # 三角不等式：只有到该节点距离在 [d-k, d+k] 内的子树才可能有结果
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+def group_similar(hashes: Sequence[Tuple[Hashable, int]], max_distance: int = DEFAULT_MAX_DISTANCE) -> List[List]:
+    """
+    把感知哈希相近的元素分为一组（相似关系按传递闭包合并）
+
+    Args:
+        hashes: (元素, 感知哈希) 列表
+        max_distance: 视为相似的最大汉明距离
+
+    Returns:
+        包含两个及以上元素的分组列表，组与组内元素都保持输入顺序
+    """
+    parent = list(range(len(hashes)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    # 先查询再插入，每对相似元素只会被找到一次
+    tree = BKTree()
+    for index, (_, hash_value) in enumerate(hashes):
+        for other in tree.search(hash_value, max_distance):
+            root, other_root = find(index), find(other)
+            if root != other_root:
+                parent[max(root, other_root)] = min(root, other_root)
+        tree.add(hash_value, index)
+
+    groups: Dict[int, List] = {}
+    for index, (item, _) in enumerate(hashes):
+        groups.setdefault(find(index), []).append(item)
+    return [items for items in groups.values() if len(items) > 1]
+
+
+def perceptual_hash_files(files: Iterable[Tuple[str, os.stat_result]],
+                          algorithm: str = DEFAULT_PERCEPTUAL_ALGORITHM, jobs: int = 1,
+                          cache: Optional[HashCache] = None) -> List[Tuple[str, int]]:
+    """
+    计算一批图片的感知哈希：先查哈希缓存，未命中的图片用进程池并行解码
+
+    Args:
+        files: (图片路径, os.stat 结果) 列表
+        algorithm: 感知哈希算法
+        jobs: 并行进程数
+        cache: 哈希缓存，为None时不使用缓存
+
+    Returns:
+        (图片路径, 感知哈希) 列表，保持输入顺序，无法读取的图片被跳过
+    """
+    if np is None:
+        raise ValueError("感知哈希需要安装 numpy: pip install numpy")
+    files = list(files)
+    kind = f'{algorithm}-{PERCEPTUAL_HASH_SIZE}'
+    cached = [cache.get(path, st, kind) if cache else None for path, st in files]
+    # 缓存未命中的图片交给进程池解码，结果按顺序依次填回
+    computed = parallel_map(partial(image_hash, algorithm=algorithm),
+                            [path for (path, _), digest in zip(files, cached) if digest is None],
+                            jobs, use_processes=True)
+
+    results = []
+    for (path, st), digest in zip(files, cached):
+        if digest is None:
+            value = next(computed)
+            if value is None:
+                continue
+            digest = format_hash(value)
+            if cache:
+                cache.put(path, st, kind, digest)
+        results.append((path, int(digest, 16)))
+    return results
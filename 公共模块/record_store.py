@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的文件记录存储
+千万级文件时，Dict[str, List[str]]（32个字符的十六进制哈希值 + 完整路径字符串列表）要占用好几GB内存；
+这里把目录路径只保存一次，文件路径存为 (目录编号, 文件名)，大小、修改时间、inode 存在 array 中，
+哈希值以二进制保存（MD5为16字节），只对应一个文件的哈希值直接保存文件编号，不创建列表
+"""
+
+import os
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+from file_walker import FileEntry
+
+
+class FileRecords:
+    """文件记录表：按添加顺序为每个文件分配编号（从0开始），按编号读取路径和文件信息"""
+
+    __slots__ = ('_dir_ids', '_dirs', '_file_dirs', '_names', '_sizes', '_mtimes', '_inodes')
+
+    def __init__(self):
+        self._dir_ids: Dict[str, int] = {}
+        self._dirs: List[str] = []          # 目录前缀（含末尾的路径分隔符）
+        self._file_dirs = array('L')        # 每个文件所在目录的编号
+        self._names: List[str] = []         # 每个文件的文件名
+        self._sizes = array('q')
+        self._mtimes = array('q')
+        self._inodes = array('Q')
+
+    def add(self, file_entry: FileEntry) -> int:
+        """
+        添加一个文件
+
+        Args:
+            file_entry: 遍历目录得到的文件信息
+
+        Returns:
+            文件编号
+        """
+        name = os.path.basename(file_entry.path)
+        prefix = file_entry.path[:len(file_entry.path) - len(name)]
+        dir_id = self._dir_ids.get(prefix)
+        if dir_id is None:
+            dir_id = self._dir_ids[prefix] = len(self._dirs)
+            self._dirs.append(prefix)
+        self._file_dirs.append(dir_id)
+        self._names.append(name)
+        self._sizes.append(file_entry.st_size)
+        self._mtimes.append(file_entry.st_mtime_ns)
+        self._inodes.append(file_entry.st_ino)
+        return len(self._names) - 1
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def path(self, file_id: int) -> str:
+        """文件路径（与添加时的路径完全相同）"""
+        return self._dirs[self._file_dirs[file_id]] + self._names[file_id]
+
+    def size(self, file_id: int) -> int:
+        """文件大小"""
+        return self._sizes[file_id]
+
+    def entry(self, file_id: int) -> FileEntry:
+        """文件信息（可以直接传给 HashCache）"""
+        return FileEntry(self.path(file_id), self._sizes[file_id], self._mtimes[file_id], self._inodes[file_id])
+
+    def paths(self) -> Iterator[str]:
+        """按编号顺序产生所有文件路径"""
+        return (self.path(file_id) for file_id in range(len(self._names)))
+
+
+class DigestIndex(Mapping):
+    """
+    哈希值 -> 文件编号的紧凑索引
+
+    可以当作只读的 Dict[str, List[str]] 使用（键为十六进制哈希值，值为文件路径列表，按添加顺序排列）
+    """
+
+    __slots__ = ('records', '_groups')
+
+    def __init__(self, records: FileRecords):
+        """
+        Args:
+            records: 文件编号所属的文件记录表
+        """
+        self.records = records
+        # 二进制哈希值 -> 文件编号（只有一个文件时）或 array（多个文件时）
+        self._groups: Dict[bytes, Union[int, array]] = {}
+
+    def add(self, digest: str, file_id: int):
+        """
+        记录一个文件的哈希值
+
+        Args:
+            digest: 十六进制哈希值
+            file_id: 文件编号
+        """
+        key = bytes.fromhex(digest)
+        file_ids = self._groups.get(key)
+        if file_ids is None:
+            self._groups[key] = file_id
+        elif isinstance(file_ids, int):
+            self._groups[key] = array('L', (file_ids, file_id))
+        else:
+            file_ids.append(file_id)
+
+    def file_ids(self, digest: str) -> Sequence[int]:
+        """哈希值对应的文件编号（按添加顺序），不存在时返回空元组"""
+        file_ids = self._groups.get(bytes.fromhex(digest), ())
+        return (file_ids,) if isinstance(file_ids, int) else file_ids
+
+    def groups(self, min_count: int = 1) -> Iterator[Tuple[str, Sequence[int]]]:
+        """
+        按添加顺序产生 (十六进制哈希值, 文件编号列表)
+
+        Args:
+            min_count: 只产生文件数量不少于该值的哈希值（2表示只要重复的文件）
+        """
+        for key, file_ids in self._groups.items():
+            if isinstance(file_ids, int):
+                if min_count <= 1:
+                    yield key.hex(), (file_ids,)
+            elif len(file_ids) >= min_count:
+                yield key.hex(), file_ids
+
+    def __getitem__(self, digest: str) -> List[str]:
+        file_ids = self.file_ids(digest)
+        if not file_ids:
+            raise KeyError(digest)
+        return [self.records.path(file_id) for file_id in file_ids]
+
+    def __contains__(self, digest) -> bool:
+        try:
+            return bytes.fromhex(digest) in self._groups
+        except (TypeError, ValueError):
+            return False
+
+    def __iter__(self) -> Iterator[str]:
+        return (key.hex() for key in self._groups)
+
+    def __len__(self) -> int:
+        return len(self._groups)
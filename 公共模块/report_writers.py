@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果输出后端
+除Excel外，提供流式写入的CSV、JSON Lines以及Parquet（需要安装pyarrow）格式，
+便于下游脚本直接读取处理，也不受Excel 1,048,576 行的限制
+"""
+
+import csv
+import json
+import os
+from typing import Dict, List, Optional, Type
+
+try:
+    import pyarrow  # 可选依赖：pip install pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# 支持的输出格式（xlsx由各工具自己的 export_to_excel 处理）
+REPORT_FORMATS = ('xlsx', 'csv', 'jsonl', 'parquet')
+
+# 文件扩展名与输出格式的对应关系
+EXTENSION_FORMATS = {
+    '.xlsx': 'xlsx',
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+}
+
+
+def available_formats() -> List[str]:
+    """
+    当前环境可用的输出格式
+
+    Returns:
+        格式名列表（未安装pyarrow时不包含parquet）
+    """
+    return [fmt for fmt in REPORT_FORMATS if fmt != 'parquet' or pyarrow is not None]
+
+
+def detect_format(output_path: str, report_format: Optional[str] = None) -> str:
+    """
+    确定输出格式：优先使用显式指定的格式，否则根据文件扩展名判断，默认为xlsx
+
+    Args:
+        output_path: 输出文件路径
+        report_format: 显式指定的格式（例如命令行 --format 参数）
+
+    Returns:
+        输出格式名
+    """
+    if report_format:
+        return report_format
+    extension = os.path.splitext(output_path)[1].lower()
+    return EXTENSION_FORMATS.get(extension, 'xlsx')
+
+
+def with_format_extension(output_path: str, report_format: str) -> str:
+    """
+    确保输出文件路径带有与格式对应的扩展名
+
+    Args:
+        output_path: 输出文件路径
+        report_format: 输出格式名
+
+    Returns:
+        带扩展名的输出文件路径
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    if EXTENSION_FORMATS.get(extension) == report_format:
+        return output_path
+    return f"{output_path}.{report_format}"
+
+
+class ReportWriter:
+    """逐行写入结果记录的输出后端基类（可用作上下文管理器）"""
+
+    def __init__(self, output_path: str, columns: List[str], column_types: Optional[Dict[str, Type]] = None):
+        """
+        Args:
+            output_path: 输出文件路径
+            columns: 列名列表，每条记录是以列名为键的字典
+            column_types: 列名 -> 值的类型（int / float / bool / str），没有声明的列为 str；
+                          Parquet 按此生成固定的表结构，CSV / JSON Lines 不使用
+        """
+        self.output_path = output_path
+        self.columns = columns
+        self.column_types = column_types or {}
+        self.row_count = 0
+
+    def write_row(self, record: Dict):
+        """写入一条记录"""
+        self._write(record)
+        self.row_count += 1
+
+    def _write(self, record: Dict):
+        raise NotImplementedError
+
+    def close(self):
+        """写入剩余数据并关闭文件"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvReportWriter(ReportWriter):
+    """CSV输出（UTF-8 带BOM，Excel可以直接打开不乱码）"""
+
+    def __init__(self, output_path: str, columns: List[str], column_types: Optional[Dict[str, Type]] = None):
+        super().__init__(output_path, columns, column_types)
+        self._file = open(output_path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=columns)
+        self._writer.writeheader()
+
+    def _write(self, record: Dict):
+        self._writer.writerow(record)
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlReportWriter(ReportWriter):
+    """JSON Lines输出，每行一个JSON对象"""
+
+    def __init__(self, output_path: str, columns: List[str], column_types: Optional[Dict[str, Type]] = None):
+        super().__init__(output_path, columns, column_types)
+        self._file = open(output_path, 'w', encoding='utf-8')
+
+    def _write(self, record: Dict):
+        self._file.write(json.dumps({column: record.get(column) for column in self.columns},
+                                    ensure_ascii=False))
+        self._file.write('\n')
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetReportWriter(ReportWriter):
+    """Parquet列式输出（需要安装pyarrow），按批写入行组"""
+
+    def __init__(self, output_path: str, columns: List[str], column_types: Optional[Dict[str, Type]] = None,
+                 batch_size: int = 65536):
+        if pyarrow is None:
+            raise ValueError("输出Parquet格式需要安装 pyarrow: pip install pyarrow")
+        super().__init__(output_path, columns, column_types)
+        self.batch_size = batch_size
+        self._batch = []
+        # 表结构由列声明决定，不从第一批数据推断（第一批中全为空的列会被推断为null类型，之后的批次无法写入）
+        arrow_types = {int: pyarrow.int64(), float: pyarrow.float64(), bool: pyarrow.bool_(), str: pyarrow.string()}
+        self.schema = pyarrow.schema([(column, arrow_types[self.column_types.get(column, str)])
+                                      for column in columns])
+        self._writer = None
+
+    def _write(self, record: Dict):
+        self._batch.append({column: record.get(column) for column in self.columns})
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._batch:
+            return
+        if self._writer is None:
+            self._writer = pyarrow.parquet.ParquetWriter(self.output_path, self.schema)
+        self._writer.write_table(pyarrow.Table.from_pylist(self._batch, schema=self.schema))
+        self._batch = []
+
+    def close(self):
+        self._flush()
+        if self._writer is None:
+            # 没有任何数据时也写出一个只有表结构的空文件
+            self._writer = pyarrow.parquet.ParquetWriter(self.output_path, self.schema)
+        self._writer.close()
+
+
+def open_report_writer(output_path: str, columns: List[str], report_format: str,
+                       column_types: Optional[Dict[str, Type]] = None) -> ReportWriter:
+    """
+    创建指定格式的输出后端
+
+    Args:
+        output_path: 输出文件路径
+        columns: 列名列表
+        report_format: 输出格式名（csv / jsonl / parquet）
+        column_types: 列名 -> 值的类型（int / float / bool / str），没有声明的列为 str
+
+    Returns:
+        输出后端对象
+    """
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"创建输出目录: {output_dir}")
+
+    if report_format == 'csv':
+        return CsvReportWriter(output_path, columns, column_types)
+    if report_format == 'jsonl':
+        return JsonlReportWriter(output_path, columns, column_types)
+    if report_format == 'parquet':
+        return ParquetReportWriter(output_path, columns, column_types)
+    raise ValueError(f"不支持的输出格式: {report_format}")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量目录扫描
+把每个目录的修改时间(mtime_ns)、其中的文件（名称、大小、修改时间、inode）和子目录保存为快照，
+再次扫描时只有修改时间发生变化的目录才重新列出并读取文件信息，其余目录直接使用快照中的记录，
+基本不变的大目录树扫描时间只与变化量有关
+
+注意：目录的修改时间只在其中的文件被新增、删除或重命名时变化，原地改写文件内容不会改变目录的修改时间，
+这类改动需要用完整扫描（不使用快照或重建快照）才能发现
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+from file_walker import DirectoryListing, FileEntry, list_directory, walk_directories
+
+# 默认的快照目录（用户目录下，各工具共用，每个被扫描的目录一个快照文件）
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'python_script', 'scan_snapshots')
+
+# 快照格式版本，格式变化时旧快照自动失效
+SNAPSHOT_VERSION = 1
+
+# 扫描开始前这段时间内修改过的目录不记录修改时间，下次一定重新扫描
+# （避免目录在扫描的同一时刻又发生变化，但修改时间没有变，导致漏掉改动）
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+# 快照中一个目录的记录：(目录修改时间, ((文件名, 大小, 修改时间, inode), ...), (子目录名, ...))
+DirectoryRecord = Tuple[Optional[int], Tuple[Tuple[str, int, int, int], ...], Tuple[str, ...]]
+
+
+def snapshot_path(directory: str, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> str:
+    """
+    返回目录对应的快照文件路径
+
+    Args:
+        directory: 被扫描的目录
+        snapshot_dir: 保存快照的目录
+
+    Returns:
+        快照文件路径（按目录绝对路径的哈希命名）
+    """
+    digest = hashlib.sha1(os.path.abspath(directory).encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(snapshot_dir, f'{digest[:16]}.pickle')
+
+
+class ScanSnapshot:
+    """目录扫描快照，walk() 按 os.walk 的顺序产生文件，只重新扫描有变化的目录"""
+
+    def __init__(self, directory: str, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR, rebuild: bool = False):
+        """
+        加载（或新建）目录的扫描快照
+
+        Args:
+            directory: 被扫描的目录（产生的文件路径以它为前缀）
+            snapshot_dir: 保存快照的目录
+            rebuild: 是否忽略已有快照，完整扫描一次
+        """
+        self.directory = directory
+        self.path = snapshot_path(directory, snapshot_dir)
+        self.dirs_scanned = 0
+        self.dirs_reused = 0
+        self._dirs: Dict[str, DirectoryRecord] = {}
+        self._complete = False
+
+        if not rebuild and os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as f:
+                    data = pickle.load(f)
+                if data.get('version') == SNAPSHOT_VERSION and data.get('root') == os.path.abspath(directory):
+                    self._dirs = data['dirs']
+            except Exception as e:
+                print(f"  警告: 无法读取扫描快照 {self.path}，将完整扫描: {e}")
+
+    def walk(self, jobs: int = 1) -> Iterator[FileEntry]:
+        """
+        遍历目录下的所有文件（不进入指向目录的符号链接，与 os.walk 一致）
+
+        Args:
+            jobs: 并发检查、列出目录的线程数
+
+        Returns:
+            FileEntry 迭代器，顺序与 os.walk 自上而下遍历的顺序一致（与 jobs 无关）
+        """
+        scan_start_ns = time.time_ns()
+        old_dirs = self._dirs
+        new_dirs = {}
+        self.dirs_scanned = self.dirs_reused = 0
+        self._complete = False
+        counter_lock = threading.Lock()
+        prefix_length = len(os.path.join(self.directory, ''))
+
+        def list_changed(current_dir: str) -> DirectoryListing:
+            """修改时间未变的目录直接使用快照中的记录，否则重新列出（可能在工作线程中执行）"""
+            relative_dir = current_dir[prefix_length:] if current_dir != self.directory else ''
+            try:
+                dir_mtime_ns = os.stat(current_dir).st_mtime_ns
+            except OSError as e:
+                print(f"  警告: 无法读取目录 {current_dir}: {e}")
+                return (), ()
+
+            record = old_dirs.get(relative_dir)
+            reused = record is not None and record[0] == dir_mtime_ns
+            listing = record[1:] if reused else list_directory(current_dir)
+            with counter_lock:
+                if reused:
+                    self.dirs_reused += 1
+                else:
+                    self.dirs_scanned += 1
+
+            # 刚刚修改过的目录不记录修改时间，下次一定重新扫描
+            stable_mtime_ns = dir_mtime_ns if dir_mtime_ns < scan_start_ns - RACY_WINDOW_NS else None
+            new_dirs[relative_dir] = (stable_mtime_ns,) + listing
+            return listing
+
+        for current_dir, (files, _) in walk_directories(self.directory, list_changed, jobs):
+            for name, size, mtime_ns, inode in files:
+                yield FileEntry(os.path.join(current_dir, name), size, mtime_ns, inode)
+
+        self._dirs = new_dirs
+        self._complete = True
+
+    def save(self):
+        """保存快照（只有完整遍历过一次后才会保存）"""
+        if not self._complete:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'version': SNAPSHOT_VERSION, 'root': os.path.abspath(self.directory),
+                         'dirs': self._dirs}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+
+    def summary(self) -> str:
+        """本次扫描的统计信息"""
+        return f"增量扫描: 重新扫描 {self.dirs_scanned} 个目录，复用快照 {self.dirs_reused} 个目录"
+
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化缩略图缓存
+以 文件内容哈希 + 缩略图尺寸 + 质量档位 为键，把缩略图PNG数据保存在SQLite中，
+两个工具、每次运行共用同一个缓存：内容没有变化的图片不需要再解码
+缓存总大小超过上限时按最近使用时间淘汰（LRU）
+"""
+
+import os
+import sqlite3
+import time
+from typing import Optional, Tuple
+
+# 默认的缓存文件（用户目录下，所有工具共用）
+DEFAULT_THUMBNAIL_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'python_script',
+                                       'thumbnail_cache.sqlite3')
+
+# 默认的缓存大小上限（字节）
+DEFAULT_THUMBNAIL_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class ThumbnailCache:
+    """缩略图缓存（可被多个进程同时打开，例如并行写入的Excel分片）"""
+
+    def __init__(self, db_path: str = DEFAULT_THUMBNAIL_CACHE,
+                 max_bytes: int = DEFAULT_THUMBNAIL_CACHE_BYTES):
+        """
+        打开（或创建）缓存数据库
+
+        Args:
+            db_path: 缓存数据库文件路径
+            max_bytes: 缓存大小上限（字节），关闭时超出的部分按LRU淘汰
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        # 自动提交模式：每条写入都是一个短事务，多个进程同时使用时不会长时间占用写锁
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS thumbnail ('
+            '  content_key TEXT NOT NULL,'
+            '  width INTEGER NOT NULL,'
+            '  height INTEGER NOT NULL,'
+            '  quality TEXT NOT NULL,'
+            '  data BLOB NOT NULL,'
+            '  size INTEGER NOT NULL,'
+            '  last_used REAL NOT NULL,'
+            '  PRIMARY KEY (content_key, width, height, quality)'
+            ')'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS thumbnail_last_used ON thumbnail (last_used)')
+
+    def get(self, content_key: str, max_size: Tuple[int, int], quality: str) -> Optional[bytes]:
+        """
+        查询缓存的缩略图，命中时同时刷新最近使用时间
+
+        Args:
+            content_key: 文件内容的哈希（带算法前缀，例如 'md5:...'）
+            max_size: 缩略图最大尺寸 (宽, 高)
+            quality: 质量档位
+
+        Returns:
+            缩略图PNG数据，未命中时返回None
+        """
+        key = (content_key, max_size[0], max_size[1], quality)
+        row = self._conn.execute(
+            'SELECT data FROM thumbnail WHERE content_key = ? AND width = ? AND height = ? AND quality = ?',
+            key
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._conn.execute(
+            'UPDATE thumbnail SET last_used = ? '
+            'WHERE content_key = ? AND width = ? AND height = ? AND quality = ?',
+            (time.time(),) + key
+        )
+        return row[0]
+
+    def put(self, content_key: str, max_size: Tuple[int, int], quality: str, data: bytes):
+        """
+        写入（或更新）一张缩略图
+
+        Args:
+            content_key: 文件内容的哈希（带算法前缀）
+            max_size: 缩略图最大尺寸 (宽, 高)
+            quality: 质量档位
+            data: 缩略图PNG数据
+        """
+        self._conn.execute(
+            'INSERT OR REPLACE INTO thumbnail (content_key, width, height, quality, data, size, last_used) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (content_key, max_size[0], max_size[1], quality, data, len(data), time.time())
+        )
+
+    def evict(self) -> int:
+        """
+        按最近使用时间从新到旧累计大小，删除超出上限的缩略图
+
+        Returns:
+            删除的缩略图数量
+        """
+        cursor = self._conn.execute(
+            'DELETE FROM thumbnail WHERE rowid IN ('
+            '  SELECT rowid FROM ('
+            '    SELECT rowid, SUM(size) OVER (ORDER BY last_used DESC, rowid DESC) AS used FROM thumbnail'
+            '  ) WHERE used > ?'
+            ')',
+            (self.max_bytes,)
+        )
+        return cursor.rowcount
+
+    def close(self):
+        """淘汰超出上限的缩略图并关闭数据库"""
+        self.evict()
+        self._conn.close()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缩略图生成
+在进程池中解码、缩放图片，直接返回PNG数据（bytes），由调用方用 io.BytesIO 交给 openpyxl，
+不再在磁盘上生成临时文件
+依赖库：pip install pillow
+"""
+
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Iterable, Iterator, Optional, Tuple
+
+from PIL import Image
+
+from thumbnail_cache import DEFAULT_THUMBNAIL_CACHE_BYTES, ThumbnailCache
+
+# 缩略图默认最大尺寸 (宽, 高)
+THUMBNAIL_SIZE = (150, 150)
+
+# 缩略图质量档位：(是否使用JPEG草稿解码, 草稿解码的目标倍数, 重采样滤镜, reducing_gap)
+#   fast     - JPEG直接按目标尺寸草稿解码（最多缩小到1/8），再用整数倍reduce和双线性滤镜缩放，速度最快
+#   balanced - JPEG按目标尺寸的2倍草稿解码，再用LANCZOS缩放，画质与best几乎没有差别
+#   best     - 完整解码后用LANCZOS缩放（原来的方式）
+THUMBNAIL_QUALITIES = {
+    'fast': (True, 1, Image.Resampling.BILINEAR, 1.0),
+    'balanced': (True, 2, Image.Resampling.LANCZOS, 2.0),
+    'best': (False, 1, Image.Resampling.LANCZOS, None),
+}
+DEFAULT_THUMBNAIL_QUALITY = 'balanced'
+
+
+def create_thumbnail(image_path: Optional[str], max_size: Tuple[int, int] = THUMBNAIL_SIZE,
+                     quality: str = DEFAULT_THUMBNAIL_QUALITY) -> Optional[bytes]:
+    """
+    创建图片缩略图
+
+    先缩小再做颜色模式转换，大图只需要解码、转换缩小后的像素
+
+    Args:
+        image_path: 原始图片路径，为None时直接返回None
+        max_size: 缩略图最大尺寸 (宽, 高)
+        quality: 质量档位，见 THUMBNAIL_QUALITIES
+
+    Returns:
+        缩略图的PNG数据，失败时返回None
+    """
+    if not image_path:
+        return None
+    use_draft, draft_scale, resample, reducing_gap = THUMBNAIL_QUALITIES[quality]
+    try:
+        with Image.open(image_path) as img:
+            # JPEG草稿解码：解码时直接按1/2、1/4、1/8缩小，8K贴图不必解码全部像素（其他格式忽略）
+            if use_draft:
+                img.draft(None, (max_size[0] * draft_scale, max_size[1] * draft_scale))
+
+            # 调色板图片缩放前先转换为RGBA（调色板模式只能用最近邻缩放），其他少见模式转换为RGB
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            elif img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+                img = img.convert('RGB')
+
+            # 计算缩略图尺寸（保持宽高比），reducing_gap 表示先用整数倍 reduce 粗缩放
+            img.thumbnail(max_size, resample, reducing_gap=reducing_gap)
+
+            # 转换为RGB模式（透明背景填充为白色）
+            if img.mode in ('RGBA', 'LA'):
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.split()[-1])
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+
+            buffer = io.BytesIO()
+            img.save(buffer, 'PNG')
+            return buffer.getvalue()
+    except Exception as e:
+        print(f"  警告: 无法创建缩略图 {image_path}: {e}")
+        return None
+
+
+def iter_thumbnails(image_paths: Iterable[Optional[str]], max_size: Tuple[int, int] = THUMBNAIL_SIZE,
+                    jobs: int = 1, quality: str = DEFAULT_THUMBNAIL_QUALITY) -> Iterator[Optional[bytes]]:
+    """
+    批量生成缩略图，jobs大于1时使用进程池并行解码，结果按输入顺序返回
+
+    Args:
+        image_paths: 图片路径，元素为None表示该位置不需要缩略图
+        max_size: 缩略图最大尺寸 (宽, 高)
+        jobs: 并行进程数
+        quality: 质量档位，见 THUMBNAIL_QUALITIES
+
+    Returns:
+        缩略图PNG数据的迭代器，与输入一一对应（失败或输入为None时为None）
+    """
+    func = partial(create_thumbnail, max_size=max_size, quality=quality)
+    if jobs <= 1:
+        for image_path in image_paths:
+            yield func(image_path) if image_path is not None else None
+        return
+
+    # 只有图片路径提交给进程池（不需要缩略图的位置在主进程中直接产生None，省去序列化和进程间通信），
+    # 结果按输入顺序返回；同一时间最多 jobs * 4 张图片在排队
+    max_pending = jobs * 4
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()   # 按输入顺序排列的 Future（图片）或 None（不需要缩略图）
+        submitted = 0       # pending 中 Future 的数量
+        for image_path in image_paths:
+            if image_path is None:
+                pending.append(None)
+            else:
+                pending.append(executor.submit(func, image_path))
+                submitted += 1
+            while pending and (pending[0] is None or submitted >= max_pending):
+                future = pending.popleft()
+                if future is None:
+                    yield None
+                else:
+                    submitted -= 1
+                    yield future.result()
+        while pending:
+            future = pending.popleft()
+            yield future.result() if future is not None else None
+
+
+def iter_cached_thumbnails(keyed_paths: Iterable[Tuple[Optional[str], Optional[str]]],
+                           cache_path: Optional[str] = None,
+                           max_size: Tuple[int, int] = THUMBNAIL_SIZE, jobs: int = 1,
+                           quality: str = DEFAULT_THUMBNAIL_QUALITY,
+                           cache_bytes: int = DEFAULT_THUMBNAIL_CACHE_BYTES) -> Iterator[Optional[bytes]]:
+    """
+    与 iter_thumbnails 相同，但先按文件内容哈希查询持久化缩略图缓存，只有未命中的图片才会被解码
+
+    Args:
+        keyed_paths: (内容哈希, 图片路径) 元组，路径为None表示该位置不需要缩略图
+        cache_path: 缩略图缓存数据库路径，为None时不使用缓存
+        max_size: 缩略图最大尺寸 (宽, 高)
+        jobs: 并行进程数
+        quality: 质量档位，见 THUMBNAIL_QUALITIES
+        cache_bytes: 缓存大小上限（字节）
+
+    Returns:
+        缩略图PNG数据的迭代器，与输入一一对应（失败或输入为None时为None）
+    """
+    if not cache_path:
+        return iter_thumbnails((path for _, path in keyed_paths), max_size, jobs, quality)
+    return _iter_cached_thumbnails(keyed_paths, cache_path, max_size, jobs, quality, cache_bytes)
+
+
+def _iter_cached_thumbnails(keyed_paths, cache_path, max_size, jobs, quality, cache_bytes):
+    """iter_cached_thumbnails 的实现（生成器，结束时关闭缓存）"""
+    cache = ThumbnailCache(cache_path, cache_bytes)
+    # 缓存查询在主进程中按输入顺序进行，结果与 iter_thumbnails 的输出一一对应
+    lookups = deque()
+
+    def uncached_paths():
+        for content_key, image_path in keyed_paths:
+            data = cache.get(content_key, max_size, quality) if content_key and image_path else None
+            lookups.append((content_key, data))
+            yield image_path if data is None else None
+
+    try:
+        for generated in iter_thumbnails(uncached_paths(), max_size, jobs, quality):
+            content_key, data = lookups.popleft()
+            if data is None and generated is not None:
+                if content_key:
+                    cache.put(content_key, max_size, quality, generated)
+                data = generated
+            yield data
+    finally:
+        print(f"缩略图缓存: 命中 {cache.hits} 个，新生成 {cache.misses} 个")
+        cache.close()
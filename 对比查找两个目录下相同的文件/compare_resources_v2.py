@@ -3,45 +3,80 @@
 """
 游戏资源文件对比工具（带图片预览）
 通过MD5值匹配两个文件夹中内容相同但名称不同的文件，并在Excel中显示图片预览
+（--similar 模式按感知哈希匹配重新编码、压缩或缩放过的近似图片，需要 numpy）
 """
 
 import os
-import hashlib
 import argparse
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.drawing.image import Image as ExcelImage
 from openpyxl.utils import get_column_letter
-from PIL import Image
 import io
-import tempfile
+import sys
+from array import array
+from bisect import bisect_right
+from itertools import tee
+
+# 公共模块（多个工具共用的哈希引擎等）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+from content_chunking import DEFAULT_AVERAGE_CHUNK_SIZE, chunk_file, fast_chunking_available
+from excel_shards import EXCEL_MAX_ROWS, plan_shards, run_shards, shard_path, write_shard_summary
+from file_walker import FileEntry, walk_files
+from hash_cache import DEFAULT_CACHE_NAME, HashCache, cached_hash
+from hash_engine import (DEFAULT_BUFFER_SIZE, STRONG_HASH_ALGORITHM, available_algorithms, default_jobs,
+                         hash_file, parallel_map)
+from path_pairing import pair_paths
+from perceptual_hash import (DEFAULT_MAX_DISTANCE, available_perceptual_algorithms, format_hash, group_similar,
+                             perceptual_hash_files)
+from record_store import DigestIndex, FileRecords
+from report_writers import available_formats, detect_format, open_report_writer, with_format_extension
+from scan_snapshot import ScanSnapshot
+from thumbnail_cache import DEFAULT_THUMBNAIL_CACHE, DEFAULT_THUMBNAIL_CACHE_BYTES
+from thumbnail_utils import DEFAULT_THUMBNAIL_QUALITY, THUMBNAIL_QUALITIES, iter_cached_thumbnails
 
 
 # 支持的图片格式
 IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff', '.tif', '.webp'}
 
+# 目录差异模式的变化类型（按报告中的顺序）
+CHANGE_MODIFIED = '修改'
+CHANGE_RENAMED = '移动/重命名'
+CHANGE_REMOVED = '删除'
+CHANGE_ADDED = '新增'
+DIFF_COLUMNS = ['change', 'path1', 'path2', 'hash1', 'hash2', 'size1', 'size2']
+DIFF_COLUMN_TYPES = {'size1': int, 'size2': int}
+
+# 分块相似度模式的报告列
+CHUNK_COLUMNS = ['path1', 'path2', 'size1', 'size2', 'shared_bytes', 'similarity', 'patch_bytes']
+CHUNK_COLUMN_TYPES = {'size1': int, 'size2': int, 'shared_bytes': int, 'similarity': float, 'patch_bytes': int}
+
+# 分块相似度模式：默认只对比不小于该大小的文件，默认只报告相似度不低于该百分比的文件
+DEFAULT_CHUNK_MIN_FILE_SIZE = 1024 * 1024
+DEFAULT_MIN_SIMILARITY = 50.0
+
+# 出现在超过该数量文件中的块（例如全零的填充数据）不用于查找相似文件，避免每个文件都和所有文件比较
+MAX_CHUNK_POSTINGS = 256
+
 
-def calculate_md5(file_path: str) -> str:
+def calculate_hash(file_path: str, algorithm: str = 'md5', buffer_size: int = DEFAULT_BUFFER_SIZE) -> str:
     """
-    计算文件的MD5值
+    计算文件的哈希值（默认MD5，复用大缓冲区分块读取，大文件使用mmap）
     
     Args:
         file_path: 文件路径
+        algorithm: 哈希算法名
+        buffer_size: 读取缓冲区大小（字节）
         
     Returns:
-        文件的MD5值（十六进制字符串）
+        文件的哈希值（十六进制字符串）
     """
-    md5_hash = hashlib.md5()
     try:
-        with open(file_path, 'rb') as f:
-            # 分块读取文件，避免大文件占用过多内存
-            for chunk in iter(lambda: f.read(4096), b''):
-                md5_hash.update(chunk)
-        return md5_hash.hexdigest()
+        return hash_file(file_path, algorithm, buffer_size)
     except Exception as e:
-        print(f"计算MD5失败: {file_path}, 错误: {e}")
+        print(f"计算{algorithm.upper()}失败: {file_path}, 错误: {e}")
         return ""
 
 
@@ -58,112 +93,609 @@ def is_image_file(file_path: str) -> bool:
     return Path(file_path).suffix.lower() in IMAGE_EXTENSIONS
 
 
-def create_thumbnail(image_path: str, max_size: Tuple[int, int] = (150, 150)) -> str:
+def calculate_hash_cached(file_path: str, cache: Optional[HashCache] = None, algorithm: str = 'md5',
+                          buffer_size: int = DEFAULT_BUFFER_SIZE, file_stat: Optional[FileEntry] = None) -> str:
     """
-    创建图片缩略图并保存到临时文件
+    计算文件的哈希值，文件大小、修改时间和inode都未变化时直接使用缓存结果
     
     Args:
-        image_path: 原始图片路径
-        max_size: 缩略图最大尺寸 (宽, 高)
+        file_path: 文件路径
+        cache: 哈希缓存，为None时不使用缓存
+        algorithm: 哈希算法名
+        buffer_size: 读取缓冲区大小（字节）
+        file_stat: 遍历目录时已经读取的文件信息，为None时重新读取
         
     Returns:
-        临时缩略图文件路径，如果失败返回None
+        文件的哈希值（十六进制字符串），失败时返回空字符串
     """
-    try:
-        with Image.open(image_path) as img:
-            # 转换为RGB模式（某些格式如RGBA需要转换才能保存为JPEG）
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # 创建白色背景
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # 计算缩略图尺寸（保持宽高比）
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # 保存到临时文件
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-            img.save(temp_file.name, 'PNG')
-            temp_file.close()
-            return temp_file.name
-    except Exception as e:
-        print(f"  警告: 无法创建缩略图 {image_path}: {e}")
+    if file_stat is None:
+        try:
+            file_stat = os.stat(file_path)
+        except OSError as e:
+            print(f"计算{algorithm.upper()}失败: {file_path}, 错误: {e}")
+            return ""
+    return cached_hash(cache, file_path, file_stat, algorithm,
+                       lambda: calculate_hash(file_path, algorithm, buffer_size))
+
+
+def get_preview_file(files1: List[str], files2: List[str],
+                     file_sizes: Optional[Dict[str, int]] = None) -> Optional[str]:
+    """
+    获取一组匹配文件的预览图来源（MD5相同的文件内容完全一样，只需要一个预览图）
+    
+    Args:
+        files1: dir1中的文件列表
+        files2: dir2中的文件列表
+        file_sizes: 遍历时记录的文件大小，有记录的文件视为存在，不再检查
+        
+    Returns:
+        第一个文件是图片时，优先返回dir1中的文件，不存在则返回dir2中的文件；否则返回None
+    """
+    file1 = files1[0] if files1 else None
+    if not file1 or not is_image_file(file1):
         return None
+    if (file_sizes and file1 in file_sizes) or os.path.exists(file1):
+        return file1
+    if files2 and os.path.exists(files2[0]):
+        return files2[0]
+    return None
 
 
-def scan_directory(directory: str) -> Dict[str, List[str]]:
+def walk_directory(directory: str,
+                   cache: Optional[HashCache] = None,
+                   snapshot: Optional[ScanSnapshot] = None,
+                   walk_jobs: int = 1,
+                   records: Optional[FileRecords] = None) -> FileRecords:
     """
-    扫描目录，计算所有文件的MD5值
+    遍历目录，记录所有文件的路径、大小等信息（不计算哈希）
     
     Args:
         directory: 要扫描的目录路径
+        cache: 哈希缓存，指定时清理目录下已删除文件的缓存记录
+        snapshot: 扫描快照，指定时只重新扫描修改时间有变化的目录
+        walk_jobs: 并发列出目录的线程数（遍历顺序不变）
+        records: 追加到已有的文件记录表（多个目录共用一个索引时使用），为None时新建
         
     Returns:
-        字典，key为MD5值，value为文件路径列表（可能多个文件有相同MD5）
+        文件记录表（文件编号即遍历顺序）
     """
-    md5_dict = {}
     directory = os.path.abspath(directory)
     
     print(f"\n正在扫描目录: {directory}")
+    if records is None:
+        records = FileRecords()
+    first_id = len(records)
+    for file_entry in walk_files(directory, snapshot, walk_jobs):
+        records.add(file_entry)
+    if snapshot:
+        print(f"  {snapshot.summary()}")
+    # 删除已不存在的文件的缓存记录
+    if cache:
+        pruned = cache.prune(directory, (records.path(file_id) for file_id in range(first_id, len(records))))
+        if pruned:
+            print(f"  已清理 {pruned} 个已删除文件的缓存记录")
+    return records
+
+
+def hash_records(records: FileRecords, file_ids: Iterable[int], jobs: int = 1,
+                 cache: Optional[HashCache] = None,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 algorithm: str = 'md5') -> DigestIndex:
+    """
+    计算文件记录表中指定文件的哈希值（默认MD5）
+    
+    Args:
+        records: 文件记录表
+        file_ids: 要计算的文件编号（按遍历顺序）
+        jobs: 并行计算哈希的线程数
+        cache: 哈希缓存，为None时不使用缓存
+        buffer_size: 读取缓冲区大小（字节）
+        algorithm: 哈希算法名
+        
+    Returns:
+        哈希值 -> 文件路径列表的紧凑索引
+    """
     file_count = 0
     image_count = 0
     
-    for root, dirs, files in os.walk(directory):
-        for filename in files:
-            file_path = os.path.join(root, filename)
-            md5_value = calculate_md5(file_path)
+    # 多线程计算哈希，结果按遍历顺序返回，保证输出稳定
+    def hash_of(file_id):
+        file_entry = records.entry(file_id)
+        return calculate_hash_cached(file_entry.path, cache, algorithm, buffer_size, file_entry)
+    
+    file_ids, hash_inputs = tee(file_ids)
+    md5_dict = DigestIndex(records)
+    for file_id, md5_value in zip(file_ids, parallel_map(hash_of, hash_inputs, jobs)):
+        if md5_value:
+            md5_dict.add(md5_value, file_id)
+            file_count += 1
             
-            if md5_value:
-                if md5_value not in md5_dict:
-                    md5_dict[md5_value] = []
-                md5_dict[md5_value].append(file_path)
-                file_count += 1
-                
-                if is_image_file(file_path):
-                    image_count += 1
-                
-                if file_count % 100 == 0:
-                    print(f"  已处理 {file_count} 个文件（{image_count} 个图片）...")
+            if is_image_file(records.path(file_id)):
+                image_count += 1
+            
+            if file_count % 100 == 0:
+                print(f"  已处理 {file_count} 个文件（{image_count} 个图片）...")
     
-    print(f"  完成！共处理 {file_count} 个文件，其中 {image_count} 个图片，{len(md5_dict)} 个唯一MD5值")
+    print(f"  完成！共处理 {file_count} 个文件，其中 {image_count} 个图片，{len(md5_dict)} 个唯一{algorithm.upper()}值")
     return md5_dict
 
 
-def compare_directories(dir1: str, dir2: str) -> List[Tuple[str, List[str], List[str]]]:
+def scan_directory(directory: str, jobs: int = 1,
+                   cache: Optional[HashCache] = None,
+                   buffer_size: int = DEFAULT_BUFFER_SIZE,
+                   algorithm: str = 'md5',
+                   snapshot: Optional[ScanSnapshot] = None,
+                   walk_jobs: int = 1) -> DigestIndex:
+    """
+    扫描目录，计算所有文件的哈希值（默认MD5）
+    
+    Args:
+        directory: 要扫描的目录路径
+        jobs: 并行计算哈希的线程数
+        cache: 哈希缓存，为None时不使用缓存
+        buffer_size: 读取缓冲区大小（字节）
+        algorithm: 哈希算法名
+        snapshot: 扫描快照，指定时只重新扫描修改时间有变化的目录
+        walk_jobs: 并发列出目录的线程数（遍历顺序不变）
+        
+    Returns:
+        哈希值 -> 文件路径列表的紧凑索引（用法同字典，可能多个文件有相同哈希值），
+        索引的 records 中保存了遍历时读取到的文件大小等信息
+    """
+    records = walk_directory(directory, cache, snapshot, walk_jobs)
+    return hash_records(records, range(len(records)), jobs, cache, buffer_size, algorithm)
+
+
+def hash_join_directories(dir1: str, dir2: str, jobs: int = 1,
+                          cache: Optional[HashCache] = None,
+                          buffer_size: int = DEFAULT_BUFFER_SIZE,
+                          algorithm: str = 'md5',
+                          snapshots: Tuple[Optional[ScanSnapshot], Optional[ScanSnapshot]] = (None, None),
+                          walk_jobs: int = 1) -> Tuple[DigestIndex, DigestIndex]:
     """
-    对比两个目录中MD5相同的文件
+    哈希连接：只计算大小可能匹配的文件的哈希值
+    
+    先遍历两个目录（只读取文件信息），以文件较少的一侧建立文件大小索引，
+    另一侧只有大小在索引中的文件才需要计算哈希；建立索引的一侧也只计算大小在另一侧出现过的文件，
+    两侧目录大小悬殊时可以跳过较大目录中的大部分文件
     
     Args:
         dir1: 第一个目录路径（国内版本）
         dir2: 第二个目录路径（国外版本）
+        jobs: 并行计算哈希的线程数
+        cache: 哈希缓存，为None时不使用缓存
+        buffer_size: 读取缓冲区大小（字节）
+        algorithm: 哈希算法名
+        snapshots: 两个目录的扫描快照，指定时只重新扫描修改时间有变化的目录
+        walk_jobs: 并发列出目录的线程数（遍历顺序不变）
         
     Returns:
-        匹配结果列表，每个元素为 (md5值, dir1中的文件列表, dir2中的文件列表)
+        (dir1的哈希索引, dir2的哈希索引)，与 scan_directory 相同，但不包含大小不可能匹配的文件
+    """
+    records1 = walk_directory(dir1, cache, snapshots[0], walk_jobs)
+    records2 = walk_directory(dir2, cache, snapshots[1], walk_jobs)
+    
+    # 以文件较少的一侧建立大小索引，另一侧按大小探测
+    build, probe = (records1, records2) if len(records1) <= len(records2) else (records2, records1)
+    build_sizes = {build.size(file_id) for file_id in range(len(build))}
+    probe_ids = array('L', (file_id for file_id in range(len(probe)) if probe.size(file_id) in build_sizes))
+    probe_sizes = {probe.size(file_id) for file_id in probe_ids}
+    build_ids = array('L', (file_id for file_id in range(len(build)) if build.size(file_id) in probe_sizes))
+    del build_sizes, probe_sizes
+    
+    build_name, probe_name = ('目录1', '目录2') if build is records1 else ('目录2', '目录1')
+    print(f"\n哈希连接: 以{build_name}（{len(build)} 个文件）建立大小索引，"
+          f"{probe_name}的 {len(probe)} 个文件中只有 {len(probe_ids)} 个大小匹配")
+    print(f"需要计算哈希的文件共 {len(build_ids) + len(probe_ids)} 个（完整扫描需要 {len(build) + len(probe)} 个）")
+    
+    print(f"\n正在计算{build_name}中大小匹配的文件的哈希值...")
+    build_index = hash_records(build, build_ids, jobs, cache, buffer_size, algorithm)
+    print(f"\n正在计算{probe_name}中大小匹配的文件的哈希值...")
+    probe_index = hash_records(probe, probe_ids, jobs, cache, buffer_size, algorithm)
+    return (build_index, probe_index) if build is records1 else (probe_index, build_index)
+
+
+def compare_directories(dir1: str, dir2: str, jobs: int = 1,
+                        cache: Optional[HashCache] = None,
+                        buffer_size: int = DEFAULT_BUFFER_SIZE,
+                        algorithm: str = 'md5',
+                        verify: bool = False,
+                        snapshots: Tuple[Optional[ScanSnapshot], Optional[ScanSnapshot]] = (None, None),
+                        file_sizes: Optional[Dict[str, int]] = None,
+                        walk_jobs: int = 1,
+                        join: bool = False
+                        ) -> List[Tuple[str, List[str], List[str]]]:
+    """
+    对比两个目录中哈希值（默认MD5）相同的文件
+    
+    Args:
+        dir1: 第一个目录路径（国内版本）
+        dir2: 第二个目录路径（国外版本）
+        jobs: 并行计算哈希的线程数
+        cache: 哈希缓存，为None时不使用缓存
+        buffer_size: 读取缓冲区大小（字节）
+        algorithm: 哈希算法名
+        verify: 是否对匹配的文件组再用强哈希（SHA256）复核，复核后结果中的哈希值为强哈希值
+        snapshots: 两个目录的扫描快照，指定时只重新扫描修改时间有变化的目录
+        file_sizes: 不为None时，写入匹配上的dir1文件在遍历时读取到的大小（导出时不必再读取）
+        walk_jobs: 并发列出目录的线程数（遍历顺序不变）
+        join: 是否使用哈希连接（只计算大小可能匹配的文件的哈希值，结果相同）
+        
+    Returns:
+        匹配结果列表，每个元素为 (哈希值, dir1中的文件列表, dir2中的文件列表)
     """
     print("\n" + "="*60)
     print("开始扫描文件...")
     print("="*60)
     
-    md5_dict1 = scan_directory(dir1)
-    md5_dict2 = scan_directory(dir2)
+    if join:
+        md5_dict1, md5_dict2 = hash_join_directories(dir1, dir2, jobs, cache, buffer_size, algorithm, snapshots,
+                                                     walk_jobs)
+    else:
+        md5_dict1 = scan_directory(dir1, jobs, cache, buffer_size, algorithm, snapshots[0], walk_jobs=walk_jobs)
+        md5_dict2 = scan_directory(dir2, jobs, cache, buffer_size, algorithm, snapshots[1], walk_jobs=walk_jobs)
     
-    # 找到共同的MD5值
+    # 找到共同的哈希值
     common_md5 = set(md5_dict1.keys()) & set(md5_dict2.keys())
     
-    print(f"\n找到 {len(common_md5)} 个MD5值匹配的文件组")
+    print(f"\n找到 {len(common_md5)} 个{algorithm.upper()}值匹配的文件组")
+    
+    # 只保留匹配上的dir1文件的大小（导出时使用）
+    records1 = md5_dict1.records
+    sizes1 = {records1.path(file_id): records1.size(file_id)
+              for md5_value in common_md5 for file_id in md5_dict1.file_ids(md5_value)}
+    
+    # 强哈希复核：只重新计算已经匹配上的文件，按强哈希值重新匹配
+    if verify and algorithm != STRONG_HASH_ALGORITHM:
+        matched1 = [records1.entry(file_id) for md5_value in common_md5
+                    for file_id in md5_dict1.file_ids(md5_value)]
+        matched2 = [md5_dict2.records.entry(file_id) for md5_value in common_md5
+                    for file_id in md5_dict2.file_ids(md5_value)]
+        print(f"正在使用 {STRONG_HASH_ALGORITHM.upper()} 复核 {len(matched1) + len(matched2)} 个匹配文件...")
+        
+        def regroup(file_entries):
+            strong_dict = {}
+            # 复用遍历时读取的文件信息，不再重新stat
+            strong_results = parallel_map(
+                lambda entry: calculate_hash_cached(entry.path, cache, STRONG_HASH_ALGORITHM, buffer_size, entry),
+                file_entries, jobs)
+            for file_entry, strong_value in zip(file_entries, strong_results):
+                if strong_value:
+                    strong_dict.setdefault(strong_value, []).append(file_entry.path)
+            return strong_dict
+        
+        md5_dict1 = regroup(matched1)
+        md5_dict2 = regroup(matched2)
+        common_md5 = set(md5_dict1.keys()) & set(md5_dict2.keys())
+        print(f"复核后共 {len(common_md5)} 个{STRONG_HASH_ALGORITHM.upper()}值匹配的文件组")
+    
+    if cache:
+        print(f"\n哈希缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
     
     # 构建结果列表
     results = []
     for md5_value in sorted(common_md5):
         results.append((md5_value, md5_dict1[md5_value], md5_dict2[md5_value]))
     
+    if file_sizes is not None:
+        file_sizes.update((path, sizes1[path]) for _, files1, _ in results for path in files1)
+    
     return results
 
 
+def compare_similar_images(dir1: str, dir2: str,
+                           algorithm: str = 'phash',
+                           max_distance: int = DEFAULT_MAX_DISTANCE,
+                           jobs: int = 1,
+                           cache: Optional[HashCache] = None,
+                           snapshots: Tuple[Optional[ScanSnapshot], Optional[ScanSnapshot]] = (None, None),
+                           file_sizes: Optional[Dict[str, int]] = None,
+                           walk_jobs: int = 1
+                           ) -> List[Tuple[str, List[str], List[str]]]:
+    """
+    按感知哈希对比两个目录中的近似图片（重新编码、压缩或缩放过的同一张图片）
+    
+    两个目录的图片一起用BK树按汉明距离分组，只保留两边都有图片的组
+    
+    Args:
+        dir1: 第一个目录路径（国内版本）
+        dir2: 第二个目录路径（国外版本）
+        algorithm: 感知哈希算法（ahash / dhash / phash）
+        max_distance: 视为相似的最大汉明距离
+        jobs: 并行解码图片的进程数
+        cache: 哈希缓存，为None时不使用缓存
+        snapshots: 两个目录的扫描快照，指定时只重新扫描修改时间有变化的目录
+        file_sizes: 不为None时，写入匹配上的dir1图片在遍历时读取到的大小
+        walk_jobs: 并发列出目录的线程数（遍历顺序不变）
+        
+    Returns:
+        匹配结果列表，每个元素为 (组内第一张图片的感知哈希, dir1中的图片列表, dir2中的图片列表)
+    """
+    print("\n" + "="*60)
+    print(f"开始扫描图片（{algorithm} 感知哈希）...")
+    print("="*60)
+    
+    hashes = []
+    sizes1 = {}
+    for side, (directory, snapshot) in enumerate(zip((dir1, dir2), snapshots)):
+        directory = os.path.abspath(directory)
+        image_files = [(entry.path, entry) for entry in walk_files(directory, snapshot, walk_jobs)
+                       if is_image_file(entry.path)]
+        if side == 0:
+            sizes1 = {path: entry.st_size for path, entry in image_files}
+        print(f"\n目录 {directory}: {len(image_files)} 张图片")
+        if snapshot:
+            print(f"  {snapshot.summary()}")
+        image_hashes = perceptual_hash_files(image_files, algorithm, jobs, cache)
+        hashes.extend(((side, path), value) for path, value in image_hashes)
+    
+    hash_of = dict(hashes)
+    results = []
+    for items in group_similar(hashes, max_distance):
+        files1 = [path for side, path in items if side == 0]
+        files2 = [path for side, path in items if side == 1]
+        if files1 and files2:
+            results.append((format_hash(hash_of[items[0]]), files1, files2))
+    
+    if file_sizes is not None:
+        file_sizes.update((path, sizes1[path]) for _, files1, _ in results for path in files1)
+    
+    print(f"\n找到 {len(results)} 组近似图片（汉明距离不超过 {max_distance}）")
+    if cache:
+        print(f"\n哈希缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
+    
+    return results
+
+
+def compare_multiple_directories(directories: List[str], jobs: int = 1,
+                                 cache: Optional[HashCache] = None,
+                                 buffer_size: int = DEFAULT_BUFFER_SIZE,
+                                 algorithm: str = 'md5',
+                                 snapshots: Optional[Iterable[Optional[ScanSnapshot]]] = None,
+                                 walk_jobs: int = 1,
+                                 min_directories: int = 2
+                                 ) -> List[Tuple[str, int, List[List[str]]]]:
+    """
+    一次对比多个目录（例如各语言版本的资源目录）中内容相同的文件
+    
+    所有目录的文件记录在同一个记录表中，每个文件只计算一次哈希值，建立一个共同的哈希值索引，
+    N个目录的扫描量为O(N)，不需要两两对比
+    
+    Args:
+        directories: 目录路径列表
+        jobs: 并行计算哈希的线程数
+        cache: 哈希缓存，为None时不使用缓存
+        buffer_size: 读取缓冲区大小（字节）
+        algorithm: 哈希算法名
+        snapshots: 各目录的扫描快照（与 directories 一一对应），为None时完整扫描
+        walk_jobs: 并发列出目录的线程数（遍历顺序不变）
+        min_directories: 只保留至少在这么多个目录中出现的内容
+        
+    Returns:
+        匹配结果列表（按哈希值排序），每个元素为 (哈希值, 文件大小, 各目录中的文件列表)
+    """
+    print("\n" + "="*60)
+    print(f"开始扫描 {len(directories)} 个目录...")
+    print("="*60)
+    
+    # 各目录的文件依次追加到同一个记录表，first_ids[k] 为第k个目录的第一个文件编号
+    records = FileRecords()
+    first_ids = []
+    for directory, snapshot in zip(directories, snapshots or [None] * len(directories)):
+        first_ids.append(len(records))
+        walk_directory(directory, cache, snapshot, walk_jobs, records)
+    md5_dict = hash_records(records, range(len(records)), jobs, cache, buffer_size, algorithm)
+    
+    results = []
+    for md5_value, file_ids in md5_dict.groups():
+        files = [[] for _ in directories]
+        for file_id in file_ids:
+            files[bisect_right(first_ids, file_id) - 1].append(records.path(file_id))
+        if sum(1 for directory_files in files if directory_files) >= min_directories:
+            results.append((md5_value, records.size(file_ids[0]), files))
+    results.sort(key=lambda result: result[0])
+    
+    print(f"\n找到 {len(results)} 个至少在 {min_directories} 个目录中出现的{algorithm.upper()}值")
+    if cache:
+        print(f"\n哈希缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
+    
+    return results
+
+
+def compare_chunk_similarity(dir1: str, dir2: str, jobs: int = 1,
+                             average_chunk_size: int = DEFAULT_AVERAGE_CHUNK_SIZE,
+                             min_file_size: int = DEFAULT_CHUNK_MIN_FILE_SIZE,
+                             min_similarity: float = DEFAULT_MIN_SIMILARITY,
+                             snapshots: Tuple[Optional[ScanSnapshot], Optional[ScanSnapshot]] = (None, None),
+                             walk_jobs: int = 1) -> List[Dict]:
+    """
+    按内容定义分块对比两个目录中的大文件，找出内容大部分相同的文件（例如只有少量改动的资源包）
+    
+    dir1中每个文件的块摘要建立 块摘要 -> 文件 的索引，dir2中每个文件逐块查找索引，
+    累计与每个dir1文件共有的字节数，只与有共同块的文件比较
+    
+    Args:
+        dir1: 第一个目录路径（旧版本）
+        dir2: 第二个目录路径（新版本）
+        jobs: 并行分块的线程数
+        average_chunk_size: 平均块大小（字节）
+        min_file_size: 只对比不小于该大小的文件（字节）
+        min_similarity: 只报告相似度不低于该百分比的文件
+        snapshots: 两个目录的扫描快照，指定时只重新扫描修改时间有变化的目录
+        walk_jobs: 并发列出目录的线程数（遍历顺序不变）
+        
+    Returns:
+        每个有相似文件的dir2文件一行（按 path2 排序），每行为包含 CHUNK_COLUMNS 各列的字典：
+        与它共有内容最多的dir1文件、共有字节数、相似度（共有字节数占dir2文件的百分比）、
+        估算补丁大小（dir2文件中dir1文件没有的字节数）
+    """
+    print("\n" + "="*60)
+    print(f"开始扫描文件（内容定义分块，平均块大小 {format_file_size(average_chunk_size)}）...")
+    print("="*60)
+    if not fast_chunking_available():
+        print("  提示: 未安装 numpy，逐字节计算滚动哈希会很慢（pip install numpy）")
+    
+    sides = []
+    for directory, snapshot in zip((dir1, dir2), snapshots):
+        records = walk_directory(directory, None, snapshot, walk_jobs)
+        file_ids = [file_id for file_id in range(len(records)) if records.size(file_id) >= min_file_size]
+        print(f"  {len(file_ids)} 个文件不小于 {format_file_size(min_file_size)}，正在分块...")
+        chunk_lists = list(parallel_map(lambda file_id: chunk_file(records.path(file_id), average_chunk_size),
+                                        file_ids, jobs))
+        sides.append((records, file_ids, chunk_lists))
+    (records1, file_ids1, chunk_lists1), (records2, file_ids2, chunk_lists2) = sides
+    
+    # 块摘要 -> 包含该块的dir1文件（在 file_ids1 中的下标）
+    chunk_index = {}
+    for index1, chunks in enumerate(chunk_lists1):
+        for digest, _ in chunks:
+            postings = chunk_index.setdefault(digest, [])
+            if not postings or postings[-1] != index1:
+                postings.append(index1)
+    
+    rows = []
+    for file_id2, chunks in zip(file_ids2, chunk_lists2):
+        shared = {}
+        for digest, length in chunks:
+            postings = chunk_index.get(digest, ())
+            if len(postings) <= MAX_CHUNK_POSTINGS:
+                for index1 in postings:
+                    shared[index1] = shared.get(index1, 0) + length
+        if not shared:
+            continue
+        index1, shared_bytes = max(shared.items(), key=lambda item: (item[1], -item[0]))
+        size2 = records2.size(file_id2)
+        similarity = shared_bytes * 100.0 / size2 if size2 else 100.0
+        if similarity >= min_similarity:
+            file_id1 = file_ids1[index1]
+            rows.append({
+                'path1': get_relative_path(records1.path(file_id1), dir1),
+                'path2': get_relative_path(records2.path(file_id2), dir2),
+                'size1': records1.size(file_id1),
+                'size2': size2,
+                'shared_bytes': shared_bytes,
+                'similarity': round(similarity, 2),
+                'patch_bytes': size2 - shared_bytes,
+            })
+    rows.sort(key=lambda row: row['path2'])
+    
+    print(f"\n找到 {len(rows)} 个与dir1中的文件相似度不低于 {min_similarity:g}% 的文件，"
+          f"估算补丁总大小 {format_file_size(sum(row['patch_bytes'] for row in rows))}")
+    return rows
+
+
+def relative_path_index(md5_dict: DigestIndex, directory: str) -> Dict[str, Tuple[str, str, int]]:
+    """
+    建立相对路径索引
+    
+    Args:
+        md5_dict: scan_directory 返回的哈希值索引
+        directory: 被扫描的目录
+        
+    Returns:
+        规范化的相对路径（Windows下不区分大小写） -> (相对路径, 哈希值, 文件编号)
+    """
+    prefix_length = len(os.path.join(os.path.abspath(directory), ''))
+    path_index = {}
+    for md5_value, file_ids in md5_dict.groups():
+        for file_id in file_ids:
+            path = md5_dict.records.path(file_id)[prefix_length:]
+            path_index[os.path.normcase(path)] = (path, md5_value, file_id)
+    return path_index
+
+
+def diff_directories(dir1: str, dir2: str, jobs: int = 1,
+                     cache: Optional[HashCache] = None,
+                     buffer_size: int = DEFAULT_BUFFER_SIZE,
+                     algorithm: str = 'md5',
+                     snapshots: Tuple[Optional[ScanSnapshot], Optional[ScanSnapshot]] = (None, None),
+                     walk_jobs: int = 1) -> List[Dict]:
+    """
+    对比两个目录树的差异：修改、移动/重命名、删除、新增
+    
+    每个目录只扫描一次，按相对路径索引找出同一路径内容不同的文件（修改），
+    只在一侧存在的文件再按哈希值索引查找另一侧内容相同的文件（移动/重命名，同一内容有多个文件时按路径相似度配对），
+    剩下的为删除（只在dir1中）或新增（只在dir2中）；全部是字典查找，不做两两比较
+    
+    Args:
+        dir1: 第一个目录路径（旧版本）
+        dir2: 第二个目录路径（新版本）
+        jobs: 并行计算哈希的线程数
+        cache: 哈希缓存，为None时不使用缓存
+        buffer_size: 读取缓冲区大小（字节）
+        algorithm: 哈希算法名
+        snapshots: 两个目录的扫描快照，指定时只重新扫描修改时间有变化的目录
+        walk_jobs: 并发列出目录的线程数（遍历顺序不变）
+        
+    Returns:
+        差异记录列表，每条为包含 DIFF_COLUMNS 各列的字典（一侧没有文件时对应列为None），
+        按 修改、移动/重命名、删除、新增 的顺序排列，同类按路径排序
+    """
+    print("\n" + "="*60)
+    print("开始扫描文件...")
+    print("="*60)
+    
+    md5_dicts = [scan_directory(directory, jobs, cache, buffer_size, algorithm, snapshot, walk_jobs=walk_jobs)
+                 for directory, snapshot in zip((dir1, dir2), snapshots)]
+    paths1, paths2 = (relative_path_index(md5_dict, directory)
+                      for md5_dict, directory in zip(md5_dicts, (dir1, dir2)))
+    records1, records2 = (md5_dict.records for md5_dict in md5_dicts)
+    
+    def diff_row(change, item1, item2):
+        path1, md5_value1, file_id1 = item1 or (None, None, None)
+        path2, md5_value2, file_id2 = item2 or (None, None, None)
+        return {
+            'change': change,
+            'path1': path1,
+            'path2': path2,
+            'hash1': md5_value1,
+            'hash2': md5_value2,
+            'size1': records1.size(file_id1) if item1 else None,
+            'size2': records2.size(file_id2) if item2 else None,
+        }
+    
+    # 同一相对路径：内容相同为未变化，不同为修改；只在dir1中的文件按哈希值归类
+    modified = []
+    unchanged_count = 0
+    only1_by_md5 = {}
+    for key, item1 in paths1.items():
+        item2 = paths2.get(key)
+        if item2 is None:
+            only1_by_md5.setdefault(item1[1], []).append(item1)
+        elif item1[1] == item2[1]:
+            unchanged_count += 1
+        else:
+            modified.append(diff_row(CHANGE_MODIFIED, item1, item2))
+    only2_by_md5 = {}
+    for key, item2 in paths2.items():
+        if key not in paths1:
+            only2_by_md5.setdefault(item2[1], []).append(item2)
+    
+    # 只在一侧的文件中内容相同的为移动/重命名
+    renamed, removed, added = [], [], []
+    for md5_value, items1 in only1_by_md5.items():
+        items2 = only2_by_md5.pop(md5_value, [])
+        for i, j in pair_paths([item[0] for item in items1], [item[0] for item in items2]):
+            if i is None:
+                added.append(diff_row(CHANGE_ADDED, None, items2[j]))
+            elif j is None:
+                removed.append(diff_row(CHANGE_REMOVED, items1[i], None))
+            else:
+                renamed.append(diff_row(CHANGE_RENAMED, items1[i], items2[j]))
+    for items2 in only2_by_md5.values():
+        added.extend(diff_row(CHANGE_ADDED, None, item2) for item2 in items2)
+    
+    for rows, key in ((modified, 'path1'), (renamed, 'path1'), (removed, 'path1'), (added, 'path2')):
+        rows.sort(key=lambda row: row[key])
+    
+    print(f"\n{CHANGE_MODIFIED} {len(modified)} 个，{CHANGE_RENAMED} {len(renamed)} 个，"
+          f"{CHANGE_REMOVED} {len(removed)} 个，{CHANGE_ADDED} {len(added)} 个，未变化 {unchanged_count} 个")
+    if cache:
+        print(f"\n哈希缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
+    
+    return modified + renamed + removed + added
+
+
 def get_relative_path(file_path: str, base_dir: str) -> str:
     """
     获取相对路径
@@ -198,21 +730,133 @@ def format_file_size(size_bytes: int) -> str:
     return f"{size_bytes:.2f} TB"
 
 
+def get_file_size(file_path: Optional[str], file_sizes: Optional[Dict[str, int]] = None) -> int:
+    """
+    获取文件大小，优先使用遍历目录时记录的大小
+    
+    Args:
+        file_path: 文件路径，为None时返回0
+        file_sizes: 遍历时记录的文件大小
+        
+    Returns:
+        文件大小（字节），无法读取时返回0
+    """
+    if not file_path:
+        return 0
+    if file_sizes and file_path in file_sizes:
+        return file_sizes[file_path]
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def pair_group_files(files1: List[str], files2: List[str],
+                     dir1: str, dir2: str) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    按路径相似度（文件名、目录、扩展名）为一组匹配文件配对
+    
+    相对路径相同的文件直接配对，其余按相似度从高到低选出配对；
+    几百个相同占位文件的大组只给有共同词元的路径打分，不计算全部组合
+    
+    Args:
+        files1: dir1中的文件列表
+        files2: dir2中的文件列表
+        dir1: 第一个目录路径
+        dir2: 第二个目录路径
+        
+    Returns:
+        (dir1中的相对路径, dir2中的相对路径) 列表，共 max(len(files1), len(files2)) 行，多出的一侧为None
+    """
+    paths1 = [get_relative_path(path, dir1) for path in files1]
+    paths2 = [get_relative_path(path, dir2) for path in files2]
+    return [(paths1[i] if i is not None else None, paths2[j] if j is not None else None)
+            for i, j in pair_paths(paths1, paths2)]
+
+
+def export_to_records(results: List[Tuple[str, List[str], List[str]]],
+                      output_path: str,
+                      dir1: str,
+                      dir2: str,
+                      report_format: str,
+                      file_sizes: Optional[Dict[str, int]] = None):
+    """
+    将对比结果以CSV / JSON Lines / Parquet格式流式导出
+    
+    列: group(序号), hash(哈希值), path1/path2(两个目录中的相对路径，没有对应文件时为空),
+        size(文件大小，字节), file_type(图片/其他)
+    
+    Args:
+        results: 对比结果列表
+        output_path: 输出文件路径
+        dir1: 第一个目录路径
+        dir2: 第二个目录路径
+        report_format: 输出格式（csv / jsonl / parquet）
+        file_sizes: 遍历时记录的文件大小，有记录的文件不再重新读取
+    """
+    print(f"\n正在生成{report_format}文件: {output_path}")
+    
+    columns = ['group', 'hash', 'path1', 'path2', 'size', 'file_type']
+    with open_report_writer(output_path, columns, report_format, column_types={'group': int, 'size': int}) as writer:
+        for idx, (md5_value, files1, files2) in enumerate(results, 1):
+            file1 = files1[0] if files1 else None
+            file_size = get_file_size(file1, file_sizes)
+            file_type = "图片" if file1 and is_image_file(file1) else "其他"
+            
+            # 如果有多个文件对应，按路径相似度配对，每对占一行
+            for rel_path1, rel_path2 in pair_group_files(files1, files2, dir1, dir2):
+                writer.write_row({
+                    'group': idx,
+                    'hash': md5_value,
+                    'path1': rel_path1,
+                    'path2': rel_path2,
+                    'size': file_size,
+                    'file_type': file_type,
+                })
+    
+    print(f"文件生成成功！")
+    print(f"  - 共 {len(results)} 组匹配文件，{writer.row_count} 行")
+
+
 def export_to_excel(results: List[Tuple[str, List[str], List[str]]], 
                    output_path: str, 
                    dir1: str, 
                    dir2: str,
-                   include_images: bool = True):
+                   include_images: bool = True,
+                   hash_label: str = 'MD5',
+                   report_format: Optional[str] = None,
+                   group_start: int = 1,
+                   jobs: int = 1,
+                   thumbnail_quality: str = DEFAULT_THUMBNAIL_QUALITY,
+                   thumbnail_cache: Optional[str] = None,
+                   thumbnail_cache_bytes: int = DEFAULT_THUMBNAIL_CACHE_BYTES,
+                   file_sizes: Optional[Dict[str, int]] = None):
     """
     将对比结果导出到Excel文件
     
+    输出文件扩展名为 .csv/.jsonl/.parquet 或指定了 report_format 时，改用对应的输出后端；
+    预览图由 jobs 个进程并行生成，PNG数据直接在内存中交给openpyxl，不产生临时文件
+    
     Args:
         results: 对比结果列表
         output_path: 输出Excel文件路径
         dir1: 第一个目录路径
         dir2: 第二个目录路径
         include_images: 是否在Excel中插入图片预览
+        hash_label: 哈希值列的名称
+        report_format: 输出格式（xlsx / csv / jsonl / parquet），为None时根据扩展名判断
+        group_start: 第一组的序号（分片导出时使用）
+        jobs: 生成预览图的并行进程数
+        thumbnail_quality: 缩略图质量档位（fast / balanced / best）
+        thumbnail_cache: 缩略图缓存数据库路径（按文件内容哈希缓存），为None时不使用缓存
+        thumbnail_cache_bytes: 缩略图缓存大小上限（字节）
+        file_sizes: 遍历时记录的文件大小，有记录的文件不再重新读取
     """
+    report_format = detect_format(output_path, report_format)
+    if report_format != 'xlsx':
+        export_to_records(results, output_path, dir1, dir2, report_format, file_sizes)
+        return
+    
     print(f"\n正在生成Excel文件: {output_path}")
     
     # 创建工作簿
@@ -227,12 +871,12 @@ def export_to_excel(results: List[Tuple[str, List[str], List[str]]],
     
     # 写入表头
     if include_images:
-        headers = ["序号", "预览图", "MD5值", 
+        headers = ["序号", "预览图", f"{hash_label}值", 
                    f"文件路径1 ({os.path.basename(dir1)})", 
                    f"文件路径2 ({os.path.basename(dir2)})", 
                    "文件大小", "文件类型"]
     else:
-        headers = ["序号", "MD5值", 
+        headers = ["序号", f"{hash_label}值", 
                    f"文件路径1 ({os.path.basename(dir1)})", 
                    f"文件路径2 ({os.path.basename(dir2)})", 
                    "文件大小", "文件类型"]
@@ -246,31 +890,29 @@ def export_to_excel(results: List[Tuple[str, List[str], List[str]]],
         cell.fill = header_fill
         cell.alignment = header_alignment
     
-    # 临时文件列表（用于最后清理）
-    temp_files = []
-    
     # 写入数据
     row_num = 2
     image_count = 0
     
-    for idx, (md5_value, files1, files2) in enumerate(results, 1):
+    # 多进程按组顺序生成预览图（不需要预览图的组对应None），缓存中已有的直接复用
+    preview_items = ((f"{hash_label.lower()}:{md5_value}",
+                      get_preview_file(files1, files2, file_sizes) if include_images else None)
+                     for md5_value, files1, files2 in results)
+    thumbnails = iter_cached_thumbnails(preview_items, thumbnail_cache, max_size=(150, 150), jobs=jobs,
+                                        quality=thumbnail_quality, cache_bytes=thumbnail_cache_bytes)
+    
+    for idx, ((md5_value, files1, files2), thumb_data) in enumerate(zip(results, thumbnails), group_start):
         # 获取文件信息
         file1 = files1[0] if files1 else None
-        file2 = files2[0] if files2 else None
         
-        file_size = os.path.getsize(file1) if file1 else 0
+        file_size = get_file_size(file1, file_sizes)
         is_image = is_image_file(file1) if file1 else False
         file_type = "图片" if is_image else "其他"
         
-        # 如果有多个文件对应，每个组合占一行
-        max_count = max(len(files1), len(files2))
-        
-        for i in range(max_count):
-            current_file1 = files1[i] if i < len(files1) else None
-            current_file2 = files2[i] if i < len(files2) else None
-            
-            rel_path1 = get_relative_path(current_file1, dir1) if current_file1 else ""
-            rel_path2 = get_relative_path(current_file2, dir2) if current_file2 else ""
+        # 如果有多个文件对应，按路径相似度配对，每对占一行
+        for i, (rel_path1, rel_path2) in enumerate(pair_group_files(files1, files2, dir1, dir2)):
+            rel_path1 = rel_path1 or ""
+            rel_path2 = rel_path2 or ""
             
             if include_images:
                 row_data = [
@@ -304,35 +946,25 @@ def export_to_excel(results: List[Tuple[str, List[str], List[str]]],
                 # 设置行高（以磅为单位，1磅≈0.353mm）
                 ws.row_dimensions[row_num].height = 120
                 
-                # 优先使用第一个文件，如果不存在则使用第二个文件
-                preview_file = None
-                if current_file1 and os.path.exists(current_file1):
-                    preview_file = current_file1
-                elif current_file2 and os.path.exists(current_file2):
-                    preview_file = current_file2
-                
-                # 插入预览图
-                if preview_file:
-                    thumb_path = create_thumbnail(preview_file, max_size=(150, 150))
-                    if thumb_path:
-                        temp_files.append(thumb_path)
-                        try:
-                            img = ExcelImage(thumb_path)
-                            # 调整图片大小
-                            img.width = 150
-                            img.height = 150
-                            # 插入到B列（预览图）
-                            cell_pos = f'B{row_num}'
-                            ws.add_image(img, cell_pos)
-                            image_count += 1
-                        except Exception as e:
-                            print(f"  警告: 插入图片失败 {preview_file}: {e}")
+                # 插入预览图（优先使用第一个文件，如果不存在则使用第二个文件）
+                if thumb_data:
+                    try:
+                        img = ExcelImage(io.BytesIO(thumb_data))
+                        # 调整图片大小
+                        img.width = 150
+                        img.height = 150
+                        # 插入到B列（预览图）
+                        cell_pos = f'B{row_num}'
+                        ws.add_image(img, cell_pos)
+                        image_count += 1
+                    except Exception as e:
+                        print(f"  警告: 插入图片失败 {get_preview_file(files1, files2, file_sizes)}: {e}")
             
             row_num += 1
             
             # 每处理50个文件显示一次进度
             if idx % 50 == 0:
-                print(f"  已处理 {idx}/{len(results)} 组文件...")
+                print(f"  已处理 {idx - group_start + 1}/{len(results)} 组文件...")
     
     # 调整列宽
     if include_images:
@@ -358,52 +990,401 @@ def export_to_excel(results: List[Tuple[str, List[str], List[str]]],
     print(f"  正在保存Excel文件...")
     wb.save(output_path)
     
-    # 清理临时文件
-    print(f"  正在清理临时文件...")
-    for temp_file in temp_files:
-        try:
-            if os.path.exists(temp_file):
-                os.unlink(temp_file)
-        except:
-            pass
-    
     print(f"Excel文件生成成功！")
     print(f"  - 共 {len(results)} 组匹配文件")
     if include_images:
         print(f"  - 已插入 {image_count} 个图片预览")
 
 
+def export_to_excel_sharded(results: List[Tuple[str, List[str], List[str]]],
+                           output_path: str,
+                           dir1: str,
+                           dir2: str,
+                           include_images: bool = True,
+                           hash_label: str = 'MD5',
+                           max_rows: int = EXCEL_MAX_ROWS,
+                           jobs: int = 1,
+                           thumbnail_quality: str = DEFAULT_THUMBNAIL_QUALITY,
+                           thumbnail_cache: Optional[str] = None,
+                           thumbnail_cache_bytes: int = DEFAULT_THUMBNAIL_CACHE_BYTES,
+                           file_sizes: Optional[Dict[str, int]] = None):
+    """
+    结果行数超过Excel单表上限时，按组拆分到多个工作簿（同一组不会被拆开）
+    
+    各分片文件为 原文件名_partN.xlsx，可以用多进程并行写入；
+    output_path 本身为汇总工作簿，列出每个分片包含的组序号范围
+    
+    Args:
+        results: 对比结果列表
+        output_path: 汇总Excel文件路径
+        dir1: 第一个目录路径
+        dir2: 第二个目录路径
+        include_images: 是否在Excel中插入图片预览
+        hash_label: 哈希值列的名称
+        max_rows: 每个工作表的最大行数（含表头）
+        jobs: 并行写入的进程数
+        thumbnail_quality: 缩略图质量档位（fast / balanced / best）
+        thumbnail_cache: 缩略图缓存数据库路径（按文件内容哈希缓存），为None时不使用缓存
+        thumbnail_cache_bytes: 缩略图缓存大小上限（字节）
+        file_sizes: 遍历时记录的文件大小，有记录的文件不再重新读取
+    """
+    row_counts = [max(len(files1), len(files2)) for _, files1, files2 in results]
+    shards = plan_shards(row_counts, max_rows - 1)
+    print(f"\n结果共 {sum(row_counts)} 行，超过每个工作表 {max_rows} 行的上限，拆分为 {len(shards)} 个分片")
+    
+    shard_args = []
+    summary = []
+    for shard_index, (start, end) in enumerate(shards, 1):
+        shard_file = shard_path(output_path, shard_index)
+        row_count = sum(row_counts[start:end])
+        if row_count >= max_rows:
+            print(f"  警告: 第 {start + 1} 组包含 {row_count} 行，单组就超过了行数上限，建议输出为 .csv")
+        shard_results = results[start:end]
+        # 每个分片进程只需要本分片文件的大小
+        shard_sizes = ({files1[0]: file_sizes[files1[0]] for _, files1, _ in shard_results
+                        if files1 and files1[0] in file_sizes} if file_sizes else None)
+        shard_args.append((shard_results, shard_file, dir1, dir2, include_images, hash_label,
+                           'xlsx', start + 1, 1, thumbnail_quality, thumbnail_cache, thumbnail_cache_bytes,
+                           shard_sizes))
+        summary.append({'file': shard_file, 'first_group': start + 1, 'last_group': end,
+                        'group_count': end - start, 'row_count': row_count})
+    
+    run_shards(export_to_excel, shard_args, jobs)
+    write_shard_summary(output_path, summary)
+    print(f"\n分片汇总已保存到: {output_path}")
+
+
+def directory_labels(directories: List[str]) -> List[str]:
+    """
+    各目录在报告中的列名（目录名，重名时加上序号）
+    
+    Args:
+        directories: 目录路径列表
+        
+    Returns:
+        列名列表
+    """
+    names = [os.path.basename(os.path.abspath(directory)) for directory in directories]
+    return [name if names.count(name) == 1 else f"{name}_{index}" for index, name in enumerate(names, 1)]
+
+
+def export_matrix(results: List[Tuple[str, int, List[List[str]]]],
+                  output_path: str,
+                  directories: List[str],
+                  report_format: Optional[str] = None,
+                  hash_label: str = 'MD5'):
+    """
+    导出多目录对比的矩阵报告：每个内容（哈希值）一行，每个目录一列，单元格为该目录中的相对路径（多个用 ; 分隔）
+    
+    输出文件扩展名为 .csv/.jsonl/.parquet 或指定了 report_format 时流式写入对应格式；
+    xlsx 另有一个“共享统计”工作表，列出每两个目录共有的内容数，超过单表行数上限时改为输出同名的 .csv 文件
+    
+    Args:
+        results: compare_multiple_directories 返回的匹配结果
+        output_path: 输出文件路径
+        directories: 目录路径列表
+        report_format: 输出格式（xlsx / csv / jsonl / parquet），为None时根据扩展名判断
+        hash_label: 哈希值列的名称
+    """
+    labels = directory_labels(directories)
+    report_format = detect_format(output_path, report_format)
+    if report_format == 'xlsx' and len(results) + 1 > EXCEL_MAX_ROWS:
+        output_path = f"{os.path.splitext(output_path)[0]}.csv"
+        report_format = 'csv'
+        print(f"\n警告: 结果共 {len(results)} 行，超过Excel单表上限，改为输出CSV")
+    
+    def matrix_rows():
+        for idx, (md5_value, file_size, files) in enumerate(results, 1):
+            cells = ['; '.join(get_relative_path(path, directory) for path in directory_files)
+                     for directory, directory_files in zip(directories, files)]
+            yield idx, md5_value, file_size, sum(1 for directory_files in files if directory_files), cells
+    
+    print(f"\n正在生成{report_format}文件: {output_path}")
+    if report_format != 'xlsx':
+        columns = ['group', 'hash', 'size', 'directory_count'] + labels
+        column_types = {'group': int, 'size': int, 'directory_count': int}
+        with open_report_writer(output_path, columns, report_format, column_types) as writer:
+            for idx, md5_value, file_size, directory_count, cells in matrix_rows():
+                row = {'group': idx, 'hash': md5_value, 'size': file_size, 'directory_count': directory_count}
+                row.update((label, cell or None) for label, cell in zip(labels, cells))
+                writer.write_row(row)
+        print(f"文件生成成功！")
+        print(f"  - 共 {writer.row_count} 个共享内容")
+        return
+    
+    header_font = Font(bold=True, size=12, color="FFFFFF")
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    present_fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
+    
+    def write_header(ws, headers):
+        ws.append(headers)
+        for col_num in range(1, len(headers) + 1):
+            cell = ws.cell(row=1, column=col_num)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+        ws.freeze_panes = 'B2'
+    
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "多目录对比结果"
+    write_header(ws, ["序号", f"{hash_label}值", "文件大小", "目录数"] + labels)
+    
+    # 每两个目录共有的内容数
+    shared = [[0] * len(directories) for _ in directories]
+    for idx, md5_value, file_size, directory_count, cells in matrix_rows():
+        ws.append([idx, md5_value, format_file_size(file_size), directory_count] + cells)
+        present = [k for k, cell in enumerate(cells) if cell]
+        for k in present:
+            ws.cell(row=idx + 1, column=5 + k).fill = present_fill
+            for other in present:
+                shared[k][other] += 1
+    
+    ws.column_dimensions['A'].width = 8
+    ws.column_dimensions['B'].width = 35
+    ws.column_dimensions['C'].width = 12
+    ws.column_dimensions['D'].width = 8
+    for k in range(len(labels)):
+        ws.column_dimensions[get_column_letter(5 + k)].width = 40
+    
+    summary_ws = wb.create_sheet("共享统计")
+    write_header(summary_ws, [""] + labels)
+    for label, counts in zip(labels, shared):
+        summary_ws.append([label] + counts)
+    summary_ws.column_dimensions['A'].width = 20
+    
+    print(f"  正在保存Excel文件...")
+    wb.save(output_path)
+    print(f"Excel文件生成成功！")
+    print(f"  - 共 {len(results)} 个共享内容")
+
+
+def export_table(rows: List[Dict],
+                 output_path: str,
+                 columns: List[str],
+                 headers: List[str],
+                 widths: List[int],
+                 report_format: Optional[str] = None,
+                 sheet_title: str = "对比结果",
+                 formatters: Optional[Dict[str, Callable]] = None,
+                 row_label: str = "行",
+                 column_types: Optional[Dict[str, type]] = None):
+    """
+    把每行一个字典的报告导出为单个表格
+    
+    输出文件扩展名为 .csv/.jsonl/.parquet 或指定了 report_format 时流式写入对应格式（列为 columns）；
+    xlsx 超过单表行数上限时改为输出同名的 .csv 文件
+    
+    Args:
+        rows: 报告行，每行为包含 columns 各列的字典（没有值时为None）
+        output_path: 输出文件路径
+        columns: 列名（csv / jsonl / parquet 中使用）
+        headers: Excel表头（与 columns 一一对应）
+        widths: Excel列宽（与 columns 一一对应）
+        report_format: 输出格式（xlsx / csv / jsonl / parquet），为None时根据扩展名判断
+        sheet_title: Excel工作表名称
+        formatters: 列名 -> Excel中显示该列的值时使用的格式化函数（例如文件大小）
+        row_label: 完成时统计信息中行的名称
+        column_types: 列名 -> 值的类型（int / float，未声明的列为字符串，Parquet 中使用）
+    """
+    report_format = detect_format(output_path, report_format)
+    if report_format == 'xlsx' and len(rows) + 1 > EXCEL_MAX_ROWS:
+        output_path = f"{os.path.splitext(output_path)[0]}.csv"
+        report_format = 'csv'
+        print(f"\n警告: 结果共 {len(rows)} 行，超过Excel单表上限，改为输出CSV")
+    
+    print(f"\n正在生成{report_format}文件: {output_path}")
+    if report_format != 'xlsx':
+        with open_report_writer(output_path, columns, report_format, column_types) as writer:
+            for row in rows:
+                writer.write_row(row)
+        print(f"文件生成成功！")
+        print(f"  - 共 {writer.row_count} {row_label}")
+        return
+    
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = sheet_title
+    
+    ws.append(headers)
+    header_font = Font(bold=True, size=12, color="FFFFFF")
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    for col_num in range(1, len(headers) + 1):
+        cell = ws.cell(row=1, column=col_num)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+    
+    formatters = formatters or {}
+    for row in rows:
+        ws.append(["" if row[column] is None else formatters.get(column, lambda value: value)(row[column])
+                   for column in columns])
+    
+    for col_num, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
+    ws.freeze_panes = 'A2'
+    
+    print(f"  正在保存Excel文件...")
+    wb.save(output_path)
+    print(f"Excel文件生成成功！")
+    print(f"  - 共 {len(rows)} {row_label}")
+
+
+def export_diff(rows: List[Dict],
+                output_path: str,
+                dir1: str,
+                dir2: str,
+                report_format: Optional[str] = None,
+                hash_label: str = 'MD5'):
+    """
+    导出目录差异报告（列为 DIFF_COLUMNS）
+    
+    Args:
+        rows: diff_directories 返回的差异记录
+        output_path: 输出文件路径
+        dir1: 第一个目录路径
+        dir2: 第二个目录路径
+        report_format: 输出格式（xlsx / csv / jsonl / parquet），为None时根据扩展名判断
+        hash_label: 哈希值列的名称
+    """
+    headers = ["变化",
+               f"文件路径1 ({os.path.basename(dir1)})",
+               f"文件路径2 ({os.path.basename(dir2)})",
+               f"{hash_label}值1", f"{hash_label}值2", "文件大小1", "文件大小2"]
+    export_table(rows, output_path, DIFF_COLUMNS, headers, [12, 50, 50, 35, 35, 12, 12], report_format,
+                 sheet_title="目录差异", formatters={'size1': format_file_size, 'size2': format_file_size},
+                 row_label="行差异", column_types=DIFF_COLUMN_TYPES)
+
+
+def export_chunk_similarity(rows: List[Dict],
+                            output_path: str,
+                            dir1: str,
+                            dir2: str,
+                            report_format: Optional[str] = None):
+    """
+    导出分块相似度报告（列为 CHUNK_COLUMNS）
+    
+    Args:
+        rows: compare_chunk_similarity 返回的结果
+        output_path: 输出文件路径
+        dir1: 第一个目录路径
+        dir2: 第二个目录路径
+        report_format: 输出格式（xlsx / csv / jsonl / parquet），为None时根据扩展名判断
+    """
+    headers = [f"文件路径1 ({os.path.basename(dir1)})",
+               f"文件路径2 ({os.path.basename(dir2)})",
+               "文件大小1", "文件大小2", "共同内容", "相似度(%)", "估算补丁大小"]
+    export_table(rows, output_path, CHUNK_COLUMNS, headers, [50, 50, 12, 12, 12, 10, 14], report_format,
+                 sheet_title="分块相似度",
+                 formatters={'size1': format_file_size, 'size2': format_file_size,
+                             'shared_bytes': format_file_size, 'patch_bytes': format_file_size},
+                 row_label="对相似文件", column_types=CHUNK_COLUMN_TYPES)
+
+
 def main():
     """
     主函数
     """
     parser = argparse.ArgumentParser(
-        description='游戏资源文件对比工具 - 通过MD5值匹配两个文件夹中的对应文件（支持图片预览）',
+        description='游戏资源文件对比工具 - 通过MD5值（或其他哈希算法）匹配两个文件夹中的对应文件（支持图片预览）',
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 使用示例:
   python compare_resources.py D:/assets/cn D:/assets/en D:/output/contrast.xlsx
   python compare_resources.py "C:/Game/Resources/CN" "C:/Game/Resources/EN" "C:/output/result.xlsx"
   python compare_resources.py D:/assets/cn D:/assets/en D:/output/result.xlsx --no-images
+  python compare_resources.py D:/assets/cn D:/assets/en D:/output/result.xlsx --jobs 8
+  python compare_resources.py D:/assets/cn D:/assets/en D:/output/result.xlsx --rebuild-cache
+  python compare_resources.py D:/assets/cn D:/assets/en D:/output/result.xlsx --hash blake2b --verify
+  python compare_resources.py D:/assets/cn D:/assets/en D:/output/result.csv
+  python compare_resources.py D:/assets/cn D:/assets/en D:/output/similar.xlsx --similar phash
+  python compare_resources.py D:/release/v1 D:/release/v2 D:/output/diff.xlsx --diff
+  python compare_resources.py D:/assets/cn D:/assets/en D:/output/locales.xlsx --extra-dirs D:/assets/jp D:/assets/kr
+  python compare_resources.py D:/release/v1 D:/release/v2 D:/output/bundles.csv --chunks
         """
     )
     
     parser.add_argument('dir1', type=str, help='第一个文件夹路径（国内版本）')
     parser.add_argument('dir2', type=str, help='第二个文件夹路径（国外版本）')
-    parser.add_argument('output', type=str, help='输出Excel文件路径（例如: contrast.xlsx）')
+    parser.add_argument('output', type=str,
+                       help='输出文件路径（例如: contrast.xlsx；扩展名为 .csv/.jsonl/.parquet 时输出对应格式）')
     parser.add_argument('--no-images', action='store_true', 
                        help='不在Excel中插入图片预览（加快处理速度）')
+    parser.add_argument('--jobs', '-j', type=int, default=default_jobs(),
+                       help=f'并行数：计算哈希的线程数，以及生成预览图、写入分片的进程数（默认: {default_jobs()}）')
+    parser.add_argument('--no-cache', action='store_true',
+                       help=f'不使用哈希缓存（默认在输出文件旁保存 {DEFAULT_CACHE_NAME}）')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                       help='清空哈希缓存并重新计算所有文件')
+    parser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE // 1024,
+                       help=f'计算哈希时的读取缓冲区大小，单位KB（默认: {DEFAULT_BUFFER_SIZE // 1024}）')
+    parser.add_argument('--format', dest='report_format', choices=available_formats(), default=None,
+                       help='输出格式（默认根据输出文件扩展名判断，无法判断时为 xlsx；parquet 需要安装 pyarrow）')
+    parser.add_argument('--thumbnail-quality', choices=list(THUMBNAIL_QUALITIES), default=DEFAULT_THUMBNAIL_QUALITY,
+                       help=f'预览图质量：fast（JPEG草稿解码+双线性，最快）、balanced、best（完整解码+LANCZOS）'
+                            f'（默认: {DEFAULT_THUMBNAIL_QUALITY}）')
+    parser.add_argument('--thumbnail-cache', type=str, default=DEFAULT_THUMBNAIL_CACHE,
+                       help=f'缩略图缓存数据库路径，与重复文件检测工具共用（默认: {DEFAULT_THUMBNAIL_CACHE}）')
+    parser.add_argument('--thumbnail-cache-size', type=int, default=DEFAULT_THUMBNAIL_CACHE_BYTES // (1024 * 1024),
+                       help=f'缩略图缓存大小上限，单位MB，超出时淘汰最久未使用的缩略图'
+                            f'（默认: {DEFAULT_THUMBNAIL_CACHE_BYTES // (1024 * 1024)}）')
+    parser.add_argument('--no-thumbnail-cache', action='store_true',
+                       help='不使用缩略图缓存')
+    parser.add_argument('--similar', metavar='ALGO', choices=available_perceptual_algorithms(), default=None,
+                       help='改为按感知哈希匹配近似图片（重新编码、压缩或缩放过的同一张图片），'
+                            '算法可选 ahash、dhash、phash（需要安装 numpy）')
+    parser.add_argument('--similar-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                       help=f'近似图片的最大汉明距离（64位哈希，越小越严格，默认: {DEFAULT_MAX_DISTANCE}）')
+    parser.add_argument('--incremental', action='store_true',
+                       help='增量扫描：保存两个目录的快照，下次只重新扫描修改时间有变化的目录'
+                            '（原地改写文件内容不会被发现，需要时用 --rebuild-snapshot）')
+    parser.add_argument('--rebuild-snapshot', action='store_true',
+                       help='完整扫描一次并重建增量扫描快照（隐含 --incremental）')
+    parser.add_argument('--walk-jobs', type=int, default=1,
+                       help='并发列出目录的线程数，网络存储上建议8~32，结果顺序与单线程一致（默认: 1）')
+    parser.add_argument('--join', action='store_true',
+                       help='哈希连接：先按文件大小建立较小目录的索引，较大目录只计算大小匹配的文件的哈希值'
+                            '（结果与完整扫描相同，两个目录大小悬殊时快很多）')
+    parser.add_argument('--diff', action='store_true',
+                       help='目录差异模式：报告修改、移动/重命名、删除（只在目录1中）、新增（只在目录2中）的文件')
+    parser.add_argument('--extra-dirs', nargs='+', metavar='DIR', default=None,
+                       help='多目录模式：与目录1、目录2一起对比更多目录（例如各语言版本），每个目录只扫描一次，'
+                            '输出每个内容在哪些目录中出现的矩阵报告')
+    parser.add_argument('--chunks', action='store_true',
+                       help='分块相似度模式：按内容定义分块对比大文件，报告目录2中每个文件与目录1中最相似文件的'
+                            '共同内容百分比和估算补丁大小（建议安装 numpy）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_AVERAGE_CHUNK_SIZE // 1024,
+                       help=f'分块相似度模式的平均块大小，单位KB（默认: {DEFAULT_AVERAGE_CHUNK_SIZE // 1024}）')
+    parser.add_argument('--chunk-min-file-size', type=int, default=DEFAULT_CHUNK_MIN_FILE_SIZE // 1024,
+                       help=f'分块相似度模式只对比不小于该大小的文件，单位KB'
+                            f'（默认: {DEFAULT_CHUNK_MIN_FILE_SIZE // 1024}）')
+    parser.add_argument('--min-similarity', type=float, default=DEFAULT_MIN_SIMILARITY,
+                       help=f'分块相似度模式只报告相似度不低于该百分比的文件（默认: {DEFAULT_MIN_SIMILARITY:g}）')
+    parser.add_argument('--max-rows', type=int, default=EXCEL_MAX_ROWS,
+                       help=f'每个Excel工作表的最大行数，超过时按组拆分为多个文件（默认: {EXCEL_MAX_ROWS}）')
+    parser.add_argument('--hash', dest='algorithm', choices=available_algorithms(), default='md5',
+                       help='哈希算法（默认: md5；blake2b 通常更快，xxh3/xxh64 需要安装 xxhash）')
+    parser.add_argument('--verify', action='store_true',
+                       help=f'对匹配的文件再用 {STRONG_HASH_ALGORITHM} 复核（报告中显示 {STRONG_HASH_ALGORITHM} 值）')
     
     args = parser.parse_args()
+    if args.join and args.similar:
+        parser.error('--join 不能与 --similar 同时使用')
+    if args.diff and (args.similar or args.join or args.verify):
+        parser.error('--diff 不能与 --similar、--join、--verify 同时使用')
+    if args.extra_dirs and (args.similar or args.join or args.verify or args.diff):
+        parser.error('--extra-dirs 不能与 --similar、--join、--verify、--diff 同时使用')
+    if args.chunks and (args.similar or args.join or args.verify or args.diff or args.extra_dirs):
+        parser.error('--chunks 不能与 --similar、--join、--verify、--diff、--extra-dirs 同时使用')
+    directories = [args.dir1, args.dir2] + (args.extra_dirs or [])
     
     # 验证输入目录
-    if not os.path.isdir(args.dir1):
-        print(f"错误: 目录不存在: {args.dir1}")
-        return
-    
-    if not os.path.isdir(args.dir2):
-        print(f"错误: 目录不存在: {args.dir2}")
-        return
+    for directory in directories:
+        if not os.path.isdir(directory):
+            print(f"错误: 目录不存在: {directory}")
+            return
     
     # 确保输出目录存在
     output_dir = os.path.dirname(args.output)
@@ -411,25 +1392,123 @@ def main():
         os.makedirs(output_dir)
         print(f"创建输出目录: {output_dir}")
     
-    # 确保输出文件有.xlsx扩展名
-    if not args.output.lower().endswith('.xlsx'):
-        args.output += '.xlsx'
+    # 确定输出格式，并确保输出文件有对应的扩展名（默认.xlsx）
+    report_format = detect_format(args.output, args.report_format)
+    args.output = with_format_extension(args.output, report_format)
     
     print("="*60)
     print("游戏资源文件对比工具（带图片预览）")
     print("="*60)
-    print(f"目录1: {args.dir1}")
-    print(f"目录2: {args.dir2}")
+    for index, directory in enumerate(directories, 1):
+        print(f"目录{index}: {directory}")
     print(f"输出文件: {args.output}")
     print(f"图片预览: {'否' if args.no_images else '是'}")
+    print(f"并行线程数: {args.jobs}")
+    if args.diff:
+        print(f"对比方式: 目录差异（{args.algorithm}）")
+    elif args.extra_dirs:
+        print(f"对比方式: {len(directories)} 个目录一起对比（{args.algorithm}）")
+    elif args.chunks:
+        print(f"对比方式: 内容定义分块相似度（平均块大小 {args.chunk_size} KB）")
+    elif args.similar:
+        print(f"匹配方式: {args.similar} 感知哈希（最大汉明距离 {args.similar_distance}）")
+    else:
+        print(f"哈希算法: {args.algorithm}{f'（{STRONG_HASH_ALGORITHM} 复核）' if args.verify else ''}")
+    
+    # 打开哈希缓存（文件未变化时直接复用上次计算的哈希值）
+    cache = None
+    if not args.no_cache:
+        cache_path = os.path.join(os.path.dirname(os.path.abspath(args.output)), DEFAULT_CACHE_NAME)
+        cache = HashCache(cache_path, rebuild=args.rebuild_cache)
+        print(f"哈希缓存: {cache_path}")
+    
+    # 增量扫描快照（只重新扫描修改时间有变化的目录）
+    snapshots = (None,) * len(directories)
+    if args.incremental or args.rebuild_snapshot:
+        snapshots = tuple(ScanSnapshot(os.path.abspath(directory), rebuild=args.rebuild_snapshot)
+                          for directory in directories)
+    
+    # 执行对比（同时记录遍历时读取到的文件大小，导出时不必再读取）
+    file_sizes = {}
+    try:
+        if args.diff:
+            diff_rows = diff_directories(args.dir1, args.dir2, jobs=args.jobs, cache=cache,
+                                         buffer_size=args.buffer_size * 1024, algorithm=args.algorithm,
+                                         snapshots=snapshots, walk_jobs=args.walk_jobs)
+        elif args.chunks:
+            chunk_rows = compare_chunk_similarity(args.dir1, args.dir2, jobs=args.jobs,
+                                                  average_chunk_size=args.chunk_size * 1024,
+                                                  min_file_size=args.chunk_min_file_size * 1024,
+                                                  min_similarity=args.min_similarity,
+                                                  snapshots=snapshots, walk_jobs=args.walk_jobs)
+        elif args.extra_dirs:
+            results = compare_multiple_directories(directories, jobs=args.jobs, cache=cache,
+                                                   buffer_size=args.buffer_size * 1024, algorithm=args.algorithm,
+                                                   snapshots=snapshots, walk_jobs=args.walk_jobs)
+        elif args.similar:
+            results = compare_similar_images(args.dir1, args.dir2, args.similar, args.similar_distance,
+                                             jobs=args.jobs, cache=cache, snapshots=snapshots,
+                                             file_sizes=file_sizes, walk_jobs=args.walk_jobs)
+        else:
+            results = compare_directories(args.dir1, args.dir2, jobs=args.jobs, cache=cache,
+                                          buffer_size=args.buffer_size * 1024,
+                                          algorithm=args.algorithm, verify=args.verify,
+                                          snapshots=snapshots, file_sizes=file_sizes,
+                                          walk_jobs=args.walk_jobs, join=args.join)
+    finally:
+        if cache:
+            cache.close()
+    for snapshot in snapshots:
+        if snapshot:
+            snapshot.save()
+    
+    if args.diff:
+        export_diff(diff_rows, args.output, args.dir1, args.dir2, report_format, args.algorithm.upper())
+        print("\n" + "="*60)
+        print("处理完成！")
+        print("="*60)
+        return
     
-    # 执行对比
-    results = compare_directories(args.dir1, args.dir2)
+    if args.chunks:
+        export_chunk_similarity(chunk_rows, args.output, args.dir1, args.dir2, report_format)
+        print("\n" + "="*60)
+        print("处理完成！")
+        print("="*60)
+        return
+    
+    if args.extra_dirs:
+        if results:
+            export_matrix(results, args.output, directories, report_format, args.algorithm.upper())
+            print("\n" + "="*60)
+            print("处理完成！")
+            print("="*60)
+        else:
+            print("\n警告: 没有找到任何匹配的文件")
+        return
     
     # 导出到Excel
     if results:
-        export_to_excel(results, args.output, args.dir1, args.dir2, 
-                       include_images=not args.no_images)
+        if args.similar:
+            # 感知哈希不能唯一标识文件内容，近似图片模式不使用按内容哈希索引的缩略图缓存
+            hash_label = args.similar.upper()
+            thumbnail_cache = None
+        else:
+            hash_label = STRONG_HASH_ALGORITHM.upper() if args.verify else args.algorithm.upper()
+            thumbnail_cache = None if args.no_thumbnail_cache else args.thumbnail_cache
+        total_rows = sum(max(len(files1), len(files2)) for _, files1, files2 in results)
+        thumbnail_cache_bytes = args.thumbnail_cache_size * 1024 * 1024
+        if report_format == 'xlsx' and total_rows + 1 > args.max_rows:
+            export_to_excel_sharded(results, args.output, args.dir1, args.dir2,
+                                    include_images=not args.no_images, hash_label=hash_label,
+                                    max_rows=args.max_rows, jobs=args.jobs,
+                                    thumbnail_quality=args.thumbnail_quality, thumbnail_cache=thumbnail_cache,
+                                    thumbnail_cache_bytes=thumbnail_cache_bytes, file_sizes=file_sizes)
+        else:
+            export_to_excel(results, args.output, args.dir1, args.dir2, 
+                           include_images=not args.no_images, hash_label=hash_label,
+                           report_format=report_format, jobs=args.jobs,
+                           thumbnail_quality=args.thumbnail_quality, thumbnail_cache=thumbnail_cache,
+                           thumbnail_cache_bytes=thumbnail_cache_bytes, file_sizes=file_sizes)
         print("\n" + "="*60)
         print("处理完成！")
         print("="*60)
@@ -1,11 +1,17 @@
 import os
 import hashlib
 import sys
+import argparse
 from pathlib import Path
 from collections import defaultdict
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment
 
+# 公共模块（多个工具共用的哈希引擎等）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+from file_walker import walk_files
+from hash_engine import default_jobs, parallel_map
+
 
 def calculate_md5(file_path):
     """计算文件的MD5值"""
@@ -21,7 +27,7 @@ def calculate_md5(file_path):
         return None
 
 
-def find_duplicate_files(directory):
+def find_duplicate_files(directory, jobs=1):
     """查找目录下所有重复的文件"""
     if not os.path.exists(directory):
         print(f"错误：目录 '{directory}' 不存在")
@@ -37,18 +43,18 @@ def find_duplicate_files(directory):
     print(f"正在扫描目录: {directory}")
     file_count = 0
     
-    # 遍历目录下的所有文件
-    for root, dirs, files in os.walk(directory):
-        for filename in files:
-            file_path = os.path.join(root, filename)
-            file_count += 1
-            
-            if file_count % 100 == 0:
-                print(f"已扫描 {file_count} 个文件...")
-            
-            md5_value = calculate_md5(file_path)
-            if md5_value:
-                md5_dict[md5_value].append(file_path)
+    # 遍历目录下的所有文件（基于 os.scandir）
+    file_paths = (file_entry.path for file_entry in walk_files(directory))
+    
+    # 多线程计算MD5，结果按遍历顺序返回
+    for file_path, md5_value in parallel_map(lambda path: (path, calculate_md5(path)), file_paths, jobs):
+        file_count += 1
+        
+        if file_count % 100 == 0:
+            print(f"已扫描 {file_count} 个文件...")
+        
+        if md5_value:
+            md5_dict[md5_value].append(file_path)
     
     print(f"扫描完成，共扫描 {file_count} 个文件")
     
@@ -152,23 +158,33 @@ def export_to_excel(duplicate_files, output_file):
 
 def main():
     """主函数"""
-    if len(sys.argv) < 2:
-        print("使用方法: python find_duplicate_files.py <目录路径> [输出路径]")
-        print("示例1: python find_duplicate_files.py C:\\MyFolder")
-        print("示例2: python find_duplicate_files.py C:\\MyFolder D:\\output")
-        sys.exit(1)
-    
-    directory = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        description='重复文件检测脚本',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  python find_duplicate_files.py C:\\MyFolder
+  python find_duplicate_files.py C:\\MyFolder D:\\output
+  python find_duplicate_files.py C:\\MyFolder D:\\output --jobs 8
+        """
+    )
+    parser.add_argument('directory', type=str, help='要检查的目录路径')
+    parser.add_argument('output_path', type=str, nargs='?', default=None,
+                        help='输出路径（可选，默认为指定目录的同级目录）')
+    parser.add_argument('--jobs', '-j', type=int, default=default_jobs(),
+                        help=f'并行计算MD5的线程数（默认: {default_jobs()}）')
+    
+    args = parser.parse_args()
+    directory = args.directory
     
     # 获取目录名称（用于生成文件名）
     dir_name = os.path.basename(os.path.abspath(directory))
     excel_filename = f"same_file_in_{dir_name}.xlsx"
     
     # 确定输出路径
-    if len(sys.argv) >= 3:
+    if args.output_path:
         # 如果提供了输出路径参数，在该路径下创建文件
-        output_path = sys.argv[2]
-        output_file = os.path.join(output_path, excel_filename)
+        output_file = os.path.join(args.output_path, excel_filename)
         print(f"输出文件将保存到指定路径: {output_file}")
     else:
         # 如果没有提供输出路径，在指定目录的同级目录下创建文件
@@ -177,7 +193,7 @@ def main():
         print(f"输出文件将保存到同级目录: {output_file}")
     
     # 查找重复文件
-    duplicate_files = find_duplicate_files(directory)
+    duplicate_files = find_duplicate_files(directory, jobs=args.jobs)
     
     # 导出到Excel
     export_to_excel(duplicate_files, output_file)
@@ -2,29 +2,76 @@
 # -*- coding: utf-8 -*-
 """
 重复文件检测脚本 - 带图片预览功能
-依赖库：pip install openpyxl pillow
+依赖库：pip install openpyxl pillow（--similar 近似图片检测还需要 numpy）
 """
 
 import os
-import hashlib
+import io
 import sys
+import argparse
+import asyncio
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import groupby, tee
+from operator import itemgetter
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.drawing.image import Image as ExcelImage
-from PIL import Image as PILImage
 
+# 公共模块（多个工具共用的哈希引擎等）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+from async_pipeline import (DEFAULT_MEMORY_BUDGET, END_OF_QUEUE, bounded_queue_size, consume_in_thread,
+                            produce_from_thread, run_stages)
+from excel_shards import EXCEL_MAX_ROWS, plan_shards, run_shards, shard_path, write_shard_summary
+from external_sort import DEFAULT_RUN_SIZE, ExternalSorter, records_with_shared_key
+from file_walker import FileEntry, walk_files
+from hash_cache import DEFAULT_CACHE_NAME, HashCache, cached_hash
+from hash_engine import (DEFAULT_BUFFER_SIZE, STRONG_HASH_ALGORITHM, available_algorithms, default_jobs,
+                         hash_file, new_hasher, parallel_map, split_by_hash)
+from link_dedup import LINK_METHODS, link_duplicates, rollback_journal
+from perceptual_hash import (DEFAULT_MAX_DISTANCE, available_perceptual_algorithms, format_hash, group_similar,
+                             perceptual_hash_files)
+from record_store import DigestIndex, FileRecords
+from report_writers import available_formats, detect_format, open_report_writer
+from scan_snapshot import ScanSnapshot
+from thumbnail_cache import DEFAULT_THUMBNAIL_CACHE, DEFAULT_THUMBNAIL_CACHE_BYTES
+from thumbnail_utils import DEFAULT_THUMBNAIL_QUALITY, THUMBNAIL_QUALITIES, iter_cached_thumbnails
 
-def calculate_md5(file_path):
-    """计算文件的MD5值"""
-    md5_hash = hashlib.md5()
+
+# 头尾采样的字节数（文件头、文件尾各读取这么多字节）
+PARTIAL_HASH_SIZE = 4096
+
+# 重复文件总数超过该值时自动使用流式导出（内存占用不随行数增长）
+STREAMING_ROW_THRESHOLD = 100000
+
+
+def calculate_hash(file_path, algorithm='md5', buffer_size=DEFAULT_BUFFER_SIZE):
+    """计算文件的哈希值（默认MD5，复用大缓冲区分块读取，大文件使用mmap）"""
+    try:
+        return hash_file(file_path, algorithm, buffer_size)
+    except Exception as e:
+        print(f"无法读取文件 {file_path}: {e}")
+        return None
+
+
+def calculate_partial_hash(file_path, file_size, algorithm='md5', sample_size=PARTIAL_HASH_SIZE):
+    """计算文件头尾采样的哈希值（文件不超过两倍采样大小时读取整个文件，结果等于完整哈希值）"""
+    hasher = new_hasher(algorithm)
     try:
         with open(file_path, 'rb') as f:
-            # 分块读取文件，避免大文件占用过多内存
-            for chunk in iter(lambda: f.read(4096), b''):
-                md5_hash.update(chunk)
-        return md5_hash.hexdigest()
+            if file_size <= sample_size * 2:
+                hasher.update(f.read())
+            else:
+                hasher.update(f.read(sample_size))
+                f.seek(-sample_size, os.SEEK_END)
+                hasher.update(f.read(sample_size))
+        return hasher.hexdigest()
     except Exception as e:
         print(f"无法读取文件 {file_path}: {e}")
         return None
@@ -36,32 +83,37 @@ def is_image_file(file_path):
     return Path(file_path).suffix.lower() in image_extensions
 
 
-def create_thumbnail(image_path, max_size=(150, 150)):
-    """创建缩略图"""
+def first_image_of(paths):
+    """返回一组文件中第一个图片文件的路径（用于预览图），没有图片时返回None"""
+    return next((path for path in paths if is_image_file(path)), None)
+
+
+def file_size_of(path, file_sizes=None):
+    """返回文件大小：优先使用遍历目录时记录的大小，没有记录时才重新读取，失败时返回None"""
+    if file_sizes and path in file_sizes:
+        return file_sizes[path]
     try:
-        with PILImage.open(image_path) as img:
-            # 转换为RGB模式（处理RGBA等格式）
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = PILImage.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # 创建缩略图
-            img.thumbnail(max_size, PILImage.Resampling.LANCZOS)
-            
-            # 保存临时文件
-            temp_path = f"temp_thumb_{os.path.basename(image_path)}.png"
-            img.save(temp_path, 'PNG')
-            return temp_path
-    except Exception as e:
-        print(f"无法创建缩略图 {image_path}: {e}")
+        return os.path.getsize(path)
+    except OSError:
         return None
 
 
-def find_duplicate_files(directory):
-    """查找目录下所有重复的文件"""
+def preview_items(groups, hash_label):
+    """逐组产生 (内容哈希键, 预览图片路径)，内容哈希键用于查询缩略图缓存"""
+    for digest, paths in groups:
+        yield f"{hash_label.lower()}:{digest}", first_image_of(paths)
+
+
+def find_duplicate_files(directory, jobs=1, cache=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                         algorithm='md5', verify=False, snapshot=None, file_sizes=None, walk_jobs=1):
+    """
+    查找目录下所有重复的文件（依次按文件大小、头尾采样哈希、完整哈希逐级筛选）
+    
+    cache为哈希缓存；verify为True时，对哈希值相同的文件组再用强哈希（SHA256）复核，
+    返回的字典以强哈希值为键；snapshot为扫描快照，指定时只重新扫描有变化的目录；
+    file_sizes为字典时，写入每个重复文件遍历时读取到的大小，导出时不必再读取；
+    walk_jobs为并发列出目录的线程数（遍历顺序不变）
+    """
     if not os.path.exists(directory):
         print(f"错误：目录 '{directory}' 不存在")
         sys.exit(1)
@@ -70,35 +122,530 @@ def find_duplicate_files(directory):
         print(f"错误：'{directory}' 不是一个有效的目录")
         sys.exit(1)
     
-    # 使用字典存储MD5值和对应的文件路径列表
-    md5_dict = defaultdict(list)
-    
+    label = algorithm.upper()
     print(f"正在扫描目录: {directory}")
     file_count = 0
     
-    # 遍历目录下的所有文件
-    for root, dirs, files in os.walk(directory):
-        for filename in files:
-            file_path = os.path.join(root, filename)
-            file_count += 1
-            
-            if file_count % 100 == 0:
-                print(f"已扫描 {file_count} 个文件...")
-            
-            md5_value = calculate_md5(file_path)
-            if md5_value:
-                md5_dict[md5_value].append(file_path)
+    # 第一阶段：遍历目录，记录每个文件的大小（文件编号即遍历顺序，保证输出顺序稳定）
+    records = FileRecords()
+    size_counter = Counter()
+    for file_entry in walk_files(directory, snapshot, walk_jobs):
+        file_count += 1
+        
+        if file_count % 100 == 0:
+            print(f"已扫描 {file_count} 个文件...")
+        
+        records.add(file_entry)
+        size_counter[file_entry.st_size] += 1
     
     print(f"扫描完成，共扫描 {file_count} 个文件")
+    if snapshot:
+        print(snapshot.summary())
+    
+    # 删除已不存在的文件的缓存记录
+    if cache:
+        pruned = cache.prune(directory, records.paths())
+        if pruned:
+            print(f"已清理 {pruned} 个已删除文件的缓存记录")
     
-    # 筛选出重复的文件（MD5值相同的文件数量大于1）
-    duplicate_files = {md5: paths for md5, paths in md5_dict.items() if len(paths) > 1}
+    # 第二阶段：大小唯一的文件不可能重复，只对大小相同的候选文件计算头尾采样哈希
+    candidates = array('L', (file_id for file_id in range(len(records))
+                             if size_counter[records.size(file_id)] > 1))
+    print(f"其中 {len(candidates)} 个文件存在大小相同的文件，需要计算采样{label}")
+    
+    partial_kind = f'{algorithm}-head-tail-{PARTIAL_HASH_SIZE}'
+    
+    def sample_hash_of(file_id):
+        file_entry = records.entry(file_id)
+        return cached_hash(cache, file_entry.path, file_entry, partial_kind,
+                           lambda: calculate_partial_hash(file_entry.path, file_entry.st_size, algorithm))
+    
+    # 采样哈希以二进制保存
+    sampled_files = []
+    sample_counter = Counter()
+    sample_results = parallel_map(sample_hash_of, candidates, jobs)
+    for index, (file_id, sample_hash) in enumerate(zip(candidates, sample_results), 1):
+        if index % 100 == 0:
+            print(f"已计算 {index}/{len(candidates)} 个文件的采样{label}...")
+        
+        if sample_hash:
+            sample_key = (records.size(file_id), bytes.fromhex(sample_hash))
+            sampled_files.append((file_id, sample_key))
+            sample_counter[sample_key] += 1
+    
+    # 第三阶段：只对大小和采样哈希都相同的文件计算完整哈希
+    full_candidates = [(file_id, sample_key) for file_id, sample_key in sampled_files
+                       if sample_counter[sample_key] > 1]
+    del sampled_files, sample_counter
+    print(f"其中 {len(full_candidates)} 个文件采样{label}相同，需要计算完整{label}")
+    
+    def full_hash_of(item):
+        file_id, (file_size, sample_digest) = item
+        # 小文件的采样已覆盖整个文件，采样哈希即为完整哈希，无需再次读取
+        if file_size <= PARTIAL_HASH_SIZE * 2:
+            return sample_digest.hex()
+        file_entry = records.entry(file_id)
+        return cached_hash(cache, file_entry.path, file_entry, algorithm,
+                           lambda: calculate_hash(file_entry.path, algorithm, buffer_size))
+    
+    # 哈希值 -> 文件编号的紧凑索引
+    hash_index = DigestIndex(records)
+    hash_results = parallel_map(full_hash_of, full_candidates, jobs)
+    for index, ((file_id, _), hash_value) in enumerate(zip(full_candidates, hash_results), 1):
+        if index % 100 == 0:
+            print(f"已计算 {index}/{len(full_candidates)} 个文件的{label}...")
+        
+        if hash_value:
+            hash_index.add(hash_value, file_id)
+    
+    # 筛选出重复的文件（哈希值相同的文件数量大于1）
+    duplicate_ids = dict(hash_index.groups(min_count=2))
+    duplicate_files = {digest: [records.path(file_id) for file_id in file_ids]
+                       for digest, file_ids in duplicate_ids.items()}
+    
+    # 强哈希复核：只需要重新计算已经分在同一组的文件
+    if verify and algorithm != STRONG_HASH_ALGORITHM:
+        verify_count = sum(len(paths) for paths in duplicate_files.values())
+        print(f"正在使用 {STRONG_HASH_ALGORITHM.upper()} 复核 {verify_count} 个重复文件...")
+        
+        # 复用遍历时读取的文件信息，不再重新stat
+        stat_of = {records.path(file_id): records.entry(file_id)
+                   for file_ids in duplicate_ids.values() for file_id in file_ids}
+        
+        def strong_hash_of(file_path):
+            file_stat = stat_of[file_path]
+            return cached_hash(cache, file_path, file_stat, STRONG_HASH_ALGORITHM,
+                               lambda: calculate_hash(file_path, STRONG_HASH_ALGORITHM, buffer_size))
+        
+        duplicate_files = split_by_hash(duplicate_files, strong_hash_of, jobs)
+    
+    if file_sizes is not None:
+        file_sizes.update((records.path(file_id), records.size(file_id))
+                          for file_ids in duplicate_ids.values() for file_id in file_ids)
+    
+    if cache:
+        print(f"哈希缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
     
     return duplicate_files
 
 
-def export_to_excel(duplicate_files, output_file):
-    """将重复文件信息导出到Excel"""
+class _SizeGroup:
+    """流水线模式中大小相同的一组文件（至少两个）及其哈希计算进度"""
+    
+    __slots__ = ('files', 'pending', 'samples', 'digests', 'done')
+    
+    def __init__(self):
+        self.files = array('L')   # 文件编号（即遍历顺序）
+        self.pending = 0          # 已提交但还没有算完的文件数
+        self.samples = {}         # 二进制采样哈希 -> [文件编号, ...]
+        self.digests = {}         # 完整哈希 -> [文件编号, ...]
+        self.done = asyncio.Event()
+
+
+def find_duplicate_files_pipelined(directory, export, jobs=1, cache=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                                   algorithm='md5', verify=False, snapshot=None, file_sizes=None, walk_jobs=1,
+                                   memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    以asyncio流水线查找重复文件：遍历、按大小分组、采样哈希、完整哈希、写入报告各阶段同时进行
+    
+    export 为写入报告的函数，参数是逐组产生 (哈希值, 文件路径列表) 的迭代器，在单独的线程中运行；
+    目录遍历完成后，每组大小相同的文件一算完哈希就交给 export 写入，不必等待其他文件；
+    阶段之间为有界队列，队列长度由 memory_budget（字节）换算。
+    组的顺序按文件大小在遍历中第一次出现重复的先后排列（多次运行结果一致，但与非流水线模式不同）；
+    其余参数与 find_duplicate_files 相同
+    """
+    if not os.path.isdir(directory):
+        print(f"错误：'{directory}' 不是一个有效的目录")
+        sys.exit(1)
+    
+    print(f"正在扫描目录（流水线模式）: {directory}")
+    return asyncio.run(_duplicate_pipeline(directory, export, max(jobs, 1), cache, buffer_size, algorithm,
+                                           verify, snapshot, file_sizes, walk_jobs, memory_budget))
+
+
+async def _duplicate_pipeline(directory, export, jobs, cache, buffer_size, algorithm, verify, snapshot,
+                              file_sizes, walk_jobs, memory_budget):
+    """find_duplicate_files_pipelined 的实现"""
+    loop = asyncio.get_running_loop()
+    label = algorithm.upper()
+    partial_kind = f'{algorithm}-head-tail-{PARTIAL_HASH_SIZE}'
+    strong = verify and algorithm != STRONG_HASH_ALGORITHM
+    
+    # 四个队列：遍历 -> 分组 -> 采样哈希 -> 完整哈希，以及写入报告；每个哈希线程占用一个读取缓冲区
+    queue_size = bounded_queue_size(memory_budget, 4, reserved_bytes=jobs * buffer_size)
+    entry_queue = asyncio.Queue(queue_size)
+    sample_queue = asyncio.Queue(queue_size)
+    full_queue = asyncio.Queue(queue_size)
+    report_queue = asyncio.Queue(queue_size)
+    
+    records = FileRecords()
+    single_files = {}   # 文件大小 -> 目前唯一一个该大小的文件的编号
+    size_groups = {}    # 文件大小 -> _SizeGroup（按出现重复的先后顺序）
+    counts = Counter()
+    walk_finished = False
+    
+    def finish_one(group):
+        group.pending -= 1
+        if walk_finished and group.pending == 0:
+            group.done.set()
+    
+    async def group_by_size():
+        """分组阶段：同样大小的文件出现第二个时，开始计算这一组的采样哈希"""
+        nonlocal walk_finished
+        while (file_entry := await entry_queue.get()) is not END_OF_QUEUE:
+            file_id = records.add(file_entry)
+            counts['scanned'] += 1
+            if counts['scanned'] % 1000 == 0:
+                print(f"已扫描 {counts['scanned']} 个文件，已计算采样{label} {counts['sampled']} 个、"
+                      f"完整{label} {counts['hashed']} 个...")
+            
+            size = file_entry.st_size
+            group = size_groups.get(size)
+            if group is None:
+                first = single_files.pop(size, None)
+                if first is None:
+                    single_files[size] = file_id
+                    continue
+                group = size_groups[size] = _SizeGroup()
+                group.files.append(first)
+                group.pending += 1
+                await sample_queue.put((group, first))
+            group.files.append(file_id)
+            group.pending += 1
+            await sample_queue.put((group, file_id))
+        
+        # 遍历完成：大小分组不会再变化，已经算完的组可以写入报告
+        walk_finished = True
+        for group in size_groups.values():
+            if group.pending == 0:
+                group.done.set()
+        print(f"扫描完成，共扫描 {counts['scanned']} 个文件，其中 "
+              f"{sum(len(group.files) for group in size_groups.values())} 个文件存在大小相同的文件")
+        if snapshot:
+            print(snapshot.summary())
+        single_files.clear()
+        if cache:
+            pruned = await loop.run_in_executor(None, cache.prune, directory, records.paths())
+            if pruned:
+                print(f"已清理 {pruned} 个已删除文件的缓存记录")
+    
+    async def sample_worker():
+        """采样哈希阶段：大小和采样哈希都相同的文件出现第二个时，开始计算完整哈希"""
+        while (task := await sample_queue.get()) is not END_OF_QUEUE:
+            group, file_id = task
+            file_entry = records.entry(file_id)
+            sample_hash = await loop.run_in_executor(executor, cached_hash, cache, file_entry.path, file_entry,
+                                                     partial_kind, partial(calculate_partial_hash, file_entry.path,
+                                                                           file_entry.st_size, algorithm))
+            counts['sampled'] += 1
+            if not sample_hash:
+                finish_one(group)
+                continue
+            same_sample = group.samples.setdefault(bytes.fromhex(sample_hash), [])
+            same_sample.append(file_id)
+            if len(same_sample) == 1:
+                # 暂时没有相同采样的文件，之后出现时再计算完整哈希
+                finish_one(group)
+            elif len(same_sample) == 2:
+                group.pending += 1
+                await full_queue.put((group, same_sample[0], sample_hash))
+                await full_queue.put((group, file_id, sample_hash))
+            else:
+                await full_queue.put((group, file_id, sample_hash))
+    
+    async def full_worker():
+        """完整哈希阶段（小文件的采样已覆盖整个文件，采样哈希即为完整哈希）"""
+        while (task := await full_queue.get()) is not END_OF_QUEUE:
+            group, file_id, sample_hash = task
+            file_entry = records.entry(file_id)
+            if file_entry.st_size <= PARTIAL_HASH_SIZE * 2:
+                digest = sample_hash
+            else:
+                digest = await loop.run_in_executor(executor, cached_hash, cache, file_entry.path, file_entry,
+                                                    algorithm, partial(calculate_hash, file_entry.path, algorithm,
+                                                                       buffer_size))
+            counts['hashed'] += 1
+            if digest:
+                group.digests.setdefault(digest, []).append(file_id)
+            finish_one(group)
+    
+    async def strong_digests(file_ids):
+        """对一组文件计算强哈希"""
+        file_entries = [records.entry(file_id) for file_id in file_ids]
+        return await asyncio.gather(*(
+            loop.run_in_executor(executor, cached_hash, cache, file_entry.path, file_entry, STRONG_HASH_ALGORITHM,
+                                 partial(calculate_hash, file_entry.path, STRONG_HASH_ALGORITHM, buffer_size))
+            for file_entry in file_entries))
+    
+    async def emit_groups():
+        """写入阶段：遍历完成后，按顺序等待每组大小相同的文件算完，把其中的重复文件交给报告线程"""
+        await walk_done.wait()
+        for size_group in list(size_groups.values()):
+            await size_group.done.wait()
+            # 组内文件按遍历顺序排列，组按第一个文件的遍历顺序排列
+            groups = sorted(((digest, sorted(file_ids)) for digest, file_ids in size_group.digests.items()
+                             if len(file_ids) > 1), key=lambda group: group[1][0])
+            if strong:
+                # 强哈希复核：只需要重新计算已经分在同一组的文件
+                regrouped = {}
+                for _, file_ids in groups:
+                    for file_id, digest in zip(file_ids, await strong_digests(file_ids)):
+                        if digest:
+                            regrouped.setdefault(digest, []).append(file_id)
+                groups = [(digest, file_ids) for digest, file_ids in regrouped.items() if len(file_ids) > 1]
+            for digest, file_ids in groups:
+                paths = [records.path(file_id) for file_id in file_ids]
+                if file_sizes is not None:
+                    file_sizes.update(zip(paths, (records.size(file_id) for file_id in file_ids)))
+                counts['groups'] += 1
+                await report_queue.put((digest, paths))
+            size_group.samples = size_group.digests = None
+        await report_queue.put(END_OF_QUEUE)
+    
+    walk_done = asyncio.Event()
+    # 任何阶段出错时通知遍历、写入报告的线程退出，错误原样抛出（不会卡在已满的队列上）
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        async def walk_and_group():
+            await run_stages(produce_from_thread(walk_files(directory, snapshot, walk_jobs), entry_queue, stop),
+                             group_by_size(), stop=stop)
+            walk_done.set()
+            for _ in range(jobs):
+                await sample_queue.put(END_OF_QUEUE)
+        
+        async def sample_stage():
+            await run_stages(*(sample_worker() for _ in range(jobs)), stop=stop)
+            for _ in range(jobs):
+                await full_queue.put(END_OF_QUEUE)
+        
+        await run_stages(walk_and_group(), sample_stage(), *(full_worker() for _ in range(jobs)),
+                         emit_groups(), consume_in_thread(export, report_queue, stop), stop=stop)
+    
+    if cache:
+        print(f"哈希缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
+    return counts['groups']
+
+
+class _GroupPaths:
+    """外部排序模式中一组重复文件的路径：文件数预先已知，路径从归并结果中按顺序逐个读出（只能遍历一次）"""
+    
+    def __init__(self, count, records, file_sizes=None, max_sizes=DEFAULT_RUN_SIZE):
+        self.count = count
+        self.remaining = count
+        self.records = records        # 归并结果迭代器，接下来的 count 条记录属于该组
+        self.file_sizes = file_sizes  # 读出路径时记录文件大小（最多约 max_sizes 个）
+        self.max_sizes = max_sizes
+    
+    def __len__(self):
+        return self.count
+    
+    def __iter__(self):
+        while self.remaining:
+            self.remaining -= 1
+            _, _, _, file_path, file_size = next(self.records)
+            if self.file_sizes is not None:
+                if len(self.file_sizes) > self.max_sizes:
+                    self.file_sizes.clear()
+                self.file_sizes[file_path] = file_size
+            yield file_path
+    
+    def skip_rest(self):
+        """跳过还没有读出的路径"""
+        for _ in range(self.remaining):
+            next(self.records)
+        self.remaining = 0
+
+
+def find_duplicate_files_external(directory, export, jobs=1, cache=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                                  algorithm='md5', verify=False, snapshot=None, walk_jobs=1,
+                                  file_sizes=None, run_size=DEFAULT_RUN_SIZE, temp_dir=None):
+    """
+    用外部排序查找重复文件，内存占用与文件总数无关（适合几亿个文件、内存放不下的目录树）
+    
+    每一阶段把 (大小/采样哈希/完整哈希, 遍历序号, 路径, ...) 记录写入临时的有序段，
+    再多路归并，按顺序找出键相同的文件交给下一阶段；最后按每组第一个文件的遍历顺序归并重复组，
+    直接交给 export（参数是逐组产生 (哈希值, 文件路径序列) 的迭代器）写入报告，
+    结果与 find_duplicate_files 完全相同。每组的路径序列支持 len()，从归并结果中逐个读出，只能按顺序遍历一次，
+    同一组的文件再多也不会整组读入内存。
+    run_size 为内存中最多累积的记录数，temp_dir 为临时文件目录；
+    file_sizes 只保留最近写出的约 run_size 个文件的大小（导出时查不到的文件会重新读取）；
+    为保证内存有界，不清理哈希缓存中已删除文件的记录；其余参数与 find_duplicate_files 相同
+    """
+    if not os.path.isdir(directory):
+        print(f"错误：'{directory}' 不是一个有效的目录")
+        sys.exit(1)
+    
+    label = algorithm.upper()
+    partial_kind = f'{algorithm}-head-tail-{PARTIAL_HASH_SIZE}'
+    print(f"正在扫描目录（外部排序模式）: {directory}")
+    
+    def sample_hash_of(record):
+        file_size, _, file_path, mtime_ns, inode = record
+        return cached_hash(cache, file_path, FileEntry(file_path, file_size, mtime_ns, inode), partial_kind,
+                           lambda: calculate_partial_hash(file_path, file_size, algorithm))
+    
+    def full_hash_of(record):
+        file_size, sample_digest, _, file_path, mtime_ns, inode = record
+        # 小文件的采样已覆盖整个文件，采样哈希即为完整哈希，无需再次读取
+        if file_size <= PARTIAL_HASH_SIZE * 2:
+            return sample_digest.hex()
+        return cached_hash(cache, file_path, FileEntry(file_path, file_size, mtime_ns, inode), algorithm,
+                           lambda: calculate_hash(file_path, algorithm, buffer_size))
+    
+    def strong_hash_of(record):
+        _, _, file_size, file_path, mtime_ns, inode = record
+        return cached_hash(cache, file_path, FileEntry(file_path, file_size, mtime_ns, inode),
+                           STRONG_HASH_ALGORITHM, lambda: calculate_hash(file_path, STRONG_HASH_ALGORITHM, buffer_size))
+    
+    with ExternalSorter(run_size, temp_dir) as by_size, ExternalSorter(run_size, temp_dir) as by_sample, \
+            ExternalSorter(run_size, temp_dir) as by_digest, ExternalSorter(run_size, temp_dir) as by_strong, \
+            ExternalSorter(run_size, temp_dir) as by_group:
+        # 第一阶段：遍历目录，按 (大小, 遍历序号) 排序
+        for seq, file_entry in enumerate(walk_files(directory, snapshot, walk_jobs)):
+            if (seq + 1) % 100000 == 0:
+                print(f"已扫描 {seq + 1} 个文件...")
+            by_size.add((file_entry.st_size, seq, file_entry.path, file_entry.st_mtime_ns, file_entry.st_ino))
+        print(f"扫描完成，共扫描 {by_size.count} 个文件（{by_size.run_count} 个临时有序段）")
+        if snapshot:
+            print(snapshot.summary())
+        
+        # 第二阶段：大小相同的文件计算头尾采样哈希，按 (大小, 采样哈希, 遍历序号) 排序
+        candidates = records_with_shared_key(by_size.sorted(), itemgetter(0))
+        candidates, sample_inputs = tee(candidates)
+        for record, sample_hash in zip(candidates, parallel_map(sample_hash_of, sample_inputs, jobs)):
+            if sample_hash:
+                by_sample.add((record[0], bytes.fromhex(sample_hash)) + record[1:])
+        print(f"其中 {by_sample.count} 个文件存在大小相同的文件，已计算采样{label}")
+        
+        # 第三阶段：大小和采样哈希都相同的文件计算完整哈希，按 (完整哈希, 遍历序号) 排序
+        candidates = records_with_shared_key(by_sample.sorted(), itemgetter(0, 1))
+        candidates, full_inputs = tee(candidates)
+        for record, hash_value in zip(candidates, parallel_map(full_hash_of, full_inputs, jobs)):
+            if hash_value:
+                by_digest.add((bytes.fromhex(hash_value), record[2], record[0]) + record[3:])
+        print(f"其中 {by_digest.count} 个文件采样{label}相同，已计算完整{label}")
+        
+        # 第四阶段：完整哈希相同的文件为一组（可选强哈希复核时按 (完整哈希, 强哈希, 遍历序号) 再排序一次）
+        # 每个文件一条记录 (组内第一个文件的遍历序号, 哈希值, 遍历序号, 路径, 大小)，按组逐个文件写出，
+        # 组内全部写出后再写一条 (组内第一个文件的遍历序号, 哈希值, -1, '', 文件数) 排在该组最前，
+        # 再大的组也不需要整组读入内存
+        candidates = records_with_shared_key(by_digest.sorted(), itemgetter(0))
+        if verify and algorithm != STRONG_HASH_ALGORITHM:
+            candidates, strong_inputs = tee(candidates)
+            for record, strong_value in zip(candidates, parallel_map(strong_hash_of, strong_inputs, jobs)):
+                if strong_value:
+                    by_strong.add((record[0], bytes.fromhex(strong_value), record[1], record[3], record[2]))
+            members = ((strong_digest.hex(), seq, file_path, file_size) for _, strong_digest, seq, file_path, file_size
+                       in records_with_shared_key(by_strong.sorted(), itemgetter(0, 1)))
+        else:
+            members = ((digest.hex(), seq, file_path, file_size) for digest, seq, file_size, file_path, _, _
+                       in candidates)
+        group_count = 0
+        for digest, group in groupby(members, itemgetter(0)):
+            first_seq = None
+            count = 0
+            for _, seq, file_path, file_size in group:
+                if first_seq is None:
+                    first_seq = seq
+                by_group.add((first_seq, digest, seq, file_path, file_size))
+                count += 1
+            by_group.add((first_seq, digest, -1, '', count))
+            group_count += 1
+        print(f"共 {group_count} 组重复文件，正在写入报告...")
+        
+        if cache:
+            print(f"哈希缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
+        
+        def duplicate_groups():
+            records = by_group.sorted()
+            for _, digest, _, _, count in iter(partial(next, records, None), None):
+                group_paths = _GroupPaths(count, records, file_sizes, run_size)
+                yield digest, group_paths
+                # 该组的路径没有读完时跳过剩余的记录
+                group_paths.skip_rest()
+        
+        export(duplicate_groups())
+    return group_count
+
+
+def find_similar_images(directory, algorithm='phash', max_distance=DEFAULT_MAX_DISTANCE, jobs=1, cache=None,
+                        snapshot=None, file_sizes=None, walk_jobs=1):
+    """
+    按感知哈希查找目录下的近似重复图片（重新编码、压缩或缩放过的同一张图片）
+    
+    汉明距离不超过 max_distance 的图片分为一组（用BK树查找，不需要两两比较）；
+    返回的字典以每组第一张图片的感知哈希为键；file_sizes、walk_jobs 与 find_duplicate_files 相同
+    """
+    if not os.path.isdir(directory):
+        print(f"错误：'{directory}' 不是一个有效的目录")
+        sys.exit(1)
+    
+    print(f"正在扫描目录中的图片: {directory}")
+    image_files = [(file_entry.path, file_entry) for file_entry in walk_files(directory, snapshot, walk_jobs)
+                   if is_image_file(file_entry.path)]
+    if snapshot:
+        print(snapshot.summary())
+    
+    print(f"扫描完成，共 {len(image_files)} 张图片，正在计算 {algorithm} 感知哈希...")
+    hashes = perceptual_hash_files(image_files, algorithm, jobs, cache)
+    hash_of = dict(hashes)
+    similar_groups = {format_hash(hash_of[paths[0]]): paths for paths in group_similar(hashes, max_distance)}
+    
+    if file_sizes is not None:
+        similar_paths = {path for paths in similar_groups.values() for path in paths}
+        file_sizes.update((path, st.st_size) for path, st in image_files if path in similar_paths)
+    
+    if cache:
+        print(f"哈希缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
+    
+    return similar_groups
+
+
+def export_to_records(duplicate_groups, output_file, report_format, file_sizes=None):
+    """
+    将重复文件信息以CSV / JSON Lines / Parquet格式流式导出，每个文件一行
+    
+    列: group(组号), hash(哈希值), path(文件路径), size(文件大小，无法获取时为空), count(该组重复文件数量)；
+    file_sizes 为遍历时记录的文件大小
+    """
+    if isinstance(duplicate_groups, dict):
+        duplicate_groups = duplicate_groups.items()
+    
+    group_num = 0
+    total_duplicates = 0
+    with open_report_writer(output_file, ['group', 'hash', 'path', 'size', 'count'], report_format,
+                            column_types={'group': int, 'size': int, 'count': int}) as writer:
+        for digest, paths in duplicate_groups:
+            group_num += 1
+            total_duplicates += len(paths)
+            for path in paths:
+                writer.write_row({'group': group_num, 'hash': digest, 'path': path,
+                                  'size': file_size_of(path, file_sizes), 'count': len(paths)})
+    
+    if group_num == 0:
+        print("没有发现重复的文件")
+    
+    print(f"\n结果已保存到: {output_file}")
+    print(f"共发现 {group_num} 组重复文件")
+    print(f"重复文件总数: {total_duplicates} 个")
+
+
+def export_to_excel(duplicate_files, output_file, hash_label='MD5', report_format=None, jobs=1,
+                    thumbnail_quality=DEFAULT_THUMBNAIL_QUALITY, thumbnail_cache=None,
+                    thumbnail_cache_bytes=DEFAULT_THUMBNAIL_CACHE_BYTES, file_sizes=None):
+    """
+    将重复文件信息导出到Excel（hash_label为哈希值列的名称）
+    
+    输出文件扩展名为 .csv/.jsonl/.parquet 或指定了 report_format 时，改用对应的输出后端；
+    预览图由 jobs 个进程并行生成（thumbnail_quality 为缩略图质量档位），PNG数据直接在内存中交给openpyxl；
+    thumbnail_cache 为缩略图缓存数据库路径（按文件内容哈希缓存，为None时不使用）；
+    file_sizes 为遍历时记录的文件大小，有记录的文件不再重新读取
+    """
+    report_format = detect_format(output_file, report_format)
+    if report_format != 'xlsx':
+        export_to_records(duplicate_files, output_file, report_format, file_sizes)
+        return
+    
     if not duplicate_files:
         print("没有发现重复的文件")
         return
@@ -119,7 +666,7 @@ def export_to_excel(duplicate_files, output_file):
     header_font = Font(bold=True, color="FFFFFF")
     
     # 写入表头
-    headers = ["组号", "预览图", "MD5值", "文件路径", "文件大小(字节)", "重复文件数量"]
+    headers = ["组号", "预览图", f"{hash_label}值", "文件路径", "文件大小(字节)", "重复文件数量"]
     for col, header in enumerate(headers, 1):
         cell = ws.cell(row=1, column=col, value=header)
         cell.fill = header_fill
@@ -128,27 +675,25 @@ def export_to_excel(duplicate_files, output_file):
     # 写入数据
     row = 2
     group_num = 1
-    temp_files = []  # 存储临时文件路径，稍后删除
     
-    for md5, paths in duplicate_files.items():
+    # 多进程按组顺序生成预览图（没有图片的组对应None），缓存中已有的直接复用
+    thumbnails = iter_cached_thumbnails(preview_items(duplicate_files.items(), hash_label), thumbnail_cache,
+                                        jobs=jobs, quality=thumbnail_quality, cache_bytes=thumbnail_cache_bytes)
+    
+    for (digest, paths), thumb_data in zip(duplicate_files.items(), thumbnails):
         duplicate_count = len(paths)  # 计算该组重复文件的数量
         start_row = row  # 记录该组的起始行
         
         # 检查第一个文件是否为图片，用于预览图
-        first_image_path = None
-        for path in paths:
-            if is_image_file(path):
-                first_image_path = path
-                break
+        first_image_path = first_image_of(paths)
         
         for path in paths:
-            try:
-                file_size = os.path.getsize(path)
-            except:
+            file_size = file_size_of(path, file_sizes)
+            if file_size is None:
                 file_size = "无法获取"
             
-            # 只写入MD5值、文件路径、文件大小（组号和预览图稍后合并处理）
-            ws.cell(row=row, column=3, value=md5)
+            # 只写入哈希值、文件路径、文件大小（组号和预览图稍后合并处理）
+            ws.cell(row=row, column=3, value=digest)
             ws.cell(row=row, column=4, value=path)
             ws.cell(row=row, column=5, value=file_size)
             
@@ -185,8 +730,7 @@ def export_to_excel(duplicate_files, output_file):
         # 合并该组的"预览图"单元格并插入图片（如果有图片文件）
         if first_image_path:
             try:
-                thumb_path = create_thumbnail(first_image_path)
-                if thumb_path:
+                if thumb_data:
                     if start_row == end_row:
                         # 只有一行，不需要合并
                         pass  # 单元格已存在，直接插入图片即可
@@ -194,16 +738,13 @@ def export_to_excel(duplicate_files, output_file):
                         # 多行，合并单元格
                         ws.merge_cells(start_row=start_row, start_column=2, end_row=end_row, end_column=2)
                     
-                    img = ExcelImage(thumb_path)
+                    img = ExcelImage(io.BytesIO(thumb_data))
                     # 调整图片大小以适应单元格
                     img.width = 150
                     img.height = 150
                     
                     # 插入图片到预览图列（第2列）的起始行
                     ws.add_image(img, f'B{start_row}')
-                    
-                    # 将临时文件路径添加到列表，稍后删除
-                    temp_files.append(thumb_path)
             except Exception as e:
                 print(f"插入预览图失败 {first_image_path}: {e}")
         else:
@@ -237,7 +778,7 @@ def export_to_excel(duplicate_files, output_file):
     # 调整列宽（增大以便完整显示内容）
     ws.column_dimensions['A'].width = 12   # 组号
     ws.column_dimensions['B'].width = 22   # 预览图列
-    ws.column_dimensions['C'].width = 40   # MD5值需要32个字符
+    ws.column_dimensions['C'].width = 40   # MD5值需要32个字符（SHA256为64个字符，可自行加宽）
     ws.column_dimensions['D'].width = 120  # 文件路径需要更宽
     ws.column_dimensions['E'].width = 20   # 文件大小
     ws.column_dimensions['F'].width = 18   # 重复文件数量
@@ -245,13 +786,6 @@ def export_to_excel(duplicate_files, output_file):
     # 保存文件
     wb.save(output_file)
     
-    # 清理临时缩略图文件
-    for temp_file in temp_files:
-        try:
-            os.remove(temp_file)
-        except:
-            pass
-    
     print(f"\n结果已保存到: {output_file}")
     print(f"共发现 {len(duplicate_files)} 组重复文件")
     
@@ -262,36 +796,274 @@ def export_to_excel(duplicate_files, output_file):
     # 打印详细信息
     print("\n重复文件详情：")
     group_num = 1
-    for md5, paths in duplicate_files.items():
-        print(f"\n第 {group_num} 组 (MD5: {md5}):")
+    for digest, paths in duplicate_files.items():
+        print(f"\n第 {group_num} 组 ({hash_label}: {digest}):")
         for path in paths:
-            try:
-                size = os.path.getsize(path)
+            size = file_size_of(path, file_sizes)
+            if size is not None:
                 print(f"  - {path} ({size} 字节)")
-            except:
+            else:
                 print(f"  - {path}")
         group_num += 1
 
 
+def export_to_excel_streaming(duplicate_groups, output_file, hash_label='MD5', group_start=1, jobs=1,
+                              thumbnail_quality=DEFAULT_THUMBNAIL_QUALITY, thumbnail_cache=None,
+                              thumbnail_cache_bytes=DEFAULT_THUMBNAIL_CACHE_BYTES, file_sizes=None):
+    """
+    以流式（write-only）方式将重复文件信息导出到Excel，适合几十万行以上的大报告
+    
+    duplicate_groups 可以是字典，也可以是逐组产生 (哈希值, 文件路径列表) 的迭代器；
+    每组写完即落盘，不在内存中保留单元格。为保证内存占用有界，不合并单元格，
+    组号、预览图和重复文件数量只写在每组的第一行，并用交替底色区分相邻的组。
+    group_start 为第一组的组号（分片导出时使用）；预览图由 jobs 个进程并行生成，
+    thumbnail_quality 为缩略图质量档位，thumbnail_cache 为缩略图缓存数据库路径，
+    file_sizes 为遍历时记录的文件大小
+    """
+    if isinstance(duplicate_groups, dict):
+        duplicate_groups = duplicate_groups.items()
+    
+    # 预览图生成与写入并行进行：进程池按组顺序提前生成缩略图
+    # 预览和写入各自遍历一次每组的路径，只能遍历一次的路径序列（外部排序模式）先转换为列表
+    duplicate_groups, preview_groups = tee((digest, list(paths)) for digest, paths in duplicate_groups)
+    thumbnails = iter_cached_thumbnails(preview_items(preview_groups, hash_label), thumbnail_cache,
+                                        jobs=jobs, quality=thumbnail_quality, cache_bytes=thumbnail_cache_bytes)
+    
+    # 确保输出目录存在
+    output_dir = os.path.dirname(output_file)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"创建输出目录: {output_dir}")
+    
+    # 创建只写工作簿（列宽必须在写入数据之前设置）
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("重复文件")
+    ws.column_dimensions['A'].width = 12   # 组号
+    ws.column_dimensions['B'].width = 22   # 预览图列
+    ws.column_dimensions['C'].width = 40   # MD5值需要32个字符（SHA256为64个字符，可自行加宽）
+    ws.column_dimensions['D'].width = 120  # 文件路径需要更宽
+    ws.column_dimensions['E'].width = 20   # 文件大小
+    ws.column_dimensions['F'].width = 18   # 重复文件数量
+    ws.freeze_panes = 'A2'
+    
+    # 设置表头样式
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    group_fill = PatternFill(start_color="DCE6F1", end_color="DCE6F1", fill_type="solid")
+    center = Alignment(horizontal='center', vertical='center')
+    
+    # 写入表头
+    headers = ["组号", "预览图", f"{hash_label}值", "文件路径", "文件大小(字节)", "重复文件数量"]
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        header_cells.append(cell)
+    ws.append(header_cells)
+    
+    # 写入数据
+    row = 2
+    group_num = group_start - 1
+    total_duplicates = 0
+    
+    for (digest, paths), thumb_data in zip(duplicate_groups, thumbnails):
+        group_num += 1
+        total_duplicates += len(paths)
+        
+        if group_num % 1000 == 0:
+            print(f"已写入 {group_num} 组重复文件...")
+        
+        # 该组第一个图片文件的预览图（图片以该组第一行为锚点，需要加高第一行）
+        if thumb_data:
+            try:
+                img = ExcelImage(io.BytesIO(thumb_data))
+                img.width = 150
+                img.height = 150
+                ws.add_image(img, f'B{row}')
+                ws.row_dimensions[row].height = 120
+            except Exception as e:
+                print(f"插入预览图失败 {first_image_of(paths)}: {e}")
+        
+        for index, path in enumerate(paths):
+            file_size = file_size_of(path, file_sizes)
+            if file_size is None:
+                file_size = "无法获取"
+            
+            values = [group_num if index == 0 else None, None, digest, path, file_size,
+                      len(paths) if index == 0 else None]
+            cells = []
+            for col, value in enumerate(values, 1):
+                cell = WriteOnlyCell(ws, value=value)
+                if group_num % 2 == 0:
+                    cell.fill = group_fill
+                if col in (1, 6):
+                    # 组号、重复文件数量居中显示
+                    cell.alignment = center
+                cells.append(cell)
+            ws.append(cells)
+            row += 1
+    
+    if total_duplicates == 0:
+        print("没有发现重复的文件")
+        return
+    
+    # 保存文件
+    wb.save(output_file)
+    
+    print(f"\n结果已保存到: {output_file}")
+    print(f"共发现 {group_num - group_start + 1} 组重复文件")
+    print(f"重复文件总数: {total_duplicates} 个")
+    print("（流式导出模式不在控制台打印每个文件的详情，请查看Excel文件）")
+
+
+def export_to_excel_sharded(duplicate_files, output_file, hash_label='MD5', max_rows=EXCEL_MAX_ROWS, jobs=1,
+                            thumbnail_quality=DEFAULT_THUMBNAIL_QUALITY, thumbnail_cache=None,
+                            thumbnail_cache_bytes=DEFAULT_THUMBNAIL_CACHE_BYTES, file_sizes=None):
+    """
+    重复文件行数超过Excel单表上限时，按组拆分到多个工作簿（同一组不会被拆开）
+    
+    各分片文件为 原文件名_partN.xlsx，可以用多进程并行写入；
+    output_file 本身为汇总工作簿，列出每个分片包含的组号范围
+    """
+    groups = list(duplicate_files.items())
+    shards = plan_shards([len(paths) for _, paths in groups], max_rows - 1)
+    print(f"\n重复文件共 {sum(len(paths) for _, paths in groups)} 行，超过每个工作表 {max_rows} 行的上限，"
+          f"拆分为 {len(shards)} 个分片")
+    
+    shard_args = []
+    summary = []
+    for shard_index, (start, end) in enumerate(shards, 1):
+        shard_file = shard_path(output_file, shard_index)
+        row_count = sum(len(paths) for _, paths in groups[start:end])
+        if row_count >= max_rows:
+            print(f"警告：第 {start + 1} 组包含 {row_count} 个文件，单组就超过了行数上限，建议使用 --format csv")
+        shard_groups = dict(groups[start:end])
+        # 每个分片进程只需要本分片文件的大小
+        shard_sizes = ({path: file_sizes[path] for paths in shard_groups.values() for path in paths
+                        if path in file_sizes} if file_sizes else None)
+        shard_args.append((shard_groups, shard_file, hash_label, start + 1, 1, thumbnail_quality,
+                           thumbnail_cache, thumbnail_cache_bytes, shard_sizes))
+        summary.append({'file': shard_file, 'first_group': start + 1, 'last_group': end,
+                        'group_count': end - start, 'row_count': row_count})
+    
+    run_shards(export_to_excel_streaming, shard_args, jobs)
+    write_shard_summary(output_file, summary)
+    print(f"\n分片汇总已保存到: {output_file}")
+
+
 def main():
     """主函数"""
-    if len(sys.argv) < 2:
-        print("使用方法: python find_duplicate_files.py <目录路径> [输出路径]")
-        print("示例1: python find_duplicate_files.py C:\\MyFolder")
-        print("示例2: python find_duplicate_files.py C:\\MyFolder D:\\output")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description='重复文件检测脚本 - 带图片预览功能',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  python find_duplicate_files.py C:\\MyFolder
+  python find_duplicate_files.py C:\\MyFolder D:\\output
+  python find_duplicate_files.py C:\\MyFolder D:\\output --jobs 8
+  python find_duplicate_files.py C:\\MyFolder D:\\output --rebuild-cache
+  python find_duplicate_files.py C:\\MyFolder D:\\output --hash blake2b --verify
+  python find_duplicate_files.py C:\\MyFolder D:\\output --format jsonl
+  python find_duplicate_files.py C:\\MyFolder D:\\output --similar phash
+  python find_duplicate_files.py C:\\MyFolder D:\\output --pipeline --format csv
+  python find_duplicate_files.py C:\\MyFolder D:\\output --link hardlink --dry-run
+  python find_duplicate_files.py C:\\MyFolder --rollback D:\\output\\link_journal_MyFolder_20240101_120000.jsonl
+        """
+    )
+    parser.add_argument('directory', type=str, help='要检查的目录路径')
+    parser.add_argument('output_path', type=str, nargs='?', default=None,
+                        help='输出路径（可选，默认为指定目录的同级目录）')
+    parser.add_argument('--jobs', '-j', type=int, default=default_jobs(),
+                        help=f'并行数：计算哈希的线程数，以及生成预览图、写入分片的进程数（默认: {default_jobs()}）')
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f'不使用哈希缓存（默认在输出文件旁保存 {DEFAULT_CACHE_NAME}）')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help='清空哈希缓存并重新计算所有文件')
+    parser.add_argument('--buffer-size', type=int, default=DEFAULT_BUFFER_SIZE // 1024,
+                        help=f'计算哈希时的读取缓冲区大小，单位KB（默认: {DEFAULT_BUFFER_SIZE // 1024}）')
+    parser.add_argument('--hash', dest='algorithm', choices=available_algorithms(), default='md5',
+                        help='哈希算法（默认: md5；blake2b 通常更快，xxh3/xxh64 需要安装 xxhash）')
+    parser.add_argument('--verify', action='store_true',
+                        help=f'对哈希值相同的文件组再用 {STRONG_HASH_ALGORITHM} 复核（报告中显示 {STRONG_HASH_ALGORITHM} 值）')
+    parser.add_argument('--format', dest='report_format', choices=available_formats(), default='xlsx',
+                        help='输出格式（默认: xlsx；csv/jsonl 适合程序处理，parquet 需要安装 pyarrow）')
+    parser.add_argument('--max-rows', type=int, default=EXCEL_MAX_ROWS,
+                        help=f'每个Excel工作表的最大行数，超过时按组拆分为多个文件（默认: {EXCEL_MAX_ROWS}）')
+    parser.add_argument('--thumbnail-quality', choices=list(THUMBNAIL_QUALITIES), default=DEFAULT_THUMBNAIL_QUALITY,
+                        help=f'预览图质量：fast（JPEG草稿解码+双线性，最快）、balanced、best（完整解码+LANCZOS）'
+                             f'（默认: {DEFAULT_THUMBNAIL_QUALITY}）')
+    parser.add_argument('--thumbnail-cache', type=str, default=DEFAULT_THUMBNAIL_CACHE,
+                        help=f'缩略图缓存数据库路径，与对比工具共用（默认: {DEFAULT_THUMBNAIL_CACHE}）')
+    parser.add_argument('--thumbnail-cache-size', type=int, default=DEFAULT_THUMBNAIL_CACHE_BYTES // (1024 * 1024),
+                        help=f'缩略图缓存大小上限，单位MB，超出时淘汰最久未使用的缩略图'
+                             f'（默认: {DEFAULT_THUMBNAIL_CACHE_BYTES // (1024 * 1024)}）')
+    parser.add_argument('--no-thumbnail-cache', action='store_true',
+                        help='不使用缩略图缓存')
+    parser.add_argument('--similar', metavar='ALGO', choices=available_perceptual_algorithms(), default=None,
+                        help='改为按感知哈希查找近似重复的图片（重新编码、压缩或缩放过的同一张图片），'
+                             '算法可选 ahash、dhash、phash（需要安装 numpy）')
+    parser.add_argument('--similar-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help=f'近似图片的最大汉明距离（64位哈希，越小越严格，默认: {DEFAULT_MAX_DISTANCE}）')
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量扫描：保存目录快照，下次只重新扫描修改时间有变化的目录'
+                             '（原地改写文件内容不会被发现，需要时用 --rebuild-snapshot）')
+    parser.add_argument('--rebuild-snapshot', action='store_true',
+                        help='完整扫描一次并重建增量扫描快照（隐含 --incremental）')
+    parser.add_argument('--walk-jobs', type=int, default=1,
+                        help='并发列出目录的线程数，网络存储上建议8~32，结果顺序与单线程一致（默认: 1）')
+    parser.add_argument('--streaming', action='store_true',
+                        help=f'使用流式导出（重复文件超过 {STREAMING_ROW_THRESHOLD} 个时自动启用）')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='流水线模式：遍历、分组、计算哈希和写入报告同时进行，边计算边写入报告'
+                             '（xlsx使用流式导出，不按 --max-rows 拆分；组按文件大小第一次出现重复的顺序排列）')
+    parser.add_argument('--memory-budget', type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+                        help=f'流水线模式各阶段之间队列的内存预算，单位MB'
+                             f'（默认: {DEFAULT_MEMORY_BUDGET // (1024 * 1024)}）')
+    parser.add_argument('--external-sort', action='store_true',
+                        help='外部排序模式：中间结果写入临时文件后多路归并，内存占用与文件总数无关，'
+                             '适合几亿个文件的目录树；每组重复文件也逐个从归并结果中读出写入报告'
+                             '（xlsx使用流式导出，不按 --max-rows 拆分，每组路径会读入内存生成预览图）')
+    parser.add_argument('--sort-run-size', type=int, default=DEFAULT_RUN_SIZE,
+                        help=f'外部排序模式内存中最多累积的记录数（默认: {DEFAULT_RUN_SIZE}）')
+    parser.add_argument('--temp-dir', type=str, default=None,
+                        help='外部排序模式的临时文件目录（默认为系统临时目录，需要足够的磁盘空间）')
+    parser.add_argument('--link', choices=LINK_METHODS, default=None,
+                        help='导出报告后合并重复文件：每组保留第一个文件，其余文件逐字节比较确认相同后替换为'
+                             '硬链接（hardlink）或共享数据块的副本（reflink，需要 Btrfs/XFS/APFS 等文件系统；'
+                             'auto 优先reflink，不支持时用硬链接），替换前写入回滚日志')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='与 --link / --rollback 一起使用：只比较内容、统计可以回收的空间，不修改文件')
+    parser.add_argument('--journal', type=str, default=None,
+                        help='--link 的回滚日志路径（默认在报告旁生成 link_journal_目录名_时间.jsonl）')
+    parser.add_argument('--rollback', metavar='JOURNAL', type=str, default=None,
+                        help='按回滚日志把合并的文件恢复为独立的文件（恢复原来的权限和修改时间）后退出')
     
-    directory = sys.argv[1]
+    args = parser.parse_args()
+    if args.rollback:
+        print(f"正在按回滚日志恢复文件: {args.rollback}")
+        restored = rollback_journal(args.rollback, dry_run=args.dry_run)
+        print(f"{'将恢复' if args.dry_run else '已恢复'} {restored} 个文件")
+        return
+    if args.link and (args.similar or args.pipeline or args.external_sort):
+        parser.error('--link 不能与 --similar、--pipeline、--external-sort 同时使用')
+    if args.pipeline and args.similar:
+        parser.error('--pipeline 不能与 --similar 同时使用')
+    if args.external_sort and (args.similar or args.pipeline):
+        parser.error('--external-sort 不能与 --similar、--pipeline 同时使用')
+    if args.external_sort and (args.incremental or args.rebuild_snapshot):
+        parser.error('--external-sort 不能与 --incremental 同时使用（扫描快照需要把整个目录树放在内存中）')
+    directory = args.directory
     
     # 获取目录名称（用于生成文件名）
     dir_name = os.path.basename(os.path.abspath(directory))
-    excel_filename = f"same_file_in_{dir_name}.xlsx"
+    report_prefix = 'similar_images_in' if args.similar else 'same_file_in'
+    excel_filename = f"{report_prefix}_{dir_name}.{args.report_format}"
     
     # 确定输出路径
-    if len(sys.argv) >= 3:
+    if args.output_path:
         # 如果提供了输出路径参数，在该路径下创建文件
-        output_path = sys.argv[2]
-        output_file = os.path.join(output_path, excel_filename)
+        output_file = os.path.join(args.output_path, excel_filename)
         print(f"输出文件将保存到指定路径: {output_file}")
     else:
         # 如果没有提供输出路径，在指定目录的同级目录下创建文件
@@ -299,11 +1071,105 @@ def main():
         output_file = os.path.join(parent_dir, excel_filename)
         print(f"输出文件将保存到同级目录: {output_file}")
     
-    # 查找重复文件
-    duplicate_files = find_duplicate_files(directory)
+    # 打开哈希缓存（文件未变化时直接复用上次计算的哈希值）
+    cache = None
+    if not args.no_cache:
+        cache_path = os.path.join(os.path.dirname(os.path.abspath(output_file)), DEFAULT_CACHE_NAME)
+        cache = HashCache(cache_path, rebuild=args.rebuild_cache)
+        print(f"哈希缓存: {cache_path}")
+    
+    # 增量扫描快照（只重新扫描修改时间有变化的目录）
+    snapshot = None
+    if args.incremental or args.rebuild_snapshot:
+        snapshot = ScanSnapshot(directory, rebuild=args.rebuild_snapshot)
+        print(f"扫描快照: {snapshot.path}")
+    
+    if args.similar:
+        # 感知哈希不能唯一标识文件内容，近似图片模式不使用按内容哈希索引的缩略图缓存
+        hash_label = args.similar.upper()
+        thumbnail_cache = None
+    else:
+        hash_label = STRONG_HASH_ALGORITHM.upper() if args.verify else args.algorithm.upper()
+        thumbnail_cache = None if args.no_thumbnail_cache else args.thumbnail_cache
+    thumbnail_cache_bytes = args.thumbnail_cache_size * 1024 * 1024
+    file_sizes = {}
+    
+    # 流水线模式：每组重复文件一确定就写入报告，不等待全部文件算完
+    # 外部排序模式：归并出的重复组直接写入报告，不在内存中保存全部结果
+    if args.pipeline or args.external_sort:
+        if args.report_format == 'xlsx':
+            export = partial(export_to_excel_streaming, output_file=output_file, hash_label=hash_label,
+                             jobs=args.jobs, thumbnail_quality=args.thumbnail_quality,
+                             thumbnail_cache=thumbnail_cache, thumbnail_cache_bytes=thumbnail_cache_bytes,
+                             file_sizes=file_sizes)
+        else:
+            export = partial(export_to_records, output_file=output_file, report_format=args.report_format,
+                             file_sizes=file_sizes)
+        try:
+            if args.external_sort:
+                find_duplicate_files_external(directory, export, jobs=args.jobs, cache=cache,
+                                              buffer_size=args.buffer_size * 1024, algorithm=args.algorithm,
+                                              verify=args.verify, walk_jobs=args.walk_jobs, file_sizes=file_sizes,
+                                              run_size=args.sort_run_size, temp_dir=args.temp_dir)
+            else:
+                find_duplicate_files_pipelined(directory, export, jobs=args.jobs, cache=cache,
+                                               buffer_size=args.buffer_size * 1024, algorithm=args.algorithm,
+                                               verify=args.verify, snapshot=snapshot, file_sizes=file_sizes,
+                                               walk_jobs=args.walk_jobs,
+                                               memory_budget=args.memory_budget * 1024 * 1024)
+        finally:
+            if cache:
+                cache.close()
+        if snapshot:
+            snapshot.save()
+        return
+    
+    # 查找重复文件（--similar 时查找近似重复的图片），同时记录遍历时读取到的文件大小
+    try:
+        if args.similar:
+            duplicate_files = find_similar_images(directory, args.similar, args.similar_distance,
+                                                  jobs=args.jobs, cache=cache, snapshot=snapshot,
+                                                  file_sizes=file_sizes, walk_jobs=args.walk_jobs)
+        else:
+            duplicate_files = find_duplicate_files(directory, jobs=args.jobs, cache=cache,
+                                                   buffer_size=args.buffer_size * 1024,
+                                                   algorithm=args.algorithm, verify=args.verify,
+                                                   snapshot=snapshot, file_sizes=file_sizes,
+                                                   walk_jobs=args.walk_jobs)
+    finally:
+        if cache:
+            cache.close()
+    if snapshot:
+        snapshot.save()
     
     # 导出到Excel
-    export_to_excel(duplicate_files, output_file)
+    total_duplicates = sum(len(paths) for paths in duplicate_files.values())
+    if args.report_format == 'xlsx' and total_duplicates + 1 > args.max_rows:
+        export_to_excel_sharded(duplicate_files, output_file, hash_label, args.max_rows, args.jobs,
+                                args.thumbnail_quality, thumbnail_cache, thumbnail_cache_bytes, file_sizes)
+    elif args.report_format == 'xlsx' and (args.streaming or total_duplicates > STREAMING_ROW_THRESHOLD):
+        export_to_excel_streaming(duplicate_files, output_file, hash_label, jobs=args.jobs,
+                                  thumbnail_quality=args.thumbnail_quality, thumbnail_cache=thumbnail_cache,
+                                  thumbnail_cache_bytes=thumbnail_cache_bytes, file_sizes=file_sizes)
+    else:
+        export_to_excel(duplicate_files, output_file, hash_label, args.report_format, jobs=args.jobs,
+                        thumbnail_quality=args.thumbnail_quality, thumbnail_cache=thumbnail_cache,
+                        thumbnail_cache_bytes=thumbnail_cache_bytes, file_sizes=file_sizes)
+    
+    # 合并重复文件（报告中记录的是合并前的状态）
+    if args.link and duplicate_files:
+        journal_path = args.journal or os.path.join(
+            os.path.dirname(os.path.abspath(output_file)),
+            f"link_journal_{dir_name}_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+        print(f"\n{'试运行：' if args.dry_run else ''}正在用 {args.link} 合并 {len(duplicate_files)} 组重复文件...")
+        if not args.dry_run:
+            print(f"回滚日志: {journal_path}")
+        summary = link_duplicates(duplicate_files.values(), args.link, journal_path, args.dry_run,
+                                  args.buffer_size * 1024)
+        print(f"{'可以替换' if args.dry_run else '已替换'} {summary.linked} 个文件，"
+              f"跳过 {summary.skipped} 个，失败或内容不同 {summary.failed} 个")
+        print(f"{'可以回收' if args.dry_run else '已回收'} {summary.reclaimed_bytes} 字节"
+              f"（{summary.reclaimed_bytes / (1024 * 1024):.2f} MB）")
 
 
 if __name__ == "__main__":
@@ -14,13 +14,25 @@
 
     # 示例：移动到指定目录
     python move_old_files.py 1699344000 ./res ./backup_res
+
+    # 示例：增量扫描（只重新扫描修改时间有变化的目录）
+    python move_old_files.py 1699344000 ./res --incremental
+
+    # 示例：网络存储上用16个线程并发列出目录
+    python move_old_files.py 1699344000 ./res --walk-jobs 16
 """
 
 import os
 import sys
 import shutil
+import argparse
 from pathlib import Path
 
+# 公共模块（多个工具共用的目录扫描等）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '公共模块'))
+from file_walker import walk_files
+from scan_snapshot import ScanSnapshot
+
 
 def find_available_target_dir(source_dir):
     """
@@ -40,7 +52,8 @@ def find_available_target_dir(source_dir):
         counter += 1
 
 
-def move_old_files(timestamp, folder_path, target_dir_path=None):
+def move_old_files(timestamp, folder_path, target_dir_path=None, incremental=False, rebuild_snapshot=False,
+                   walk_jobs=1):
     """
     将修改时间小于指定时间戳的文件移动到新目录
 
@@ -48,6 +61,9 @@ def move_old_files(timestamp, folder_path, target_dir_path=None):
         timestamp: Unix时间戳（秒）
         folder_path: 要扫描的文件夹路径
         target_dir_path: 目标目录路径（可选，如果不指定则自动生成）
+        incremental: 是否使用增量扫描快照（只重新扫描修改时间有变化的目录）
+        rebuild_snapshot: 是否完整扫描一次并重建快照
+        walk_jobs: 并发列出目录的线程数（遍历顺序不变）
     """
     # 转换为绝对路径
     source_dir = Path(folder_path).resolve()
@@ -79,20 +95,22 @@ def move_old_files(timestamp, folder_path, target_dir_path=None):
     print(f"目标目录: {target_dir}")
     print(f"时间戳阈值: {timestamp}")
 
-    # 遍历所有文件
-    for root, dirs, files in os.walk(source_dir):
-        for file in files:
-            file_path = Path(root) / file
-            try:
-                # 获取文件的修改时间
-                file_mtime = os.path.getmtime(file_path)
+    # 增量扫描快照：修改时间没有变化的目录不再列出，直接使用上次记录的文件列表（移动前会重新读取修改时间）
+    snapshot = None
+    if incremental or rebuild_snapshot:
+        snapshot = ScanSnapshot(str(source_dir), rebuild=rebuild_snapshot)
+        print(f"扫描快照: {snapshot.path}")
 
-                # 如果修改时间小于指定的timestamp
-                if file_mtime < float(timestamp):
-                    files_to_move.append(file_path)
+    # 遍历所有文件（无法读取修改时间的文件会打印警告并跳过）
+    for file_entry in walk_files(str(source_dir), snapshot, walk_jobs):
+        # 如果修改时间小于指定的timestamp
+        if file_entry.st_mtime_ns / 1e9 < float(timestamp):
+            files_to_move.append(Path(file_entry.path))
 
-            except Exception as e:
-                print(f"警告：无法读取文件 {file_path} 的修改时间: {e}")
+    # 移动文件前保存快照，被移走文件的目录修改时间会变化，下次会重新扫描
+    if snapshot:
+        print(snapshot.summary())
+        snapshot.save()
 
     # 如果没有找到需要移动的文件
     if not files_to_move:
@@ -103,7 +121,21 @@ def move_old_files(timestamp, folder_path, target_dir_path=None):
 
     # 移动文件
     moved_count = 0
+    skipped_count = 0
     for file_path in files_to_move:
+        # 移动前重新读取修改时间：快照中的记录可能已经过时（原地改写的文件不会改变目录的修改时间），
+        # 快照只用来跳过列出目录，是否移动以文件当前的修改时间为准
+        try:
+            current_mtime_ns = os.stat(file_path).st_mtime_ns
+        except OSError as e:
+            print(f"跳过: 无法读取文件 {file_path}: {e}")
+            skipped_count += 1
+            continue
+        if current_mtime_ns / 1e9 >= float(timestamp):
+            print(f"跳过: 文件在扫描后被修改过 {file_path.relative_to(source_dir)}")
+            skipped_count += 1
+            continue
+
         try:
             # 计算相对路径
             relative_path = file_path.relative_to(source_dir)
@@ -123,27 +155,46 @@ def move_old_files(timestamp, folder_path, target_dir_path=None):
             print(f"错误：移动文件 {file_path} 失败: {e}")
 
     print(f"\n完成！成功移动 {moved_count} 个文件到 {target_dir}")
+    if skipped_count:
+        print(f"跳过 {skipped_count} 个扫描后被修改或无法读取的文件")
 
 
 def main():
-    if len(sys.argv) < 3 or len(sys.argv) > 4:
-        print("用法: python move_old_files.py <timestamp> <folder_path> [target_dir]")
-        print("\n示例:")
-        print("  # 自动生成目标目录（res2, res3等）")
-        print("  python move_old_files.py 1699344000 ./res")
-        print("\n  # 指定目标目录")
-        print("  python move_old_files.py 1699344000 ./res ./backup_res")
-        print("\n说明:")
-        print("  timestamp   - Unix时间戳（秒），文件修改时间小于此值将被移动")
-        print("  folder_path - 要扫描的文件夹路径")
-        print("  target_dir  - 目标目录路径（可选）")
-        print("                如果不指定，将自动生成'原目录名+数字'的目录")
-        print("                数字从2开始递增，直到找到不存在的目录名")
-        sys.exit(1)
-
-    timestamp = sys.argv[1]
-    folder_path = sys.argv[2]
-    target_dir = sys.argv[3] if len(sys.argv) == 4 else None
+    parser = argparse.ArgumentParser(
+        description='将修改时间小于指定时间戳的文件移动到新目录（保持目录结构）',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  # 自动生成目标目录（res2, res3等）
+  python move_old_files.py 1699344000 ./res
+
+  # 指定目标目录
+  python move_old_files.py 1699344000 ./res ./backup_res
+
+  # 增量扫描（只重新扫描修改时间有变化的目录）
+  python move_old_files.py 1699344000 ./res --incremental
+
+  # 网络存储上用16个线程并发列出目录
+  python move_old_files.py 1699344000 ./res --walk-jobs 16
+        """
+    )
+    parser.add_argument('timestamp', help='Unix时间戳（秒），文件修改时间小于此值将被移动')
+    parser.add_argument('folder_path', help='要扫描的文件夹路径')
+    parser.add_argument('target_dir', nargs='?', default=None,
+                        help="目标目录路径（可选）。如果不指定，将自动生成'原目录名+数字'的目录，"
+                             "数字从2开始递增，直到找到不存在的目录名")
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量扫描：保存目录快照，下次只重新扫描修改时间有变化的目录'
+                             '（移动前会重新读取每个候选文件的修改时间，原地改写过的文件不会被移动）')
+    parser.add_argument('--rebuild-snapshot', action='store_true',
+                        help='完整扫描一次并重建增量扫描快照（隐含 --incremental）')
+    parser.add_argument('--walk-jobs', type=int, default=1,
+                        help='并发列出目录的线程数，网络存储上建议8~32（默认: 1）')
+
+    args = parser.parse_args()
+    timestamp = args.timestamp
+    folder_path = args.folder_path
+    target_dir = args.target_dir
 
     try:
         # 验证timestamp是否为有效数字
@@ -152,7 +203,8 @@ def main():
         print(f"错误：timestamp必须是一个数字，当前值: {timestamp}")
         sys.exit(1)
 
-    move_old_files(timestamp, folder_path, target_dir)
+    move_old_files(timestamp, folder_path, target_dir, args.incremental, args.rebuild_snapshot,
+                   args.walk_jobs)
 
 
 if __name__ == "__main__":